@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:              vis
+# Program Description:       Measures sequences of vertical intervals.
+#
+# Filename: run_benchmarks.py
+# Purpose: Time the indexers, experimenters, and workflows in vis.
+#
+# Copyright (C) 2014 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+Time every indexer and experimenter on each piece of the test corpus, and the "intervals" and
+"interval n-grams" workflows on the whole corpus. The "workflow" benchmarks start from pieces that
+already have their :class:`NoteRestIndexer` results; the "end-to-end" benchmarks also import the
+files. The "import vis" benchmark times importing :mod:`vis` itself, in a new interpreter.
+
+Each benchmark runs several times; the best and median times are printed and, with ``--output``,
+written to a JSON file. Give an earlier JSON file with ``--compare`` to see how much faster or
+slower each benchmark has become. With ``--scale``, every score is also repeated end-to-end to make
+longer pieces, so you can see how the running time grows with the length of a piece.
+
+Examples::
+
+    $ python run_benchmarks.py --output before.json
+    $ python run_benchmarks.py --scale 1 4 --compare before.json bwv2.xml
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import argparse
+import platform
+import subprocess
+from timeit import default_timer
+import numpy
+import pandas
+import vis
+from vis.analyzers.indexers import noterest, interval, ngram, offset, repeat
+from vis.analyzers.experimenters import frequency, aggregator, sketch
+from vis.models.indexed_piece import IndexedPiece
+from vis.workflow import WorkflowManager
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), u'vis', u'tests', u'corpus')
+# NB: music21 1.9 cannot import MEI files, so we use the **kern version of Jos2308
+CORPUS = [u'bwv2.xml', u'Jos2308.krn', u'symphony6-i.midi', u'madrigal51.mxl']
+
+# a benchmark that is this much slower than in the "--compare" file is marked as a regression...
+SLOWER = 1.1
+# ... unless it's only slower by this many seconds, which is just noise
+NOISE = 0.002
+
+# settings like the WorkflowManager's defaults
+_INTERVAL_SETTINGS = {u'quality': False, u'simple or compound': u'compound'}
+_NGRAM_SETTINGS = {u'vertical': [0], u'horizontal': [1], u'n': 2, u'continuer': u'_',
+                   u'mark singles': False, u'terminator': u'Rest'}
+
+
+# Run in a new interpreter, since vis is already imported in this one: import pandas, then print
+# the seconds spent importing vis.
+_IMPORT_VIS = u"""
+import time
+import pandas
+start = time.time()
+import vis.workflow
+print repr(time.time() - start)
+"""
+
+
+def time_vis_import():
+    """
+    Time importing :mod:`vis.workflow`, after :mod:`pandas`, in a new interpreter.
+
+    :returns: The seconds spent importing :mod:`vis.workflow`.
+    :rtype: float
+    """
+    output = subprocess.check_output([sys.executable, u'-c', _IMPORT_VIS],
+                                     cwd=os.path.dirname(os.path.abspath(__file__)),
+                                     stderr=open(os.devnull, 'w'))
+    return float(output.strip().split('\n')[-1])
+
+
+def time_it(func, repeat):
+    """
+    Call a function several times.
+
+    :param func: The function to call, without arguments.
+    :type func: callable
+    :param repeat: How many times to call ``func``.
+    :type repeat: int
+
+    :returns: The seconds taken by each call, and the value returned by the last call.
+    :rtype: 2-tuple of list of float and object
+    """
+    times = []
+    result = None
+    for _ in xrange(repeat):
+        start = default_timer()
+        result = func()
+        times.append(default_timer() - start)
+    return times, result
+
+
+def scale_score(score, factor):
+    """
+    Make a longer version of a score, by repeating every part's notes and rests ``factor`` times.
+
+    :param score: The score to repeat.
+    :type score: :class:`music21.stream.Score`
+    :param factor: How many times to repeat the score.
+    :type factor: int
+
+    :returns: The new score, or ``score`` itself if ``factor`` is ``1``.
+    :rtype: :class:`music21.stream.Score`
+    """
+    if 1 == factor:
+        return score
+    from music21 import stream
+    length = score.highestTime
+    post = stream.Score()
+    for part in score.parts:
+        events = part.flat.notesAndRests
+        new_part = stream.Part()
+        for i in xrange(factor):
+            for event in events:
+                new_part.insert(i * length + event.offset, copy.deepcopy(event))
+        post.insert(0, new_part)
+    return post
+
+
+def count_events(data):
+    """
+    Count the events in an index.
+
+    :param data: The index.
+    :type data: list or dict of :class:`pandas.Series`, or any other object
+
+    :returns: The total number of events, or ``None`` if ``data`` has no length.
+    :rtype: int or None
+    """
+    if isinstance(data, dict):
+        data = data.values()
+    if isinstance(data, list):
+        return sum(len(x) for x in data)
+    return len(data) if hasattr(data, u'__len__') else None
+
+
+def piece_benchmarks(score):
+    """
+    Make the benchmarks for one piece. Each benchmark uses the results of the ones before it, so
+    they must be run in order.
+
+    :param score: The piece.
+    :type score: :class:`music21.stream.Score`
+
+    :returns: The name and function of every benchmark. Each function takes the results of the
+        benchmarks run so far, as a dict, and returns its own result.
+    :rtype: list of 2-tuple of unicode and callable
+    """
+    def ngrams(res):
+        "Run the NGramIndexer on every two-part combination."
+        post = []
+        for combo, vert in res[u'IntervalIndexer'].iteritems():
+            horiz = res[u'HorizontalIntervalIndexer'][interval.key_to_tuple(combo)[1]]
+            post.append(ngram.NGramIndexer([vert, horiz], _NGRAM_SETTINGS).run()[0])
+        return post
+
+    return [(u'NoteRestIndexer',
+             lambda res: noterest.NoteRestIndexer(list(score.parts)).run()),
+            (u'IntervalIndexer',
+             lambda res: interval.IntervalIndexer(res[u'NoteRestIndexer'],
+                                                  _INTERVAL_SETTINGS).run()),
+            (u'HorizontalIntervalIndexer',
+             lambda res: interval.HorizontalIntervalIndexer(res[u'NoteRestIndexer'],
+                                                            _INTERVAL_SETTINGS).run()),
+            (u'FilterByOffsetIndexer',
+             lambda res: offset.FilterByOffsetIndexer(res[u'NoteRestIndexer'],
+                                                      {u'quarterLength': 0.5}).run()),
+            (u'FilterByRepeatIndexer',
+             lambda res: repeat.FilterByRepeatIndexer(res[u'NoteRestIndexer']).run()),
+            (u'NGramIndexer', ngrams),
+            (u'FrequencyExperimenter',
+             lambda res: frequency.FrequencyExperimenter(res[u'NGramIndexer']).run()),
+            (u'ColumnAggregator',
+             lambda res: aggregator.ColumnAggregator(res[u'FrequencyExperimenter']).run()),
+            (u'FrequencySketchExperimenter',
+             lambda res: sketch.FrequencySketchExperimenter(res[u'NGramIndexer']).run())]
+
+
+def make_pieces(pathnames, noterests):
+    """
+    Make the pieces for a workflow benchmark. Without ``noterests``, the pieces are imported from
+    their files by the workflow itself. With ``noterests``, the pieces start with those
+    :class:`NoteRestIndexer` results, so the workflow only does the analysis.
+
+    :param pathnames: The pathnames of the pieces.
+    :type pathnames: list of unicode
+    :param noterests: The :class:`NoteRestIndexer` results for each pathname, or ``None``.
+    :type noterests: list of list of :class:`pandas.Series` or None
+
+    :returns: The pieces.
+    :rtype: list of :class:`IndexedPiece`
+    """
+    pieces = [IndexedPiece(pathname) for pathname in pathnames]
+    if noterests is not None:
+        # pylint: disable=W0212
+        for piece, results in zip(pieces, noterests):
+            piece._imported = True
+            piece._noterest_results = list(results)
+    return pieces
+
+
+def run_workflow(pathnames, noterests, instruction):
+    """
+    Run one of the :class:`WorkflowManager` experiments on all the pieces, with every pair of
+    voices.
+
+    :param pathnames: Refer to :func:`make_pieces`.
+    :param noterests: Refer to :func:`make_pieces`.
+    :param instruction: The experiment to run.
+    :type instruction: unicode
+
+    :returns: The result of the experiment.
+    :rtype: :class:`pandas.DataFrame`
+    """
+    workm = WorkflowManager(make_pieces(pathnames, noterests))
+    workm.load(u'pieces')
+    for i in xrange(len(workm)):
+        workm.settings(i, u'voice combinations', u'all pairs')
+    return workm.run(instruction)
+
+
+def record(results, name, piece, scale, times, result):
+    """
+    Add a benchmark's times to the results, then print them.
+
+    :param results: All the results so far.
+    :type results: list of dict
+    :param name: The benchmark's name.
+    :type name: unicode
+    :param piece: The file name of the piece, or ``u'corpus'`` for the whole corpus.
+    :type piece: unicode
+    :param scale: How many times longer than the original the piece was made.
+    :type scale: int
+    :param times: The seconds each run took.
+    :type times: list of float
+    :param result: The benchmark's output, for counting events.
+    :type result: object
+    """
+    results.append({u'benchmark': name, u'piece': piece, u'scale': scale, u'times': times,
+                    u'best': min(times), u'median': float(numpy.median(times)),
+                    u'events': count_events(result)})
+    events = results[-1][u'events']
+    print(u'{:<28} {:<18} x{:<3} best {:9.4f} s   median {:9.4f} s   {}'.format(
+        name, piece, scale, min(times), results[-1][u'median'],
+        u'' if events is None else u'{:>8} events'.format(events)))
+    sys.stdout.flush()
+
+
+def run_benchmarks(pathnames, scales, repeat_count, wanted):
+    """
+    Run all the benchmarks.
+
+    :param pathnames: The pieces to use.
+    :type pathnames: list of unicode
+    :param scales: The factors by which to lengthen each piece.
+    :type scales: list of int
+    :param repeat_count: How many times to run each benchmark.
+    :type repeat_count: int
+    :param wanted: Run only the benchmarks whose name includes this, or all if ``None``.
+    :type wanted: unicode or None
+
+    :returns: The results of every benchmark.
+    :rtype: list of dict
+    """
+    from music21 import converter
+    results = []
+    selected = lambda name: wanted is None or wanted.lower() in name.lower()
+    if selected(u'import vis'):
+        record(results, u'import vis', u'vis', 1,
+               [time_vis_import() for _ in xrange(repeat_count)], None)
+    originals = []
+    for pathname in pathnames:
+        piece = os.path.basename(pathname)
+        times, score = time_it(lambda: converter.parse(pathname), repeat_count)
+        originals.append(score)
+        if selected(u'import'):
+            record(results, u'import', piece, 1, times, [part.flat.notesAndRests
+                                                         for part in score.parts])
+    for scale in scales:
+        noterests = []
+        for pathname, score in zip(pathnames, originals):
+            done = {}
+            for name, func in piece_benchmarks(scale_score(score, scale)):
+                times, done[name] = time_it(lambda: func(done), repeat_count)
+                if selected(name):
+                    record(results, name, os.path.basename(pathname), scale, times, done[name])
+            noterests.append(done[u'NoteRestIndexer'])
+        for instruction in (u'intervals', u'interval n-grams'):
+            # "end-to-end" includes importing the files, so it's only possible with the originals
+            runs = [(u'workflow: ', noterests)]
+            if 1 == scale:
+                runs.append((u'end-to-end: ', None))
+            for prefix, from_noterests in runs:
+                if selected(prefix + instruction):
+                    times, result = time_it(lambda: run_workflow(pathnames, from_noterests,
+                                                                 instruction),
+                                            repeat_count)
+                    record(results, prefix + instruction, u'corpus', scale, times, result)
+    return results
+
+
+def metadata(args):
+    """
+    Describe the computer and software the benchmarks ran with.
+
+    :param args: The command-line arguments.
+    :type args: :class:`argparse.Namespace`
+
+    :returns: The description.
+    :rtype: dict
+    """
+    import music21
+    try:
+        commit = subprocess.check_output([u'git', u'rev-parse', u'HEAD'],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {u'date': time.strftime(u'%Y-%m-%dT%H:%M:%S'), u'commit': commit,
+            u'machine': platform.platform(), u'python': platform.python_version(),
+            u'vis': vis.__version__, u'music21': music21.VERSION_STR,
+            u'pandas': pandas.__version__, u'numpy': numpy.__version__,
+            u'pieces': args.pieces, u'scales': args.scale, u'repeat': args.repeat}
+
+
+def compare(results, pathname):
+    """
+    Print how much faster or slower every benchmark is than in an earlier run.
+
+    :param results: The results of this run.
+    :type results: list of dict
+    :param pathname: The JSON file from an earlier run.
+    :type pathname: unicode
+
+    :returns: The number of benchmarks that became slower than :const:`SLOWER` and :const:`NOISE`
+        allow.
+    :rtype: int
+    """
+    with open(pathname) as the_file:
+        earlier = json.load(the_file)
+    key = lambda res: (res[u'benchmark'], res[u'piece'], res[u'scale'])
+    before = {key(res): res for res in earlier[u'results']}
+    regressions = 0
+    print(u'\nCompared with {} ({}):'.format(pathname, earlier[u'meta'][u'commit']))
+    for res in results:
+        if key(res) not in before:
+            continue
+        ratio = res[u'best'] / max(before[key(res)][u'best'], 1e-9)
+        verdict = u''
+        if abs(res[u'best'] - before[key(res)][u'best']) < NOISE:
+            pass
+        elif ratio > SLOWER:
+            verdict = u'SLOWER'
+            regressions += 1
+        elif ratio < 1.0 / SLOWER:
+            verdict = u'faster'
+        print(u'{:<28} {:<18} x{:<3} {:9.4f} s -> {:9.4f} s   {:6.2f}x  {}'.format(
+            res[u'benchmark'], res[u'piece'], res[u'scale'], before[key(res)][u'best'],
+            res[u'best'], ratio, verdict))
+    return regressions
+
+
+def main(argv):
+    "Run the benchmarks from the command line."
+    parser = argparse.ArgumentParser(description=u'Time the indexers, experimenters, and '
+                                                 u'workflows in vis.')
+    parser.add_argument(u'pieces', nargs=u'*', default=CORPUS,
+                        help=u'file names in vis/tests/corpus, or pathnames (default: {})'.format(
+                            u', '.join(CORPUS)))
+    parser.add_argument(u'-s', u'--scale', type=int, nargs=u'+', default=[1],
+                        help=u'also repeat every score this many times (default: 1)')
+    parser.add_argument(u'-r', u'--repeat', type=int, default=3,
+                        help=u'how many times to run each benchmark (default: 3)')
+    parser.add_argument(u'-k', u'--only', default=None,
+                        help=u'run only the benchmarks whose name includes this')
+    parser.add_argument(u'-o', u'--output', help=u'write the results to this JSON file')
+    parser.add_argument(u'-c', u'--compare', help=u'compare with the results in this JSON file')
+    args = parser.parse_args(argv)
+    pathnames = [each if os.path.exists(each) else os.path.join(CORPUS_DIR, each)
+                 for each in args.pieces]
+    results = run_benchmarks(pathnames, args.scale, args.repeat, args.only)
+    if args.output:
+        with open(args.output, 'w') as the_file:
+            json.dump({u'meta': metadata(args), u'results': results}, the_file, indent=1,
+                      sort_keys=True)
+    if args.compare:
+        return 1 if compare(results, args.compare) > 0 else 0
+    return 0
+
+
+if __name__ == u'__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -32,8 +32,10 @@ VERBOSITY = 1
 import unittest
 from vis.tests import test_indexer, test_note_rest_indexer, test_ngram, test_repeat, \
     test_aggregator, test_interval_indexer, test_frequency_experimenter, test_offset, \
-    test_lilypond
-from vis.tests import test_indexed_piece, test_aggregated_pieces
+    test_lilypond, test_sketch_experimenter, test_lazy_imports, test_maximal_experimenter, \
+    test_entropy_experimenter
+from vis.tests import test_indexed_piece, test_aggregated_pieces, test_score_cache, \
+    test_result_store, test_compact_corpus, test_profiling, test_ngram_index
 from vis.tests import bwv2_integration_tests as bwv2
 from vis.tests import test_workflow, test_workflow_integration, test_workflow_experiments
 
@@ -43,6 +45,9 @@ unittest.TextTestRunner(verbosity=VERBOSITY).run(test_indexer.INDEXER_1_PART_SUI
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_indexer.INDEXER_MULTI_EVENT_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_indexer.UNIQUE_OFFSETS_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_indexer.VERT_ALIGNER_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_indexer.EVENT_SWEEP_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_indexer.INDEXER_EXECUTOR_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_indexer.VECTOR_INDEXER_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_note_rest_indexer.NOTE_REST_INDEXER_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_interval_indexer.INTERVAL_INDEXER_SHORT_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_interval_indexer.INTERVAL_INDEXER_LONG_SUITE)
@@ -52,6 +57,7 @@ unittest.TextTestRunner(verbosity=VERBOSITY).run(test_repeat.REPEAT_INDEXER_SUIT
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_ngram.NGRAM_INDEXER_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_offset.OFFSET_INDEXER_SINGLE_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_offset.OFFSET_INDEXER_MULTI_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_offset.OFFSET_INDEXER_TICKS_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_lilypond.ANNOTATION_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_lilypond.ANNOTATE_NOTE_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_lilypond.PART_NOTES_SUITE)
@@ -59,12 +65,30 @@ unittest.TextTestRunner(verbosity=VERBOSITY).run(test_lilypond.LILYPOND_SUITE)
 # Experimenter and Subclasses
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_frequency_experimenter.FREQUENCY_FUNC_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_frequency_experimenter.FREQUENCY_RUN_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_frequency_experimenter.FREQUENCY_MERGE_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_sketch_experimenter.SKETCH_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_sketch_experimenter.SKETCH_MERGE_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_sketch_experimenter.SKETCH_RUN_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_maximal_experimenter.SUFFIX_ARRAY_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_maximal_experimenter.MAXIMAL_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_entropy_experimenter.ENTROPY_SUITE)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_aggregator.COLUMN_AGGREGATOR_SUITE)
 # IndexedPiece and AggregatedPieces
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_indexed_piece.INDEXED_PIECE_SUITE_A)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_indexed_piece.INDEXED_PIECE_SUITE_B)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_indexed_piece.INDEXED_PIECE_PARTS_TITLES)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_aggregated_pieces.AGGREGATED_PIECES_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_score_cache.SCORE_CACHE_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_score_cache.INDEXED_PIECE_CACHE_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_result_store.RESULT_STORE_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_result_store.WORKFLOW_STORE_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_compact_corpus.COMPACT_CORPUS_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_compact_corpus.WORKFLOW_COMPACT_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_profiling.PROFILING_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_profiling.WORKFLOW_PROFILING_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_ngram_index.NGRAM_INDEX_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_ngram_index.WORKFLOW_NGRAM_INDEX_SUITE)
+unittest.TextTestRunner(verbosity=VERBOSITY).run(test_lazy_imports.LAZY_IMPORTS_SUITE)
 # WorkflowManager
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_workflow.WORKFLOW_TESTS)
 unittest.TextTestRunner(verbosity=VERBOSITY).run(test_workflow.GET_DATA_FRAME)
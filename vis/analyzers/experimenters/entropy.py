@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               controllers/experimenters/entropy.py
+# Purpose:                N-gram entropy and transition experimenter
+#
+# Copyright (C) 2013 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+.. codeauthor:: Christopher Antila <crantila@fedoraproject.org>
+
+Experimenter that counts which event follows every n-gram, and finds how predictable the next
+event is: the entropy of an n-gram's continuations.
+"""
+
+# Turn off "string statement has no effect" warning; the strings are for Sphinx!
+# pylint: disable=W0105
+
+import numpy
+import pandas
+from vis.analyzers import experimenter
+
+
+class EntropyExperimenter(experimenter.Experimenter):
+    """
+    Count the transitions from every n-gram (the "prefix") to the event that follows it, as in a
+    Markov chain, and find the entropy of each prefix's continuations. The entropy is ``0`` when a
+    prefix is always followed by the same event, and higher when what follows is less predictable.
+
+    The input is the output of the :class:`~vis.analyzers.indexers.ngram.NGramIndexer` with the
+    ``u'n'`` setting ``[k, k + 1]``, so that every combination has an index of ``k``-grams (the
+    prefixes) followed by an index of ``(k + 1)``-grams. The ``(k + 1)``-gram at an offset is the
+    ``k``-gram at the same offset, plus the next event. You may give the results of one piece,
+    or, as :meth:`~vis.models.aggregated_pieces.AggregatedPieces.get_data` does, a list with the
+    results of each piece.
+
+    Every prefix and every ``(k + 1)``-gram is given an integer code once, so the transitions of all
+    prefixes in all pieces are counted, and all the entropies are found, with a few :mod:`numpy`
+    operations. With the ``u'groups'`` setting, the pieces are counted separately by group, so
+    you can compare the entropy of (for example) each composer:
+
+    >>> setts = {u'n': [2, 3], u'groups': pieces.metadata(u'composers'), ...}
+    >>> pieces.get_data([EntropyExperimenter], [noterest.NoteRestIndexer, ...,
+    ...                 ngram.NGramIndexer], setts)
+    """
+
+    possible_settings = [u'groups', u'base', u'transitions']
+    """
+    :keyword u'groups': The group of each piece, like its composer, or ``None`` to count all the
+        pieces together.
+    :type u'groups': ``list`` or ``None``
+    :keyword u'base': The base of the logarithm used for entropy. The default, ``2``, measures
+        entropy in bits.
+    :type u'base': number
+    :keyword u'transitions': Whether to return the number of times each event follows each prefix,
+        rather than the entropies.
+    :type u'transitions': boolean
+    """
+
+    default_settings = {u'groups': None, u'base': 2, u'transitions': False}
+
+    def __init__(self, index, settings=None):
+        """
+        :param index: The ``k``-gram and ``(k + 1)``-gram indices of each combination, for one
+            piece, or a list with those of every piece.
+        :type index: ``list`` of :class:`pandas.Series`, or ``list`` of ``list`` of
+            :class:`pandas.Series`
+        :param settings: Any of the settings in :const:`possible_settings`.
+        :type settings: :obj:`dict` or :obj:`None`
+
+        :raises: :exc:`RuntimeError` if the ``u'groups'`` setting doesn't have one group for every
+            piece, or a piece doesn't have a pair of indices for every combination.
+        """
+        super(EntropyExperimenter, self).__init__(index, None)
+        self._settings = dict(EntropyExperimenter.default_settings)
+        if settings is not None:
+            for setting in EntropyExperimenter.possible_settings:
+                if setting in settings:
+                    self._settings[setting] = settings[setting]
+
+        # one piece's results is a list of Series; several pieces' is a list of those
+        if len(index) > 0 and all(isinstance(x, pandas.Series) for x in index):
+            self._pieces = [index]
+        else:
+            self._pieces = list(index)
+        if any(len(piece) % 2 != 0 for piece in self._pieces):
+            raise RuntimeError(u'EntropyExperimenter needs a k-gram index and a (k+1)-gram ' +
+                               u'index for every combination')
+        groups = self._settings[u'groups']
+        if groups is not None and len(groups) != len(self._pieces):
+            raise RuntimeError(u'EntropyExperimenter needs one of "groups" for every piece')
+
+    def _count(self):
+        """
+        Count every distinct transition.
+
+        :returns: The group (or ``None``), prefix, and next event of each distinct transition; the
+            number of times it happens; and the row of the transition matrix it's in, which is
+            the same for transitions with the same group and prefix. Rows are numbered from ``0``,
+            and the transitions are sorted by row.
+        :rtype: 5-tuple of ``list``, ``list``, ``list``, :class:`numpy.ndarray` of int, and
+            :class:`numpy.ndarray` of int
+        """
+        groups = self._settings[u'groups']
+        if groups is None:
+            groups = [None] * len(self._pieces)
+
+        # line up every (k + 1)-gram with its prefix, and with the group of its piece
+        group_names = []
+        group_codes = {}
+        group_rows = []
+        prefixes = []
+        ngrams = []
+        for group, piece in zip(groups, self._pieces):
+            if group not in group_codes:
+                group_codes[group] = len(group_names)
+                group_names.append(group)
+            for i in xrange(0, len(piece), 2):
+                longer = piece[i + 1].dropna()
+                prefixes.append(piece[i].reindex(longer.index).values)
+                ngrams.append(longer.values)
+                group_rows.append(numpy.repeat(group_codes[group], len(longer)))
+        if len(ngrams) == 0:
+            return [], [], [], numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+        prefix_codes, prefix_names = pandas.factorize(numpy.concatenate(prefixes))
+        ngram_codes, ngram_names = pandas.factorize(numpy.concatenate(ngrams))
+        group_rows = numpy.concatenate(group_rows)
+        found = prefix_codes >= 0
+
+        # "rows" of the transition matrix are a group and prefix; "columns" are (k + 1)-grams
+        row_codes, rows = pandas.factorize(group_rows[found] * len(prefix_names) +
+                                           prefix_codes[found])
+        transitions, counts = numpy.unique(row_codes * len(ngram_names) + ngram_codes[found],
+                                           return_inverse=True)
+        counts = numpy.bincount(counts)
+        row_of = transitions // len(ngram_names)
+
+        prefixes = [prefix_names[row % len(prefix_names)] for row in rows[row_of]]
+        nexts = [ngram[len(prefix):].strip()
+                 for prefix, ngram in zip(prefixes, ngram_names[transitions % len(ngram_names)])]
+        groups = [group_names[row // len(prefix_names)] for row in rows[row_of]]
+        return groups, prefixes, nexts, counts, row_of
+
+    def run(self):
+        """
+        Run the :class:`EntropyExperimenter`.
+
+        :returns: With the ``u'transitions'`` setting, the number of times each event follows each
+            prefix, indexed by prefix and next event. Otherwise, for every prefix, the number of
+            times it's followed by an event (in the ``u'count'`` column), how many different
+            events follow it (``u'continuations'``), and their entropy (``u'entropy'``). With the
+            ``u'groups'`` setting, the first level of the index is the group.
+        :rtype: :class:`pandas.Series` or :class:`pandas.DataFrame`
+        """
+        groups, prefixes, nexts, counts, row_of = self._count()
+        grouped = self._settings[u'groups'] is not None
+
+        if len(counts) == 0:
+            if self._settings[u'transitions']:
+                return pandas.Series([], dtype=numpy.int64)
+            return pandas.DataFrame(columns=[u'count', u'continuations', u'entropy'])
+        elif self._settings[u'transitions']:
+            levels = [groups, prefixes, nexts] if grouped else [prefixes, nexts]
+            return pandas.Series(counts, index=pandas.MultiIndex.from_arrays(levels)).sortlevel()
+
+        # the entropy of every row at once
+        totals = numpy.bincount(row_of, weights=counts)
+        probs = counts / totals[row_of]
+        entropy = -numpy.bincount(row_of, weights=probs * numpy.log(probs))
+        # round-off may leave a certain continuation very slightly below zero
+        entropy = numpy.maximum(entropy / numpy.log(self._settings[u'base']), 0.0)
+
+        # the first transition of every row
+        starts = numpy.flatnonzero(numpy.diff(numpy.concatenate([[-1], row_of])))
+        row_prefixes = [prefixes[i] for i in starts]
+        if grouped:
+            index = pandas.MultiIndex.from_arrays([[groups[i] for i in starts], row_prefixes])
+        else:
+            index = pandas.Index(row_prefixes)
+        post = pandas.DataFrame({u'count': totals.astype(numpy.int64),
+                                 u'continuations': numpy.bincount(row_of),
+                                 u'entropy': entropy},
+                                index=index, columns=[u'count', u'continuations', u'entropy'])
+        return post.sortlevel() if grouped else post.sort_index()
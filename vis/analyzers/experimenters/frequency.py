@@ -48,11 +48,29 @@ def experimenter_func(obj):
         The first element is the first element given here, used for identification purposes.
     :rtype: :obj:`tuple` of (anything, :class:`pandas.Series`)
     """
-    thing_dict = {}
-    for each in obj[1]:
-        if each not in thing_dict:
-            thing_dict[each] = sum(obj[1] == each)
-    return obj[0], pandas.Series(thing_dict)
+    return obj[0], obj[1].value_counts().sort_index()
+
+
+def merge_counts(counts):
+    """
+    Add up several results of :func:`experimenter_func` or :meth:`FrequencyExperimenter.run`, for
+    example from different pieces or from different parts of a long corpus. An object missing
+    from some of the results is counted as zero there.
+
+    Parameters
+    ==========
+    :param counts: The results to add up. They should all be of the same type.
+    :type counts: iterable of :class:`pandas.Series` or of :class:`pandas.DataFrame`
+
+    Returns
+    =======
+    :returns: The sum of all the results, or an empty :class:`Series` if there were none.
+    :rtype: :class:`pandas.Series` or :class:`pandas.DataFrame`
+    """
+    post = None
+    for each in counts:
+        post = each if post is None else post.add(each, fill_value=0)
+    return pandas.Series() if post is None else post
 
 
 class FrequencyExperimenter(experimenter.Experimenter):
@@ -93,16 +111,7 @@ class FrequencyExperimenter(experimenter.Experimenter):
         else:
             results = [[(i, x)] for i, x in enumerate(self._index)]
         results = self._do_multiprocessing(experimenter_func, results)
-        post = {}
-        for result in results:
-            post[result[0]] = result[1]
-        # assemble all-part results
-        tokens = []
-        for part_i in post.iterkeys():
-            tokens.extend(list(post[part_i].index))
-        tokens = set(tokens)
-        for i in post.iterkeys():
-            post[i].reindex(index=tokens)
-        post = pandas.DataFrame(post)
+        # assemble all-part results; the DataFrame puts NaN where a part lacks an object
+        post = pandas.DataFrame(dict(results))
         post[u'all'] = post.sum(axis=1, skipna=True)
         return post
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               controllers/experimenters/maximal.py
+# Purpose:                Maximal n-gram experimenter
+#
+# Copyright (C) 2013 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+.. codeauthor:: Christopher Antila <crantila@fedoraproject.org>
+
+Experimenter that finds the maximal n-grams of every length at once: those that do not only occur
+as part of one larger n-gram.
+"""
+
+# Turn off "string statement has no effect" warning; the strings are for Sphinx!
+# pylint: disable=W0105
+
+import numpy
+import pandas
+from vis.analyzers import experimenter
+
+# The left context of a suffix that starts a stream, or of an interval whose suffixes have more
+# than one left context. Real contexts are unit codes, which are never negative.
+_DIVERSE = -1
+
+
+def suffix_array(codes):
+    """
+    Sort the suffixes of a sequence of integers by prefix doubling, and find how many values each
+    suffix shares with the one before it in sorted order.
+
+    Every round of doubling ranks the suffixes by twice as many values as the round before, until
+    no two suffixes have the same rank. The rank of every round is kept, so the common prefix of
+    two suffixes can be found by comparing their ranks from the last round to the first, as in a
+    binary search, for all the suffixes at once.
+
+    :param codes: The sequence. Every value must be at least ``0``.
+    :type codes: 1-dimensional :class:`numpy.ndarray` of int
+
+    :returns: The starting position of every suffix, in sorted order, and the length of the common
+        prefix of each of them and the one before it. The first length is always ``0``.
+    :rtype: 2-tuple of 1-dimensional :class:`numpy.ndarray` of int
+    """
+    length = len(codes)
+    if length == 0:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+    rank = numpy.unique(codes, return_inverse=True)[1].astype(numpy.int64)
+    order = numpy.argsort(rank, kind='mergesort')
+    # ranks[i] ranks the suffixes by their first 2 ** i values
+    ranks = [rank]
+    span = 1
+    while rank.max() < length - 1 and span < length:
+        # Sort by the ranks of the first "span" values, then of the next "span" values. A suffix
+        # shorter than that sorts before any that continues, so its second rank is 0.
+        second = numpy.zeros(length, dtype=numpy.int64)
+        second[:length - span] = rank[span:] + 1
+        order = numpy.lexsort((second, rank))
+        first = rank[order]
+        second = second[order]
+        changed = numpy.ones(length, dtype=numpy.bool_)
+        changed[1:] = (first[1:] != first[:-1]) | (second[1:] != second[:-1])
+        rank = numpy.empty(length, dtype=numpy.int64)
+        rank[order] = numpy.cumsum(changed) - 1
+        ranks.append(rank)
+        span *= 2
+
+    this = order[1:]
+    other = order[:-1]
+    common = numpy.zeros(length - 1, dtype=numpy.int64)
+    for level in xrange(len(ranks) - 1, -1, -1):
+        # suffixes that share "common" values, then 2 ** level more
+        this_next = this + common
+        other_next = other + common
+        inside = (this_next < length) & (other_next < length)
+        same = numpy.zeros(length - 1, dtype=numpy.bool_)
+        same[inside] = ranks[level][this_next[inside]] == ranks[level][other_next[inside]]
+        common[same] += 2 ** level
+    shared = numpy.zeros(length, dtype=numpy.int64)
+    shared[1:] = common
+    return order, shared
+
+
+class MaximalNGramExperimenter(experimenter.Experimenter):
+    """
+    Find the n-grams that do not only occur as part of one larger n-gram, and count them. If a
+    4-gram always occurs with the same event before it (or after it), it is only part of that
+    5-gram, so it is not "maximal" and the results omit it. If the 4-gram occurs in at least two
+    different 5-grams, or at the start or end of a stream, it is maximal. This finds the maximal
+    n-grams of every length at once, for any number of token streams from any number of pieces.
+
+    The input is the token streams made by
+    :meth:`~vis.analyzers.indexers.ngram.NGramIndexer.tokens`, so the n-grams are the same ones
+    (and in the same format) that the :class:`~vis.analyzers.indexers.ngram.NGramIndexer` finds
+    with the same settings. To find the maximal n-grams of a whole corpus, give the token streams
+    of every piece together, since the counts of different pieces can't be added afterward.
+
+    All the streams are joined into one sequence, where each "unit" stands for the vertical event
+    at one offset and the step to the next offset. Every n-gram is a run of units, and the
+    maximal n-grams are the left-diverse intervals of the sequence's suffix array, so this takes
+    time roughly proportional to the length of the input, rather than comparing every n-gram
+    with every larger one.
+    """
+
+    possible_settings = [u'min count', u'min n', u'max n']
+    """
+    :keyword u'min count': The fewest times an n-gram must occur to be in the results. This is
+        at least ``2``, since an n-gram that occurs once is always part of the whole stream.
+    :type u'min count': int
+    :keyword u'min n': The shortest n-grams in the results.
+    :type u'min n': int
+    :keyword u'max n': The longest n-grams in the results, or ``None`` for no limit.
+    :type u'max n': int or None
+    """
+
+    default_settings = {u'min count': 2, u'min n': 2, u'max n': None}
+
+    def __init__(self, index, settings=None):
+        """
+        :param index: The token streams, each from
+            :meth:`~vis.analyzers.indexers.ngram.NGramIndexer.tokens`.
+        :type index: :obj:`list` or :obj:`dict` of :class:`pandas.DataFrame`
+        :param settings: Any of the settings in :const:`possible_settings`.
+        :type settings: :obj:`dict` or :obj:`None`
+
+        :raises: :exc:`RuntimeError` if ``u'min count'`` is less than ``2`` or ``u'min n'`` is
+            less than ``1``.
+        """
+        super(MaximalNGramExperimenter, self).__init__(index, None)
+        self._settings = dict(MaximalNGramExperimenter.default_settings)
+        if settings is not None:
+            for setting in MaximalNGramExperimenter.possible_settings:
+                if setting in settings:
+                    self._settings[setting] = settings[setting]
+        if self._settings[u'min count'] < 2 or self._settings[u'min n'] < 1:
+            raise RuntimeError(u'MaximalNGramExperimenter needs a "min count" of 2 or more and ' +
+                               u'a "min n" of 1 or more')
+
+    def _encode(self):
+        """
+        Join the token streams into one sequence of integer units.
+
+        The unit at an offset stands for its vertical event and the step to the next offset, so
+        two runs of units are equal exactly when they hold the same n-gram, plus the same step
+        after it. Vertical events come first in the code, so units with the same vertical event
+        are sorted together. The last unit before a terminator (or the end of a stream) has step
+        code ``0``, and each run of units ends with a separator that appears nowhere else.
+
+        :returns: The units; the left context of each unit (the unit before it, or
+            :const:`_DIVERSE` at the start of a run); the vertical and step tokens of each unit
+            (``None`` for separators); the number of step codes, which a unit's code is its
+            vertical code times, plus its step code; and how many codes are units, rather than
+            separators.
+        :rtype: 5-tuple of ``list`` of int, ``list`` of int, 2-tuple of ``list``, int, and int
+        """
+        streams = self._index.itervalues() if isinstance(self._index, dict) else self._index
+        verts = []
+        steps = []
+        for stream in streams:
+            for vert, step in zip(stream[u'vertical'].values, stream[u'step'].values):
+                verts.append(vert)
+                steps.append(step)
+            verts.append(None)
+            steps.append(None)
+
+        vert_names = sorted(set(verts) - set([None]))
+        step_names = sorted(set(steps) - set([None]))
+        vert_codes = {name: i for i, name in enumerate(vert_names)}
+        step_codes = {name: i + 1 for i, name in enumerate(step_names)}
+        width = len(step_names) + 1
+        num_units = len(vert_names) * width
+
+        codes = []
+        lefts = []
+        tokens = ([], [])
+        separator = num_units
+        for i, vert in enumerate(verts):
+            if vert is None:
+                # a terminator or the end of a stream; there is only one separator between runs
+                if len(codes) > 0 and codes[-1] < num_units:
+                    codes.append(separator)
+                    lefts.append(_DIVERSE)
+                    tokens[0].append(None)
+                    tokens[1].append(None)
+                    separator += 1
+                continue
+            following = steps[i + 1]
+            codes.append(vert_codes[vert] * width +
+                         (0 if following is None else step_codes[following]))
+            lefts.append(codes[-2] if len(codes) > 1 and codes[-2] < num_units else _DIVERSE)
+            tokens[0].append(vert)
+            tokens[1].append(steps[i])
+        return codes, lefts, tokens, width, num_units
+
+    def run(self):
+        """
+        Run the :class:`MaximalNGramExperimenter`.
+
+        :returns: The maximal n-grams, with their length in the ``u'n'`` column and their number of
+            occurrences in the ``u'count'`` column, sorted from most to least common, then from
+            longest to shortest.
+        :rtype: :class:`pandas.DataFrame`
+        """
+        codes, lefts, tokens, width, num_units = self._encode()
+        codes = numpy.array(codes, dtype=numpy.int64)
+        suffixes, shared = suffix_array(codes)
+
+        # Turn shared units into shared n-gram events. After shared units, the next vertical event
+        # is also shared, unless the last shared unit has no step (because nothing follows it).
+        # Without shared units, the suffixes share one event if they start with the same vertical.
+        this = suffixes[1:]
+        other = suffixes[:-1]
+        units = shared[1:]
+        last = codes[this + numpy.maximum(units - 1, 0)]
+        lengths = numpy.zeros(len(codes), dtype=numpy.int64)
+        lengths[1:] = numpy.where(units > 0,
+                                  units + (last % width != 0),
+                                  codes[this] // width == codes[other] // width)
+        lengths[1:][(codes[this] >= num_units) | (codes[other] >= num_units)] = 0
+
+        found = self._intervals(list(suffixes), list(lengths), lefts)
+        ngrams = [u''.join([tokens[0][start]] + tokens[1][start + 1:start + length])
+                  for start, length, _ in found]
+        post = pandas.DataFrame({u'n': [length for _, length, _ in found],
+                                 u'count': [count for _, _, count in found]},
+                                index=ngrams, columns=[u'n', u'count'])
+        return post.sort_index().sort(columns=[u'count', u'n'], ascending=[False, False])
+
+    def _intervals(self, suffixes, lengths, lefts):
+        """
+        Find the maximal n-grams, by visiting every interval of the suffix array in which all the
+        suffixes share an n-gram that no other suffix has.
+
+        Each interval's n-gram is right-maximal, because its suffixes don't all share the next
+        event. It is maximal if its suffixes don't all share the previous unit either. Intervals
+        are found with a stack, as ``lengths`` rises and falls, and each one on the stack holds
+        the left context of its suffixes so far (or :const:`_DIVERSE`), which it passes on to the
+        interval that contains it when it's finished.
+
+        :returns: The start of one occurrence, the length, and the count, of each maximal n-gram
+            within the settings.
+        :rtype: ``list`` of 3-tuple of int
+        """
+        min_count = self._settings[u'min count']
+        min_n = self._settings[u'min n']
+        max_n = self._settings[u'max n']
+
+        def combine(first, second):
+            "Find the left context of two groups of suffixes."
+            if first is None or first == second:
+                return second
+            elif second is None:
+                return first
+            return _DIVERSE
+
+        post = []
+        # each entry is [length, first suffix, left context]
+        stack = [[0, 0, None]]
+        for i in xrange(1, len(suffixes) + 1):
+            stack[-1][2] = combine(stack[-1][2], lefts[suffixes[i - 1]])
+            length = lengths[i] if i < len(suffixes) else 0
+            first = i - 1
+            finished = None
+            while length < stack[-1][0]:
+                top_length, first, finished = stack.pop()
+                if finished == _DIVERSE and i - first >= min_count and top_length >= min_n and \
+                (max_n is None or top_length <= max_n):
+                    post.append((suffixes[first], top_length, i - first))
+                if length <= stack[-1][0]:
+                    stack[-1][2] = combine(stack[-1][2], finished)
+                    finished = None
+            if length > stack[-1][0]:
+                if finished is None:
+                    finished = lefts[suffixes[i - 1]]
+                stack.append([length, first, finished])
+
+        return post
@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               controllers/experimenters/sketch.py
+# Purpose:                Approximate frequency experimenter
+#
+# Copyright (C) 2013 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+.. codeauthor:: Christopher Antila <crantila@fedoraproject.org>
+
+Experimenters that estimate the frequencies (number of occurrences) of events in a fixed amount of
+memory, for corpora with too many distinct objects for the
+:class:`~vis.analyzers.experimenters.frequency.FrequencyExperimenter`.
+"""
+
+import math
+import numpy
+import pandas
+from vis.analyzers import experimenter
+
+
+class FrequencySketch(object):
+    """
+    Approximate counts of the objects in one or more indices, using a fixed amount of memory no
+    matter how many distinct objects there are. Sketches with the same ``width``, ``depth``, and
+    ``seed`` can be merged, so you may build one per piece (or per worker process) and add them
+    together afterward with :meth:`merge` or :func:`merge_sketches`.
+
+    A :class:`FrequencySketch` holds two things:
+
+    * a count-min sketch, a ``depth``-by-``width`` table of counters. Its estimate of an object's
+      count is never too low, and is too high by more than :attr:`error_bound` with probability at
+      most ``1 - confidence``.
+    * a heavy-hitters summary (the mergeable Misra-Gries or "space-saving" summary) of at most
+      ``capacity`` objects. Its count of an object is never too high, and is too low by at most
+      :attr:`missed_bound`. Any object that occurs more than :attr:`missed_bound` times is in the
+      summary, so :meth:`top` will not miss it.
+
+    .. note:: Objects are hashed with Python's built-in :func:`hash`, so only merge sketches made
+        with the same build of Python.
+    """
+
+    def __init__(self, width=262144, depth=4, capacity=10000, seed=0):
+        """
+        :param width: The number of counters in each row of the count-min sketch. The error of an
+            estimate is proportional to ``1 / width``.
+        :type width: int
+        :param depth: The number of rows in the count-min sketch. The chance of exceeding the
+            error bound falls exponentially with ``depth``.
+        :type depth: int
+        :param capacity: The most objects to keep in the heavy-hitters summary.
+        :type capacity: int
+        :param seed: Seed for the hash functions of the count-min sketch.
+        :type seed: int
+
+        :raises: :exc:`ValueError` if ``width``, ``depth``, or ``capacity`` is less than ``1``.
+        """
+        if width < 1 or depth < 1 or capacity < 1:
+            raise ValueError(u'FrequencySketch needs a positive width, depth, and capacity')
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        self.seed = seed
+        self.total = 0
+        self._table = numpy.zeros((depth, width), dtype=numpy.int64)
+        self._heavy = pandas.Series([], dtype=numpy.int64)
+        self._missed = 0
+        hashes = numpy.random.RandomState(seed).randint(1, 2 ** 31, size=(2, depth, 2))
+        # odd multipliers and arbitrary offsets for a multiply-shift family of hash functions
+        self._mult = (hashes[0, :, 0].astype(numpy.uint64) << numpy.uint64(32)) | \
+                     hashes[0, :, 1].astype(numpy.uint64) | numpy.uint64(1)
+        self._add = (hashes[1, :, 0].astype(numpy.uint64) << numpy.uint64(32)) | \
+                    hashes[1, :, 1].astype(numpy.uint64)
+
+    @property
+    def error_bound(self):
+        """
+        How much a count-min estimate may exceed the true count, with probability
+        :attr:`confidence`. This is ``e / width`` times the number of objects counted.
+        """
+        return math.e / self.width * self.total
+
+    @property
+    def confidence(self):
+        """
+        The probability that a single count-min estimate is within :attr:`error_bound`. This is
+        ``1 - e ** -depth``.
+        """
+        return 1.0 - math.exp(-self.depth)
+
+    @property
+    def missed_bound(self):
+        """
+        How much the heavy-hitters summary may undercount an object. This is at most the number of
+        objects counted divided by ``capacity + 1``, and an object not in the summary occurs at
+        most this many times.
+        """
+        return self._missed
+
+    def _columns(self, items):
+        """
+        Find the counter that each object uses in every row of the count-min sketch.
+
+        :param items: The objects.
+        :type items: sequence of hashable
+
+        :returns: The column of each object (in the second dimension) in each row (in the first).
+        :rtype: 2-dimensional :class:`numpy.ndarray` of int
+        """
+        hashes = numpy.array([hash(x) for x in items], dtype=numpy.int64).view(numpy.uint64)
+        post = numpy.empty((self.depth, len(hashes)), dtype=numpy.int64)
+        for row in xrange(self.depth):
+            mixed = (hashes * self._mult[row] + self._add[row]) >> numpy.uint64(32)
+            post[row] = mixed % numpy.uint64(self.width)
+        return post
+
+    def _check_compatible(self, other):
+        """
+        :raises: :exc:`ValueError` if ``other`` can't be merged with this sketch.
+        """
+        if (self.width, self.depth, self.capacity, self.seed) != \
+           (other.width, other.depth, other.capacity, other.seed):
+            raise ValueError(u'Only FrequencySketch objects with the same width, depth, ' +
+                             u'capacity, and seed may be merged')
+
+    def _add_heavy(self, counts, missed):
+        """
+        Merge counts into the heavy-hitters summary, then keep only the ``capacity`` most common
+        objects, decrementing the rest as in the Misra-Gries summary.
+
+        :param counts: Exact or lower-bound counts, where the index is the objects.
+        :type counts: :class:`pandas.Series`
+        :param missed: The :attr:`missed_bound` of ``counts``.
+        :type missed: int
+        """
+        combined = self._heavy.add(counts, fill_value=0).astype(numpy.int64)
+        self._missed += missed
+        if len(combined) > self.capacity:
+            cutoff = -numpy.partition(-combined.values, self.capacity)[self.capacity]
+            combined = combined[combined > cutoff] - cutoff
+            self._missed += cutoff
+        self._heavy = combined
+
+    def add_counts(self, counts):
+        """
+        Count objects, given how many times each one occurs.
+
+        :param counts: The number of occurrences, where the index is the objects, like the result
+            of :meth:`pandas.Series.value_counts`.
+        :type counts: :class:`pandas.Series`
+
+        :returns: This sketch.
+        :rtype: :class:`FrequencySketch`
+        """
+        if len(counts) == 0:
+            return self
+        counts = counts.astype(numpy.int64)
+        columns = self._columns(counts.index)
+        for row in xrange(self.depth):
+            self._table[row] += numpy.bincount(columns[row],
+                                               weights=counts.values,
+                                               minlength=self.width).astype(numpy.int64)
+        self.total += int(counts.sum())
+        self._add_heavy(counts, 0)
+        return self
+
+    def update(self, index):
+        """
+        Count the objects in an index, ignoring :obj:`numpy.NaN`.
+
+        :param index: The result of an indexer.
+        :type index: :class:`pandas.Series`
+
+        :returns: This sketch.
+        :rtype: :class:`FrequencySketch`
+        """
+        return self.add_counts(index.value_counts())
+
+    def merge(self, other):
+        """
+        Add the counts of another sketch to this one.
+
+        :param other: The sketch to add.
+        :type other: :class:`FrequencySketch`
+
+        :returns: This sketch.
+        :rtype: :class:`FrequencySketch`
+
+        :raises: :exc:`ValueError` if the two sketches have different settings.
+        """
+        self._check_compatible(other)
+        self._table += other._table  # pylint: disable=W0212
+        self.total += other.total
+        self._add_heavy(other._heavy, other._missed)  # pylint: disable=W0212
+        return self
+
+    def estimate(self, items):
+        """
+        Estimate the counts of some objects with the count-min sketch. No estimate is less than
+        the true count.
+
+        :param items: The objects to estimate.
+        :type items: sequence of hashable
+
+        :returns: The estimate of each object, where the index is the objects.
+        :rtype: :class:`pandas.Series` of int
+        """
+        items = list(items)
+        if len(items) == 0:
+            return pandas.Series([], dtype=numpy.int64)
+        columns = self._columns(items)
+        post = self._table[0][columns[0]]
+        for row in xrange(1, self.depth):
+            post = numpy.minimum(post, self._table[row][columns[row]])
+        return pandas.Series(post, index=items)
+
+    def top(self, top_x=None, threshold=None):
+        """
+        The most common objects, with bounds on their counts. As in
+        :meth:`~vis.workflow.WorkflowManager.export`, the threshold filter is applied first.
+
+        :param top_x: This is the "X" in "only show the top X results." The default is ``None``.
+        :type top_x: int
+        :param threshold: If the upper bound of a result is not greater than this number, it won't
+            be included. The default is ``None``.
+        :type threshold: number
+
+        :returns: The objects in the heavy-hitters summary, sorted by upper bound from most to
+            least common. Column ``u'lower'`` holds a count that is never too high, and ``u'upper'``
+            the least of the count-min estimate and ``lower`` plus :attr:`missed_bound`.
+        :rtype: :class:`pandas.DataFrame`
+        """
+        lower = self._heavy.sort_index()
+        upper = numpy.minimum(self.estimate(lower.index).values, lower.values + self._missed)
+        post = pandas.DataFrame({u'lower': lower.values, u'upper': upper},
+                                index=lower.index,
+                                columns=[u'lower', u'upper'])
+        if len(post) > 0:
+            order = numpy.argsort(-post[u'upper'].values, kind='mergesort')
+            post = post.iloc[order]
+        if threshold is not None:
+            post = post[post[u'upper'] > threshold]
+        if top_x is not None:
+            post = post[:top_x]
+        return post
+
+
+def merge_sketches(sketches):
+    """
+    Add up several :class:`FrequencySketch` objects, for example from different pieces or from
+    different worker processes. The sketches are not modified.
+
+    :param sketches: The sketches to add up. They must all have the same settings.
+    :type sketches: iterable of :class:`FrequencySketch`
+
+    :returns: The sum of all the sketches, or :obj:`None` if there were none.
+    :rtype: :class:`FrequencySketch`
+
+    :raises: :exc:`ValueError` if the sketches have different settings.
+    """
+    post = None
+    for each in sketches:
+        if post is None:
+            post = FrequencySketch(each.width, each.depth, each.capacity, each.seed)
+        post.merge(each)
+    return post
+
+
+class FrequencySketchExperimenter(experimenter.Experimenter):
+    """
+    Estimate the number of occurrences of things found in an index, using a fixed amount of memory.
+    Use this instead of the :class:`~vis.analyzers.experimenters.frequency.FrequencyExperimenter`
+    when there are too many distinct objects to count them all exactly.
+    """
+
+    possible_settings = [u'width', u'depth', u'capacity', u'seed']
+    """
+    :keyword u'width': The number of counters in each row of the count-min sketch.
+    :type u'width': int
+    :keyword u'depth': The number of rows in the count-min sketch.
+    :type u'depth': int
+    :keyword u'capacity': The most objects to keep in the heavy-hitters summary.
+    :type u'capacity': int
+    :keyword u'seed': Seed for the hash functions. Only sketches with the same seed can be merged.
+    :type u'seed': int
+    """
+
+    default_settings = {u'width': 262144, u'depth': 4, u'capacity': 10000, u'seed': 0}
+
+    def __init__(self, index, settings=None):
+        """
+        :param index: A list of :class:`Series`, where each one is the result of an indexer for \
+            one of the parts in this score.
+        :type index: :obj:`list` or :obj:`dict` of :class:`pandas.Series`
+        :param settings: Any of the settings in :const:`possible_settings`.
+        :type settings: :obj:`dict` or :obj:`None`
+        """
+        super(FrequencySketchExperimenter, self).__init__(index, None)
+        self._settings = dict(FrequencySketchExperimenter.default_settings)
+        if settings is not None:
+            for setting in FrequencySketchExperimenter.possible_settings:
+                if setting in settings:
+                    self._settings[setting] = settings[setting]
+
+    def run(self):
+        """
+        Run the :class:`FrequencySketchExperimenter`.
+
+        :returns: A sketch of the objects in all the parts together. Call its
+            :meth:`~FrequencySketch.top` method for the most common objects.
+        :rtype: :class:`FrequencySketch`
+        """
+        post = FrequencySketch(self._settings[u'width'],
+                               self._settings[u'depth'],
+                               self._settings[u'capacity'],
+                               self._settings[u'seed'])
+        parts = self._index.itervalues() if isinstance(self._index, dict) else self._index
+        for part in parts:
+            post.update(part)
+        return post
@@ -29,8 +29,156 @@
 The controllers that deal with indexing data from music21 Score objects.
 """
 
+import os
+import sys
+import heapq
+import warnings
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+import numpy
 import pandas
-from music21 import stream, converter
+# NB: music21 takes about a second to import, so the functions that need it import it themselves
+
+
+EXECUTORS = (u'serial', u'thread', u'process')
+"""
+The backends :meth:`Indexer._do_multiprocessing` can use to index voice combinations:
+
+* ``u'serial'``: index every combination, one after another, in the calling process.
+* ``u'thread'``: index combinations in a pool of threads.
+* ``u'process'``: index combinations in a pool of worker processes. Streams are frozen with
+    :func:`music21.converter.freeze` before they are sent to a worker.
+"""
+
+
+def _check_executor(name, workers):
+    """
+    Check the arguments of :func:`set_executor`.
+
+    :raises: :exc:`RuntimeError` if ``name`` is not in :const:`EXECUTORS`.
+    :raises: :exc:`RuntimeError` if ``workers`` is less than ``1``.
+    """
+    if name not in EXECUTORS:
+        raise RuntimeError(u'Unrecognized executor: "{}"'.format(name))
+    elif workers is not None and workers < 1:
+        raise RuntimeError(u'An executor requires at least one worker')
+
+
+def _default_executor(environ):
+    """
+    Read the default backend from the ``VIS_EXECUTOR`` and ``VIS_WORKERS`` environment variables.
+    Their values are checked like the arguments of :func:`set_executor`; if they're invalid, this
+    gives a warning and uses the ``u'serial'`` backend.
+
+    :param environ: The environment variables, like :obj:`os.environ`.
+    :type environ: dict
+
+    :returns: The name of the backend and the number of workers.
+    :rtype: dict
+    """
+    name = environ.get('VIS_EXECUTOR', u'serial')
+    workers = environ.get('VIS_WORKERS')
+    try:
+        workers = None if workers is None else int(workers)
+        _check_executor(name, workers)
+    except (ValueError, RuntimeError) as err:
+        warnings.warn(u'Ignoring VIS_EXECUTOR and VIS_WORKERS, using the serial executor: ' +
+                      unicode(err))
+        return {u'name': u'serial', u'workers': None}
+    return {u'name': name, u'workers': workers}
+
+
+# The backend and number of workers currently chosen. The defaults are read from the VIS_EXECUTOR
+# and VIS_WORKERS environment variables, and may be changed at runtime with set_executor().
+_executor = _default_executor(os.environ)
+
+
+def set_executor(name, workers=None):
+    """
+    Choose the backend that :meth:`Indexer._do_multiprocessing` uses for all indexers.
+
+    :param name: One of the names in :const:`EXECUTORS`.
+    :type name: basestring
+    :param workers: The number of threads or processes in the pool. The default, ``None``, uses
+        the number of CPUs. This is ignored by the ``u'serial'`` backend.
+    :type workers: int or None
+
+    :raises: :exc:`RuntimeError` if ``name`` is not in :const:`EXECUTORS`.
+    :raises: :exc:`RuntimeError` if ``workers`` is less than ``1``.
+    """
+    _check_executor(name, workers)
+    _executor[u'name'] = name
+    _executor[u'workers'] = workers
+
+
+def get_executor():
+    """
+    Find which backend :meth:`Indexer._do_multiprocessing` uses.
+
+    :returns: The name of the backend and the number of workers (``None`` means "use the number
+        of CPUs").
+    :rtype: 2-tuple of unicode and int or None
+    """
+    return _executor[u'name'], _executor[u'workers']
+
+
+def is_stream(obj):
+    """
+    Find whether an object is a :class:`music21.stream.Stream`. If :mod:`music21` has not been
+    imported yet, the object cannot be a :class:`Stream`, so :mod:`music21` is not imported.
+
+    :param obj: The object to check.
+    :type obj: object
+
+    :returns: Whether ``obj`` is a :class:`Stream`.
+    :rtype: boolean
+    """
+    stream = sys.modules.get('music21.stream')
+    return stream is not None and isinstance(obj, stream.Stream)
+
+
+class StreamType(object):
+    """
+    Use this for the :attr:`~Indexer.required_score_type` of an :class:`Indexer` that needs a
+    :class:`music21.stream.Stream` subclass. The class is looked up in :mod:`music21.stream` when
+    the attribute is read, so importing the indexer's module does not import :mod:`music21`.
+
+    >>> class PartIndexer(Indexer):
+    ...     required_score_type = StreamType(u'Part')
+    >>> PartIndexer.required_score_type
+    <class 'music21.stream.Part'>
+    """
+
+    def __init__(self, name):
+        """
+        :param name: The name of a class in :mod:`music21.stream`, like ``u'Part'``.
+        :type name: basestring
+        """
+        self._name = name
+
+    def __get__(self, instance, owner):
+        from music21 import stream
+        return getattr(stream, self._name)
+
+
+def _pool_indexer(args):
+    """
+    Call :func:`stream_indexer` or :func:`series_indexer`, as appropriate, with a tuple of
+    arguments. This is the module-level function that :meth:`Indexer._do_multiprocessing` gives to
+    a pool, because :meth:`Pool.map` only supplies one argument.
+
+    :param args: The arguments for :func:`stream_indexer`, followed by the "vector_func" for
+        :func:`series_indexer`.
+    :type args: 5-tuple of int, list, function, list or None, and function or None
+
+    :returns: The return value of the indexer function.
+    :rtype: 2-tuple of int and :class:`pandas.Series`
+    """
+    pipe_index, parts, indexer_func, types, vector_func = args
+    if isinstance(parts[0], basestring) or is_stream(parts[0]):
+        return stream_indexer(pipe_index, parts, indexer_func, types)
+    else:
+        return series_indexer(pipe_index, parts, indexer_func, vector_func)
 
 
 def mpi_unique_offsets(streams):
@@ -48,8 +196,65 @@ def mpi_unique_offsets(streams):
         any of the streams. Offsets are sorted from lowest to highest (start to end).
     :rtype: list of float
     """
-    offsets = ({e.offset for e in part.elements} for part in streams)
-    return sorted(set.union(*offsets))  # pylint: disable=W0142
+    # sorting a flat Stream's offsets takes linear time, since they're already in order; then a
+    # k-way merge finds the offsets of all the Streams
+    post = []
+    for offset in heapq.merge(*[sorted(e.offset for e in part.elements) for part in streams]):
+        if not post or offset != post[-1]:
+            post.append(offset)
+    return post
+
+
+def _event_sweep(part, offsets):
+    """
+    Find the event sounding at every offset in a flat :class:`Stream`, walking through the
+    :class:`Stream` only once.
+
+    The result is the same as the first element of ``part.getElementsByOffset(offset,
+    mustBeginInSpan=False)`` for every offset, but the :class:`Stream` is not searched from the
+    beginning each time. Also unlike :meth:`getElementsByOffset`, the offsets are rounded with
+    :func:`music21.common.cleanupFloat` just like the elements' offsets, so an offset like
+    ``421.99999999999994`` still finds the event at ``422.0``.
+
+    :param part: The flat :class:`Stream` in which to find events.
+    :type part: :class:`music21.stream.Stream`
+    :param offsets: The offsets at which to find events, sorted from lowest to highest.
+    :type offsets: list of float
+
+    :returns: The event at each offset.
+    :rtype: list of :class:`music21.base.Music21Object`
+
+    :raises: :exc:`IndexError` if there is no event at one of the offsets.
+    """
+    from music21 import common
+    # precompute each element's offset and end as getElementsByOffset() does
+    elements = part.elements
+    starts = []
+    ends = []
+    for elem in elements:
+        start = common.cleanupFloat(elem.getOffsetBySite(part))
+        starts.append(start)
+        ends.append(common.cleanupFloat(start + elem.duration.quarterLength))
+    post = []
+    sounding = []  # heap of the indices of elements that began at or before the current offset
+    next_elem = 0
+    for off in offsets:
+        off = common.cleanupFloat(off)
+        while next_elem < len(elements) and starts[next_elem] <= off:
+            heapq.heappush(sounding, next_elem)
+            next_elem += 1
+        # Elements that stopped sounding will never sound again, because the offsets only grow;
+        # a zero-length element only "sounds" at its own offset.
+        while sounding:
+            i = sounding[0]
+            if ends[i] < off or (ends[i] == off and starts[i] != ends[i]):
+                heapq.heappop(sounding)
+            else:
+                break
+        if not sounding:
+            raise IndexError(u'no event at offset {}'.format(off))
+        post.append(elements[sounding[0]])
+    return post
 
 
 def mpi_vert_aligner(events):
@@ -122,6 +327,7 @@ def stream_indexer(pipe_index, parts, indexer_func, types=None):
 
     # Convert "frozen" Streams, if needed; flatten the streams and filter classes
     if isinstance(parts[0], basestring):
+        from music21 import converter
         all_parts = [getter(converter.thaw(each).flat) for each in parts]
     else:
         all_parts = [getter(part.flat) for part in parts]
@@ -129,29 +335,62 @@ def stream_indexer(pipe_index, parts, indexer_func, types=None):
     # collect all unique offsets
     unique_offsets = mpi_unique_offsets(all_parts)
 
-    # in cases where there will be more than one event at an offset, we need this
-    offsets_for_series = []
+    # find the events happening at every offset in all parts, with a single pass through each part
+    all_events = [_event_sweep(part, unique_offsets) for part in all_parts]
 
-    # Convert to requested index format
-    new_series_data = []
-    for off in unique_offsets:
-        # inspired by vis.controllers.analyzer._event_finder() in vis9c
-        current_events = []
-        for part in all_parts:  # find the events happening at this offset in all parts
-            current_events.append(list(part.getElementsByOffset(off, mustBeginInSpan=False)))
+    # Index the simultaneities
+    new_series_data = [indexer_func(list(each_simul)) for each_simul in zip(*all_events)]
 
-        # Arrange groups of things to index
-        current_events = [[event[0] for event in current_events]]
+    return pipe_index, pandas.Series(new_series_data, index=unique_offsets)
 
-        # Index previously-arranged groups
-        for each_simul in current_events:
-            new_series_data.append(indexer_func(each_simul))
-            offsets_for_series.append(off)
 
-    return pipe_index, pandas.Series(new_series_data, index=offsets_for_series)
+def unique_rows(columns, indexer_func):
+    """
+    Index aligned columns by calling a row-wise indexer function only once for every distinct
+    row. Use this to write the "vector_func" of an indexer whose results depend only on the values
+    in a row, like the name of the interval between two pitches.
 
+    Parameters
+    ==========
+    :param columns: The values of every part, aligned to the same offsets.
+    :type columns: list of :class:`numpy.ndarray`
+
+    :param indexer_func: The row-wise function, which is given the values of a row in a list.
+    :type indexer_func: function
 
-def series_indexer(pipe_index, parts, indexer_func):
+    Returns
+    =======
+    :returns: The result of ``indexer_func`` for every row.
+    :rtype: :class:`numpy.ndarray` of object
+    """
+    if 0 == len(columns) or 0 == len(columns[0]):
+        return numpy.array([], dtype=object)
+    # Give every distinct row an integer code. We combine one column at a time, then squeeze the
+    # codes back into the range of the number of rows so they can't overflow.
+    all_codes = []
+    all_uniques = []
+    row_codes = None
+    for column in columns:
+        codes, uniques = pandas.factorize(column)
+        # factorize() gives -1 for NaN, but the indexer_func should receive the NaN itself
+        codes[codes < 0] = len(uniques)
+        all_codes.append(codes)
+        all_uniques.append(list(uniques) + [numpy.nan])
+        if row_codes is None:
+            row_codes = codes
+        else:
+            row_codes = numpy.unique(row_codes * (len(uniques) + 1) + codes,
+                                     return_inverse=True)[1]
+    _, first_rows, inverse = numpy.unique(row_codes, return_index=True, return_inverse=True)
+    # call the indexer_func on the first occurrence of every distinct row
+    results = numpy.empty(len(first_rows), dtype=object)
+    for i, row in enumerate(first_rows):
+        results[i] = indexer_func([col_uniques[col_codes[row]]
+                                   for col_codes, col_uniques in zip(all_codes, all_uniques)])
+    return results[inverse]
+
+
+def series_indexer(pipe_index, parts, indexer_func, vector_func=None):
     """
     Perform the indexation of a part or part combination. This is a module-level function designed
     to ease implementation of multiprocessing with the MPController module.
@@ -172,6 +411,12 @@ def series_indexer(pipe_index, parts, indexer_func):
     :param indexer_func: This function transforms found events into a unicode object.
     :type indexer_func: function
 
+    :param vector_func: This optional function transforms all the events at once. It receives a
+        list with the :class:`numpy.ndarray` of values for every part, aligned to the same offsets,
+        and returns an array with the new value at every offset. If this is ``None``, the
+        ``indexer_func`` is called once for every offset.
+    :type vector_func: function or None
+
     Returns
     =======
     :returns: The new index where each element is a unicode object and the "index" of the pandas
@@ -196,7 +441,11 @@ def series_indexer(pipe_index, parts, indexer_func):
     dframe = pandas.DataFrame(in_dict)
 
     # do the indexing
-    new_series_data = dframe.apply(indexer_func, axis=1)
+    if vector_func is not None:
+        columns = [dframe[i].values for i in xrange(len(parts))]
+        new_series_data = pandas.Series(vector_func(columns), index=dframe.index)
+    else:
+        new_series_data = dframe.apply(indexer_func, axis=1)
 
     # make the new index
     return pipe_index, new_series_data
@@ -221,6 +470,7 @@ class Indexer(object):
     # self._score
     # self._indexer_func
     # self._types
+    # self._vector_func
 
     # Ignore that we don't use the "settings" argument in this method. Subclasses handle it.
     # pylint: disable=W0613
@@ -251,6 +501,7 @@ class Indexer(object):
         self._score = score
         self._indexer_func = None
         self._types = None
+        self._vector_func = None  # the column-wise function used by series_indexer(), if any
         if hasattr(self, u'_settings'):
             if self._settings is None:
                 self._settings = {}
@@ -271,8 +522,9 @@ class Indexer(object):
 
     def _do_multiprocessing(self, combos):
         """
-        Index each part combination and await the jobs' completion. In the future, this method
-        may use multiprocessing.
+        Index each part combination and await the jobs' completion. The backend is chosen with
+        :func:`set_executor` or the ``VIS_EXECUTOR`` environment variable; refer to
+        :const:`EXECUTORS` for the possibilities.
 
         :param combos: A list of all voice combinations to be analyzed. For example:
             - ``[[0], [1], [2], [3]]``
@@ -285,19 +537,48 @@ class Indexer(object):
             of simultaneous events it will receive.
         :type combos: list of list of integers
 
-        :returns: Analysis results.
+        :returns: Analysis results, in the same order as ``combos``.
         :rtype: list of :class:`pandas.Series`
 
         ** Side Effects **
 
         Blocks until all voice combinations have completed.
+
+        .. note:: With the ``u'process'`` backend, the function in :attr:`_indexer_func` must be
+            a module-level function, so it can be pickled.
+
+        .. note:: When indexing :class:`Series`, an indexer may also set :attr:`_vector_func` to a
+            function that indexes all the offsets at once. Refer to :func:`series_indexer`. The
+            :attr:`_indexer_func` is still required for :class:`Stream` objects.
         """
-        post = []
-        # use serial processing
-        for each_combo in combos:
-            voices = [self._score[x] for x in each_combo]
-            if isinstance(self._score[0], stream.Stream):
-                post.append(stream_indexer(0, voices, self._indexer_func, self._types)[1])
-            else:
-                post.append(series_indexer(0, voices, self._indexer_func)[1])
-        return post
+        name, workers = get_executor()
+        if u'serial' == name or len(combos) < 2:
+            post = []
+            # use serial processing
+            for each_combo in combos:
+                voices = [self._score[x] for x in each_combo]
+                if is_stream(self._score[0]):
+                    post.append(stream_indexer(0, voices, self._indexer_func, self._types)[1])
+                else:
+                    post.append(series_indexer(0, voices, self._indexer_func,
+                                               self._vector_func)[1])
+            return post
+
+        score = self._score
+        if u'process' == name and is_stream(self._score[0]):
+            from music21 import converter
+            # send the worker a pathname rather than asking it to pickle the Part itself
+            score = [converter.freeze(part, u'pickle') for part in self._score]
+        jobs = [(i, [score[x] for x in each_combo], self._indexer_func, self._types,
+                 self._vector_func) for i, each_combo in enumerate(combos)]
+        pool = ThreadPool(workers) if u'thread' == name else Pool(workers)
+        try:
+            results = pool.map(_pool_indexer, jobs)
+        finally:
+            pool.close()
+            pool.join()
+            if score is not self._score:
+                for pathname in score:
+                    os.remove(pathname)
+        # Pool.map() preserves order, but we'll use the "pipe_index" to be certain
+        return [ser for _, ser in sorted(results, key=lambda result: result[0])]
@@ -34,9 +34,8 @@ same part.
 # pylint: disable=W0105
 
 import pandas
-from music21 import note, interval, pitch
 from vis.analyzers import indexer
-#from vis.analyzers.indexers.noterest import NoteRestIndexer
+from vis.analyzers.indexers import noterest
 
 
 def key_to_tuple(key):
@@ -61,6 +60,47 @@ def key_to_tuple(key):
     return int(post[0]), int(post[1])
 
 
+# Maps an (upper, lower) pair of note names to the parts of its interval label, as returned by
+# _interval_labels(). It's filled as pairs are found, and shared by every IntervalIndexer.
+_INTERVAL_TABLE = {}
+
+
+def _interval_labels(upper, lower):
+    """
+    Used internally by :func:`real_indexer`.
+
+    Use :class:`music21.interval.Interval` to find every part of the label of an interval.
+
+    :param upper: The upper note name or pitch code, or :obj:`u'Rest'`.
+    :type upper: basestring or int
+    :param lower: The lower note name or pitch code, or :obj:`u'Rest'`.
+    :type lower: basestring or int
+
+    :returns: ``None`` if either is a rest; otherwise the direction, quality, compound size, and
+        simple size of the interval.
+    :rtype: 4-tuple of unicode string, or None
+    """
+    # pitch codes from the NoteRestIndexer become note names; NaN is left for music21 to refuse
+    if not isinstance(upper, basestring) and upper == upper:
+        upper = noterest.code_to_name(upper)
+    if not isinstance(lower, basestring) and lower == lower:
+        lower = noterest.code_to_name(lower)
+    from music21 import note, interval, pitch
+    try:
+        interv = interval.Interval(note.Note(lower), note.Note(upper))
+    except pitch.PitchException:
+        return None
+    direction = u'-' if interv.direction < 0 else u''
+    # We must get all of the quality, and none of the size (important for AA, dd, etc.)
+    q_str = u''
+    for each in interv.name:
+        if each in u'AMPmd':
+            q_str += each
+    simple = u'8' if 8 == interv.generic.undirected \
+        else unicode(interv.generic.simpleUndirected)
+    return direction, q_str, unicode(interv.generic.undirected), simple
+
+
 def real_indexer(simultaneity, simple, quality):
     """
     Used internally by the :class:`IntervalIndexer` and :class:`HorizontalIntervalIndexer`.
@@ -69,11 +109,14 @@ def real_indexer(simultaneity, simple, quality):
     because of the ``u'Rest'` strings, you can compare the duration of the piece in which the two
     parts do or do not have notes sounding together.
 
+    Every pair of note names is only given to :mod:`music21` once; the result is kept for all
+    the later simultaneities, and for all settings.
+
     Parameters
     ==========
     :param simultaneity: A two-item iterable with the note names (or :class:`u'Rest'`) for the top
-        then lower voice.
-    :type simultaneity: list of basestring
+        then lower voice. Pitch codes from the :class:`NoteRestIndexer` may be used instead.
+    :type simultaneity: list of basestring or int
 
     :param simple: Whether intervals should be reduced to their single-octave version.
     :type simple: boolean
@@ -90,26 +133,20 @@ def real_indexer(simultaneity, simple, quality):
 
     if 2 != len(simultaneity):
         return None
-    else:
-        try:
-            upper, lower = simultaneity
-            interv = interval.Interval(note.Note(lower), note.Note(upper))
-        except pitch.PitchException:
-            return u'Rest'
-        post = u'-' if interv.direction < 0 else u''
-        if quality:
-            # We must get all of the quality, and none of the size (important for AA, dd, etc.)
-            q_str = u''
-            for each in interv.name:
-                if each in u'AMPmd':
-                    q_str += each
-            post += q_str
-        if simple:
-            post += u'8' if 8 == interv.generic.undirected \
-                else unicode(interv.generic.simpleUndirected)
-        else:
-            post += unicode(interv.generic.undirected)
-        return post
+    upper, lower = simultaneity
+    try:
+        labels = _INTERVAL_TABLE[(upper, lower)]
+    except KeyError:
+        labels = _interval_labels(upper, lower)
+        _INTERVAL_TABLE[(upper, lower)] = labels
+    if labels is None:
+        return u'Rest'
+    direction, q_str, compound_size, simple_size = labels
+    post = direction
+    if quality:
+        post += q_str
+    post += simple_size if simple else compound_size
+    return post
 
 
 # We give these functions to the multiprocessor; they're pickle-able, they let us choose settings,
@@ -150,6 +187,44 @@ def indexer_nq_comp(ecks):
     return real_indexer(ecks, False, False)
 
 
+# The column-wise versions of the functions above, for series_indexer(). Each distinct pair of
+# pitches is only named once.
+def vector_qual_simple(columns):
+    """
+    Used internally by the :class:`IntervalIndexer` and :class:`HorizontalIntervalIndexer`.
+
+    Call :func:`indexer_qual_simple` once for every distinct simultaneity in ``columns``.
+    """
+    return indexer.unique_rows(columns, indexer_qual_simple)
+
+
+def vector_qual_comp(columns):
+    """
+    Used internally by the :class:`IntervalIndexer` and :class:`HorizontalIntervalIndexer`.
+
+    Call :func:`indexer_qual_comp` once for every distinct simultaneity in ``columns``.
+    """
+    return indexer.unique_rows(columns, indexer_qual_comp)
+
+
+def vector_nq_simple(columns):
+    """
+    Used internally by the :class:`IntervalIndexer` and :class:`HorizontalIntervalIndexer`.
+
+    Call :func:`indexer_nq_simple` once for every distinct simultaneity in ``columns``.
+    """
+    return indexer.unique_rows(columns, indexer_nq_simple)
+
+
+def vector_nq_comp(columns):
+    """
+    Used internally by the :class:`IntervalIndexer` and :class:`HorizontalIntervalIndexer`.
+
+    Call :func:`indexer_nq_comp` once for every distinct simultaneity in ``columns``.
+    """
+    return indexer.unique_rows(columns, indexer_nq_comp)
+
+
 class IntervalIndexer(indexer.Indexer):
     """
     Use :class:`music21.interval.Interval` to create an index of the vertical (harmonic) intervals
@@ -180,7 +255,8 @@ class IntervalIndexer(indexer.Indexer):
         """
         The output format is described in :meth:`run`.
 
-        :param score: The output of :class:`NoteRestIndexer` for all parts in a piece.
+        :param score: The output of :class:`NoteRestIndexer` for all parts in a piece, with or
+            without the ``u'pitch codes'`` setting.
         :type score: list of :class:`pandas.Series`
         :param settings: Required and optional settings. See descriptions in \
             :const:`possible_settings`.
@@ -208,13 +284,17 @@ class IntervalIndexer(indexer.Indexer):
         if self._settings['quality']:
             if 'simple' == self._settings['simple or compound']:
                 self._indexer_func = indexer_qual_simple
+                self._vector_func = vector_qual_simple
             else:
                 self._indexer_func = indexer_qual_comp
+                self._vector_func = vector_qual_comp
         else:
             if 'simple' == self._settings['simple or compound']:
                 self._indexer_func = indexer_nq_simple
+                self._vector_func = vector_nq_simple
             else:
                 self._indexer_func = indexer_nq_comp
+                self._vector_func = vector_nq_comp
 
     def run(self):
         """
@@ -34,7 +34,6 @@ that should produce a score of the input.
 
 from math import fsum
 import pandas
-from music21 import stream, note, duration
 import outputlilypond
 from outputlilypond import settings as oly_settings
 from vis.analyzers import indexer
@@ -73,6 +72,7 @@ def annotate_the_note(obj):
     :returns: An annotated note.
     :rtype: :class:`music21.note.Note`
     """
+    from music21 import note
     post = note.Note()
     post.lily_invisible = True
     post.lily_markup = obj[0]
@@ -85,7 +85,7 @@ class LilyPondIndexer(indexer.Indexer):
     of the input.
     """
 
-    required_score_type = stream.Score
+    required_score_type = indexer.StreamType(u'Score')
     """
     You must provide a :class:`music21.stream.Score` to this Indexer.
     """
@@ -396,6 +396,7 @@ class PartNotesIndexer(indexer.Indexer):
                  Rest(offset=2.0, duration=1.0),
                  Note(offset=4.0, duration=1.0)]
         """
+        from music21 import stream, note, duration
         in_len = len(in_part)
         ret_part = stream.Part()
         for i in xrange(in_len):
@@ -431,6 +432,7 @@ class PartNotesIndexer(indexer.Indexer):
             constructor. Each element in the :class:`Part` is a :class:`Note`.
         :rtype: ``list`` of :class:`music21.stream.Part`
         """
+        from music21 import stream
         post = []
         for each_series in self._score:
             new_part = stream.Part()
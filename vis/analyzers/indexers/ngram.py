@@ -70,13 +70,21 @@ class NGramIndexer(indexer.Indexer):
     you provide indices of intervals above a lowest part, for example, these "stacks" become the
     figured bass signature of a single moment. Set :obj:`u'n'` to 1 for this feature. Horizontal
     events are obviously ignored.
+
+    To find n-grams of several lengths, set :obj:`u'n'` to a list like ``range(2, 9)``. The events
+    are lined up and formatted only once, then every length is found from them.
+
+    To find the n-grams of many voice combinations at once, list them in the ``u'combinations'``
+    setting instead of using ``u'vertical'`` and ``u'horizontal'``. The events of "horizontal"
+    indices shared by several combinations, like the lowest voice in many voice pairs, are then
+    formatted only once.
     """
 
     required_score_type = pandas.Series
     "The :class:`NGramIndexer` requires :class:`pandas.Series` as input."
 
     possible_settings = [u'horizontal', u'vertical', u'n', u'mark_singles', u'terminator',
-                         u'continuer']
+                         u'continuer', u'combinations']
     """
     A list of possible settings for the :class:`NGramIndexer`.
 
@@ -84,8 +92,8 @@ class NGramIndexer(indexer.Indexer):
     :type u'horizontal': ``list`` of ``int``
     :keyword u'vertical': The parts to consider as "vertical."
     :type u'vertical': ``list`` of ``int``
-    :keyword u'n': The number of "vertical" events per n-gram.
-    :type u'n': ``int``
+    :keyword u'n': The number of "vertical" events per n-gram, or a list of them.
+    :type u'n': ``int`` or ``list`` of ``int``
     :keyword u'mark_singles': Whether to use delimiters around a direction's events when
         there is only one event in that direction (e.g., the "horizontal" maps only the activity
         of a single voice). (You may also use ``u'mark singles'``).
@@ -96,10 +104,14 @@ class NGramIndexer(indexer.Indexer):
     :keyword u'continuer': When there is no "horizontal" event that corresponds to a vertical
         event, this is printed instead, to show that the previous "horizontal" event continues.
     :type u'continuer': ``basestring``
+    :keyword u'combinations': Many pairs of ``u'vertical'`` and ``u'horizontal'`` settings, for
+        which to find n-grams in one pass. When this is given, ``u'vertical'`` and
+        ``u'horizontal'`` are ignored, and :meth:`run` returns one index for every pair.
+    :type u'combinations': ``list`` of 2-tuple of ``list`` of ``int``
     """
 
     default_settings = {u'mark_singles': True, u'horizontal': [], u'terminator': [],
-                        u'continuer': u'_'}
+                        u'continuer': u'_', u'combinations': None}
     "A :obj:`dict` of default settings for the :class:`NGramIndexer`."
 
     def __init__(self, score, settings=None):
@@ -115,18 +127,28 @@ class NGramIndexer(indexer.Indexer):
         :raises: :exc:`RuntimeError` if ``score`` is the wrong type.
         :raises: :exc:`RuntimeError` if ``score`` is not a list of the same types.
         :raises: :exc:`RuntimeError` if required settings are not present in ``settings``.
-        :raises: :exc:`RuntimeError` if ``u'n'`` is less than ``1``.
+        :raises: :exc:`RuntimeError` if ``u'n'`` is less than ``1``, or is an empty list.
+        :raises: :exc:`RuntimeError` if ``u'n'`` is a list with the same value more than once.
         """
         # Check all required settings are present in the "settings" argument.
-        if settings is None or u'vertical' not in settings or u'n' not in settings:
-            msg = u'NGramIndexer requires "vertical" and "n" settings'
+        if settings is None or u'n' not in settings or \
+        (u'vertical' not in settings and settings.get(u'combinations') is None):
+            msg = u'NGramIndexer requires "vertical" (or "combinations") and "n" settings'
             raise RuntimeError(msg)
-        elif settings[u'n'] < 1:
+        n_values = [settings[u'n']] if isinstance(settings[u'n'], (int, long)) \
+                   else list(settings[u'n'])
+        if 0 == len(n_values) or min(n_values) < 1:
             msg = u'NGramIndexer requires an "n" value of at least 1'
             raise RuntimeError(msg)
+        elif len(set(n_values)) != len(n_values):
+            msg = u'NGramIndexer requires different "n" values'
+            raise RuntimeError(msg)
         else:
             self._settings = {}
-            self._settings[u'vertical'] = settings[u'vertical']
+            # the lengths of n-gram to find, for each combination; refer to _run_combination()
+            self._n_values = n_values
+            self._settings[u'vertical'] = settings.get(u'vertical')
+            self._settings[u'combinations'] = settings.get(u'combinations')
             self._settings[u'n'] = settings[u'n']
             self._settings[u'horizontal'] = settings[u'horizontal'] if u'horizontal' in settings \
                 else NGramIndexer.default_settings[u'horizontal']
@@ -266,75 +288,140 @@ class NGramIndexer(indexer.Indexer):
 
         Returns
         =======
-        :returns: A single-item list with the new index.
+        :returns: A single-item list with the new index, or with the ``u'combinations'`` setting,
+            one index for every combination, in the same order. If ``u'n'`` is a list, there are
+            indices for every value of ``n`` (in the same order) in place of each index.
         :rtype: ``list`` of :class:`pandas.Series`
         """
-        # TODO: pylint says there are too many branches; it's right
+        post = []
+        for events in self.tokens():
+            post.extend(self._slide(events))
+        return post
 
+    def tokens(self):
+        """
+        Line up and format the events of every combination, without making n-grams. The n-gram
+        of length ``n`` that starts at the ``i``th row holds the ``u'vertical'`` event of that row,
+        then the ``u'step'`` of each of the next ``n - 1`` rows. Where there is a terminator,
+        both columns hold ``None``, so no n-gram includes that row.
+
+        This is the "token stream" that n-grams are made from, for experimenters that need every
+        length of n-gram at once, like the
+        :class:`~vis.analyzers.experimenters.maximal.MaximalNGramExperimenter`.
+
+        :returns: For every combination (refer to :meth:`run`), a :class:`DataFrame` indexed by
+            offset, with the columns ``u'vertical'`` and ``u'step'``.
+        :rtype: ``list`` of :class:`pandas.DataFrame`
+        """
+        combinations = self._settings[u'combinations']
+        if combinations is None:
+            combinations = [(self._settings[u'vertical'], self._settings[u'horizontal'])]
+        # formatted "horizontal" events, by the indices they come from; refer to _format_horizs()
+        horiz_tokens = {}
         post = []
-        post_offsets = []
+        for vertical, horizontal in combinations:
+            horizontal = tuple(horizontal)
+            if len(horizontal) > 0 and horizontal not in horiz_tokens:
+                horiz_tokens[horizontal] = self._format_horizs(horizontal)
+            post.append(self._run_combination(vertical, horiz_tokens.get(horizontal)))
+        return post
+
+    def _format_horizs(self, horizontal):
+        """
+        Format the "horizontal" events of some indices, which may be shared by several
+        combinations.
+
+        :param horizontal: The indices to format, as in the ``u'horizontal'`` setting.
+        :type horizontal: ``tuple`` of ``int``
+
+        :returns: The formatted events at every offset of the indices, and the formatted event to
+            use at other offsets, where every index continues.
+        :rtype: 2-tuple of :class:`pandas.Series` and ``unicode``
+        """
+        m_singles = self._settings[u'mark_singles']
+        continuer = self._settings[u'continuer']
+        events = pandas.DataFrame({i: self._score[name] for i, name in enumerate(horizontal)})
+        events = events.fillna(value=continuer)
+        tokens = [NGramIndexer._format_horiz(list(row), m_singles)
+                  for row in zip(*[events[i].values for i in xrange(len(horizontal))])]
+        return (pandas.Series(tokens, index=events.index),
+                NGramIndexer._format_horiz([continuer] * len(horizontal), m_singles))
+
+    def _run_combination(self, vertical, horiz_tokens):
+        """
+        Line up and format the events of one combination of indices, as in :meth:`tokens`.
+
+        :param vertical: The "vertical" indices, as in the ``u'vertical'`` setting.
+        :type vertical: ``list`` of ``int``
+        :param horiz_tokens: The formatted "horizontal" events, from :meth:`_format_horizs`, or
+            ``None`` if there are no "horizontal" indices.
+        :type horiz_tokens: 2-tuple of :class:`pandas.Series` and ``unicode``, or ``None``
 
+        :returns: The ``u'vertical'`` and ``u'step'`` tokens at every offset.
+        :rtype: :class:`pandas.DataFrame`
+        """
         # for the formatting methods
         m_singles = self._settings[u'mark_singles']
         term = self._settings[u'terminator']
 
-        # Order the parts as specified. We have to track "i" and "name" separately so we have a new
-        # order for the dict but can keep self._score straight. We'll use these tuples to keep
-        # vertical and horizontal events separated in the DataFrame with a MultiIndex
-        events = {}
-        for i, name in enumerate(self._settings[u'vertical']):
-            events[(u'v', i)] = self._score[name]
-        for i, name in enumerate(self._settings[u'horizontal']):
-            events[(u'h', i)] = self._score[name]
-
-        # Make the MultiIndex and DataFrame with all events
-        events = pandas.DataFrame(events, columns=pandas.MultiIndex.from_tuples(events.keys()))
-
-        # Fill in all "vertical" NaN values with the previous value
-        for i in events[u'v'].columns:
-            # NB: still have to test the fix, as stated in issue 261
-            events.update(events.loc[:,(u'v', i)].fillna(method=u'ffill'))
-
-        # Fill in all "horizontal" NaN values with the continuer
-        if u'h' in events:
-            for i in events[u'h'].columns:
-                # NB: still have to test the fix, as stated in issue 261
-                events.update(events.loc[:,(u'h', i)].fillna(value=self._settings[u'continuer']))
-
-        # Iterate the offsets
-        for i in xrange(len(events)):
-            loop_post = None
+        # Line up all events. The "vertical" events are columns 0 to len(vertical) - 1 in the
+        # specified order, and the formatted "horizontal" events, if any, are the last column.
+        events = {i: self._score[name] for i, name in enumerate(vertical)}
+        if horiz_tokens is not None:
+            events[len(vertical)] = horiz_tokens[0]
+        events = pandas.DataFrame(events)
+
+        # Format every row exactly once, filling in all "vertical" NaN values with the previous
+        # value. A vertical event with a terminator is None, so no n-gram includes it.
+        verts = []
+        for row in zip(*[events[i].fillna(method=u'ffill').values
+                         for i in xrange(len(vertical))]):
             try:
-                # first vertical event
-                loop_post = [NGramIndexer._format_vert(list(events[u'v'].iloc[i].sort_index()),
-                                                            m_singles,
-                                                            term)]
+                verts.append(NGramIndexer._format_vert(list(row), m_singles, term))
             except RuntimeWarning:  # we hit a terminator
-                continue
-            try:
-                for j in xrange(self._settings[u'n'] - 1):  # iterate to the end of 'n'
-                    k = i + j + 1  # the index we need
-                    ilp = None  # it means "Inner Loop Post"
-                    if u'h' in events:  # are there "horizontal" events?
-                        ilp = [u' ',
-                               NGramIndexer._format_horiz(list(events[u'h'].iloc[k].sort_index()),
-                                                          m_singles),
-                               u' ',
-                               NGramIndexer._format_vert(list(events[u'v'].iloc[k].sort_index()),
-                                                         m_singles,
-                                                         term)]
-                    else:
-                        ilp = [u' ',
-                               NGramIndexer._format_vert(list(events[u'v'].iloc[k].sort_index()),
-                                                         m_singles,
-                                                         term)]
-                    loop_post.extend(ilp)
-            except (KeyError, IndexError, RuntimeWarning) as the_err:
-                if isinstance(the_err, (IndexError, KeyError)):  # end of inputted Series
-                    break
-                else:  # we hit a terminator
-                    continue
-            post.append(u''.join(loop_post))
-            post_offsets.append(events.index[i])
+                verts.append(None)
+
+        # Each event after the first in an n-gram adds a "step" with its horizontal events (if
+        # any) and its vertical events. Where there's no horizontal event, it continues.
+        if horiz_tokens is not None:
+            horizs = events[len(vertical)].fillna(value=horiz_tokens[1]).values
+            steps = [None if vert is None else u''.join([u' ', horiz, u' ', vert])
+                     for horiz, vert in zip(horizs, verts)]
+        else:
+            steps = [None if vert is None else u' ' + vert for vert in verts]
+
+        return pandas.DataFrame({u'vertical': verts, u'step': steps}, index=events.index,
+                                columns=[u'vertical', u'step'])
+
+    def _slide(self, events):
+        """
+        Find the n-grams of one combination of indices.
 
-        return [pandas.Series(post, post_offsets)]
+        :param events: The tokens of the combination, from :meth:`_run_combination`.
+        :type events: :class:`pandas.DataFrame`
+
+        :returns: The new index for every value of ``n``.
+        :rtype: ``list`` of :class:`pandas.Series`
+        """
+        verts = list(events[u'vertical'].values)
+        steps = list(events[u'step'].values)
+
+        # Slide a window of every length over the same events. "since_term" is how many events
+        # have passed since the last terminator; a window is only complete when it's at least 'n'.
+        post = []
+        for n in self._n_values:
+            ngrams = []
+            offsets = []
+            since_term = 0
+            for i, vert in enumerate(verts):
+                if vert is None:
+                    since_term = 0
+                    continue
+                since_term += 1
+                if since_term >= n:
+                    start = i - n + 1
+                    ngrams.append(u''.join([verts[start]] + steps[start + 1:i + 1]))
+                    offsets.append(events.index[start])
+            post.append(pandas.Series(ngrams, offsets))
+
+        return post
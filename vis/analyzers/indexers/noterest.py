@@ -28,9 +28,66 @@
 Index note and rest objects.
 """
 
-from music21 import stream, note
+import numpy
 from vis.analyzers import indexer
 
+
+REST_CODE = -1
+"The pitch code of a rest, when the :class:`NoteRestIndexer` uses the ``u'pitch codes'`` setting."
+
+# The accidentals a pitch code can hold. Never reorder this: the index of the accidental is part
+# of the code, so existing codes would change meaning.
+_MODIFIERS = (u'', u'#', u'-', u'##', u'--', u'###', u'---', u'####', u'----', u'~', u'`', u'#~',
+              u'-`')
+_MODIFIER_CODES = {modifier: i for i, modifier in enumerate(_MODIFIERS)}
+_STEPS = u'CDEFGAB'
+
+
+def pitch_to_code(pitch):
+    """
+    Convert a :class:`music21.pitch.Pitch` into an integer code that holds both its place on the
+    staff and its spelling, so that (for example) C-sharp and D-flat have different codes.
+
+    The code is ``16 * diatonicNoteNum + accidental``, where ``accidental`` indexes the accidental
+    of the pitch. Pitches without an octave are coded with their implicit octave.
+
+    :param pitch: The pitch to code.
+    :type pitch: :class:`music21.pitch.Pitch`
+
+    :returns: The pitch code, which is at least zero.
+    :rtype: int
+
+    :raises: :exc:`KeyError` if the pitch has an accidental that can't be coded.
+    """
+    modifier = u'' if pitch.accidental is None else pitch.accidental.modifier
+    return 16 * pitch.diatonicNoteNum + _MODIFIER_CODES[modifier]
+
+
+def code_to_name(code):
+    """
+    Convert a pitch code into the string the :class:`NoteRestIndexer` would otherwise produce.
+
+    :param code: The pitch code. Floats with an integer value, as made by :mod:`pandas` when it
+        fills in missing values, are accepted.
+    :type code: int
+
+    :returns: The :attr:`nameWithOctave` of the coded pitch, or :obj:`u'Rest'` for the
+        :const:`REST_CODE`.
+    :rtype: unicode
+
+    >>> code_to_name(pitch_to_code(pitch.Pitch(u'B-3')))
+    u'B-3'
+    >>> code_to_name(REST_CODE)
+    u'Rest'
+    """
+    code = int(code)
+    if REST_CODE == code:
+        return u'Rest'
+    diatonic, modifier = divmod(code, 16)
+    octave, step = divmod(diatonic - 1, 7)
+    return _STEPS[step] + _MODIFIERS[modifier] + unicode(octave)
+
+
 def indexer_func(obj):
     """
     Used internally by :class:`NoteRestIndexer`. Convert objects from the :mod:`music21.note` \
@@ -48,7 +105,26 @@ def indexer_func(obj):
         and octave of the :class:`music21.note.Note`.
     :rtype: :obj:`unicode`
     """
-    return u'Rest' if isinstance(obj[0], note.Rest) else unicode(obj[0].nameWithOctave)
+    return u'Rest' if obj[0].isRest else unicode(obj[0].nameWithOctave)
+
+
+def indexer_func_codes(obj):
+    """
+    Used internally by :class:`NoteRestIndexer`. Convert objects from the :mod:`music21.note` \
+    module into a pitch code.
+
+    Parameters
+    ==========
+    :param obj: A list with the object to convert.
+    :type obj: :obj:`list` of :class:`music21.note.Note` or :class:`music21.note.Rest`
+
+    Returns
+    =======
+    :returns: If the first object in the list is a :class:`music21.note.Rest`, the
+        :const:`REST_CODE`; otherwise the result of :func:`pitch_to_code`.
+    :rtype: int
+    """
+    return REST_CODE if obj[0].isRest else pitch_to_code(obj[0].pitch)
 
 
 class NoteRestIndexer(indexer.Indexer):
@@ -58,27 +134,52 @@ class NoteRestIndexer(indexer.Indexer):
 
     Rest objects are indexed as :obj:`u'Rest'`, and Note objects as the unicode-format version of
     their :attr:`pitchWithOctave` attribute.
+
+    With the ``u'pitch codes'`` setting, pitches are instead indexed as the integers made by
+    :func:`pitch_to_code`, and rests as :const:`REST_CODE`. These take less memory and are faster to
+    compare. The :class:`IntervalIndexer`, :class:`HorizontalIntervalIndexer`, and
+    :class:`FilterByRepeatIndexer` accept either form.
     """
 
-    required_score_type = stream.Part
+    required_score_type = indexer.StreamType(u'Part')
     "The :class:`NoteRestIndexer` uses :class:`Part` objects directly."
 
+    possible_settings = [u'pitch codes']
+    """
+    A list of possible settings for the :class:`NoteRestIndexer`.
+
+    :keyword boolean u'pitch codes': Whether to index pitches as integer codes rather than strings.
+    """
+
+    default_settings = {u'pitch codes': False}
+    "A dict of default settings for the :class:`NoteRestIndexer`."
+
     def __init__(self, score, settings=None):
         """
         :param score: A list of all the Parts to index.
         :type score: :obj:`list` of :class:`music21.stream.Part`
-        :param settings: This indexer uses no settings, so this is ignored.
+        :param settings: Optional settings. See descriptions in :const:`possible_settings`.
         :type settings: :obj:`dict` or :obj:`None`
 
         :raises: :exc:`RuntimeError` if :obj:`score` is not a list of the right type.
         """
+        self._settings = {}
+        if settings is not None and u'pitch codes' in settings:
+            self._settings[u'pitch codes'] = settings[u'pitch codes']
+        else:
+            self._settings[u'pitch codes'] = NoteRestIndexer.default_settings[u'pitch codes']
+
         super(NoteRestIndexer, self).__init__(score, None)
 
+        from music21 import note
         # If self._score is a Stream (subclass), change to a list of types you want to process
         self._types = [note.Note, note.Rest]
 
         # You probably do not want to change this
-        self._indexer_func = indexer_func
+        if self._settings[u'pitch codes']:
+            self._indexer_func = indexer_func_codes
+        else:
+            self._indexer_func = indexer_func
 
     def run(self):
         """
@@ -88,9 +189,13 @@ class NoteRestIndexer(indexer.Indexer):
         =======
         :returns: A list of the new indices. The index of each Series corresponds to the index of
             the Part used to generate it, in the order specified to the constructor. Each element
-            in the Series is a unicode.
+            in the Series is a unicode, or an int with the ``u'pitch codes'`` setting.
         :rtype: :obj:`list` of :obj:`pandas.Series`
         """
 
         combinations = [[x] for x in xrange(len(self._score))]  # calculate each voice separately
-        return self._do_multiprocessing(combinations)
+        post = self._do_multiprocessing(combinations)
+        if self._settings[u'pitch codes']:
+            # an empty part would otherwise be a Series of objects
+            post = [part.astype(numpy.int64) for part in post]
+        return post
@@ -30,10 +30,19 @@ potentially adding repetitions of or removing pre-existing events, without modif
 themselves.
 """
 
+import numpy
 import pandas
 from vis.analyzers import indexer
 
 
+TICKS_PER_QUARTER = 144144000
+"""
+The number of ticks in a quarter note, for the ``u'ticks'`` setting of
+:class:`FilterByOffsetIndexer`. Every multiple of ``0.001`` is a whole number of ticks, as is every
+division of a quarter note into tuplets of up to 16 and binary subdivisions down to 128ths.
+"""
+
+
 class FilterByOffsetIndexer(indexer.Indexer):
     """
     Indexer that regularizes the "offset" values of observations from other indexers.
@@ -152,16 +161,28 @@ class FilterByOffsetIndexer(indexer.Indexer):
     required_score_type = pandas.Series
     "The :class:`FilterByOffsetIndexer` uses :class:`pandas.Series` objects."
 
-    possible_settings = [u'quarterLength']
+    possible_settings = [u'quarterLength', u'ticks', u'dataframe']
     """
     A ``list`` of possible settings for the :class:`FilterByOffsetIndexer`.
 
     :keyword u'quarterLength': The quarterLength duration between observations desired in the
         output. This value must not have more than three digits to the right of the decimal
-        (i.e. 0.001 is the smallest possible value).
+        (i.e. 0.001 is the smallest possible value), unless the ``u'ticks'`` setting is used.
     :type u'quarterLength': ``float``
+    :keyword u'ticks': Whether to compare offsets as whole numbers of :const:`TICKS_PER_QUARTER`,
+        rather than as floats rounded to the millisecond. This way, events in triplets (for
+        example) are found at the offsets where they happen, and a ``u'quarterLength'`` like
+        ``1.0 / 3`` is possible.
+    :type u'ticks': ``bool``
+    :keyword u'dataframe': Whether :meth:`run` should return a single :class:`DataFrame` with
+        every part aligned to the same offsets, rather than a list of :class:`Series`. This
+        implies the ``u'ticks'`` setting.
+    :type u'dataframe': ``bool``
     """
 
+    default_settings = {u'ticks': False, u'dataframe': False}
+    "A ``dict`` of default settings for the :class:`FilterByOffsetIndexer`."
+
     def __init__(self, score, settings=None):
         """
         :param score: A list of Series you wish to filter by offset values, stored in the Index.
@@ -186,6 +207,11 @@ class FilterByOffsetIndexer(indexer.Indexer):
             raise RuntimeError(err_msg)
         else:
             self._settings[u'quarterLength'] = settings[u'quarterLength']
+        for setting in (u'ticks', u'dataframe'):
+            if setting in settings:
+                self._settings[setting] = settings[setting]
+            else:
+                self._settings[setting] = FilterByOffsetIndexer.default_settings[setting]
 
         # If self._score is a Stream (subclass), change to a list of types you want to process
         self._types = []
@@ -205,7 +231,13 @@ class FilterByOffsetIndexer(indexer.Indexer):
             every "quarterLength" after, until either the last observation in the piece, or the
             nearest multiple before.
         :rtype: :class:`pandas.DataFrame`
+
+        With the ``u'dataframe'`` setting, the parts are instead the columns of a single
+        :class:`DataFrame`, labelled as in the list given to the constructor. A part has ``NaN``
+        after its last observation, and where there are no events yet.
         """
+        if self._settings[u'ticks'] or self._settings[u'dataframe']:
+            return self._run_ticks()
         if 0 == len(self._score):
             return []
         start_offset = None
@@ -231,3 +263,49 @@ class FilterByOffsetIndexer(indexer.Indexer):
                 off_list = list(pandas.Series(range(start_offset, end_offset + step, step)).div(1000.0))  # pylint: disable=C0301
                 post.append(part.reindex(index=off_list, method='ffill'))
         return post
+
+    def _run_ticks(self):
+        """
+        Regularize the observed offsets on a grid of :const:`TICKS_PER_QUARTER`, for the
+        ``u'ticks'`` and ``u'dataframe'`` settings. All the parts share the same grid, and each is
+        filled in with one :func:`numpy.searchsorted`.
+
+        :returns: The same as :meth:`run`.
+        :rtype: ``list`` of :class:`pandas.Series` or :class:`pandas.DataFrame`
+        """
+        ticks = [numpy.round(numpy.asarray(part.index, dtype=float) * TICKS_PER_QUARTER).astype(
+                 numpy.int64) for part in self._score]
+        non_empty = [part_ticks for part_ticks in ticks if 0 < len(part_ticks)]
+        if 0 == len(non_empty):
+            if self._settings[u'dataframe']:
+                return pandas.DataFrame(columns=range(len(self._score)))
+            return [pandas.Series() for _ in xrange(len(self._score))]
+
+        # The grid starts at the first event in the piece. Each part lasts until the first grid
+        # point at or after its last event.
+        step = int(round(self._settings[u'quarterLength'] * TICKS_PER_QUARTER))
+        start = min(part_ticks[0] for part_ticks in non_empty)
+        grid = numpy.arange(start, max(part_ticks[-1] for part_ticks in non_empty) + step, step)
+        offsets = grid / float(TICKS_PER_QUARTER)
+
+        post = []
+        for i, part in enumerate(self._score):
+            if 0 == len(part.index):
+                post.append(part)
+                continue
+            length = grid.searchsorted(ticks[i][-1]) + 1
+            # the most recent event at or before every grid point, or -1 if there isn't one
+            events = ticks[i].searchsorted(grid[:length], side=u'right') - 1
+            new_part = pandas.Series(part.values[events], index=offsets[:length])
+            if events[0] < 0:
+                new_part[events < 0] = numpy.nan
+            post.append(new_part)
+
+        if self._settings[u'dataframe']:
+            # the parts already share the grid, so there's nothing for pandas to align
+            table = numpy.empty((len(grid), len(post)), dtype=object)
+            table[:] = numpy.nan
+            for i, new_part in enumerate(post):
+                table[:len(new_part), i] = new_part.values
+            return pandas.DataFrame(table, index=offsets)
+        return post
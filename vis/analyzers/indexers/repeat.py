@@ -37,21 +37,42 @@ class FilterByRepeatIndexer(indexer.Indexer):
     """
     If the same event occurs many times in a row, remove all occurrences but the one with the \
     lowest ``offset`` value (i.e., the "first" event).
+
+    With the ``u'batch'`` setting, all the parts are compared at once in a single
+    :class:`DataFrame`, rather than one at a time. Because the parts are aligned to the same offsets
+    in the :class:`DataFrame`, a ``NaN`` in the input is treated as "no event," so it doesn't
+    interrupt a repetition. Without the setting, a ``NaN`` is removed but still interrupts.
     """
 
     required_score_type = pandas.Series
     "The :class:`FilterByRepeatIndexer` requires :class:`pandas.Series` as input."
 
+    possible_settings = [u'batch']
+    """
+    A list of possible settings for the :class:`FilterByRepeatIndexer`.
+
+    :keyword boolean u'batch': Whether to filter all the parts in one :class:`DataFrame`.
+    """
+
+    default_settings = {u'batch': False}
+    "A dict of default settings for the :class:`FilterByRepeatIndexer`."
+
     def __init__(self, score, settings=None):
         """
         :param score: The indices from which to remove consecutive identical events.
         :type score: :obj:`list` of :obj:`pandas.Series`
-        :param settings: This indexer uses no settings, so this is ignored.
+        :param settings: Optional settings. See descriptions in :const:`possible_settings`.
         :type settings: :obj:`dict` or :obj:`None`
 
         :raises: :exc:`RuntimeError` if :obj:`score` is the wrong type.
         :raises: :exc:`RuntimeError` if :obj:`score` is not a list of the same types.
         """
+        self._settings = {}
+        if settings is not None and u'batch' in settings:
+            self._settings[u'batch'] = settings[u'batch']
+        else:
+            self._settings[u'batch'] = FilterByRepeatIndexer.default_settings[u'batch']
+
         super(FilterByRepeatIndexer, self).__init__(score, None)
 
         # If self._score is a Stream (subclass), change to a list of types you want to process
@@ -68,24 +89,42 @@ class FilterByRepeatIndexer(indexer.Indexer):
         =======
         :returns: A list of the new indices. The index of each Series corresponds to the index of
             the Part used to generate it, in the order specified to the constructor. Each element
-            in the Series is a :obj:`basestring`.
+            in the Series is of the same type as in the input.
         :rtype: :obj:`list` of :obj:`pandas.Series`
         """
-        # I'm relying on pandas' efficiency. In the future, maybe we should use multiprocessing?
+        if self._settings[u'batch']:
+            return self._run_batch()
+        # Keep an event where it differs from the previous one. The first event is compared with
+        # NaN, so it's always kept. Boolean indexing makes a new Series, so the input (which may be
+        # held elsewhere, like in IndexedPiece's memo) is unchanged.
         post = []
         for part in self._score:
             if len(part.index) < 2:
                 post.append(part)
-                continue
-            axe_me = []
-            prev_off = None
-            for offset in list(part.index):
-                if prev_off is None:
-                    pass  # prevent the other tests from being tried
-                elif part[offset] == part[prev_off]:
-                    axe_me.append(offset)
-                prev_off = offset
-            for axed in axe_me:
-                part[axed] = numpy.nan
-            post.append(part.dropna())
+            else:
+                post.append(part[part != part.shift(1)].dropna())
         return post
+
+    def _run_batch(self):
+        """
+        Filter every part in one :class:`DataFrame`, for the ``u'batch'`` setting.
+
+        :returns: The same as :meth:`run`.
+        :rtype: :obj:`list` of :obj:`pandas.Series`
+        """
+        if 0 == len(self._score):
+            return []
+        # Put every part into one array, aligned by offset. We find each event's row ourselves,
+        # because pandas is slow to align Series with an object-dtype index.
+        offsets = numpy.unique(numpy.concatenate([part.index.values for part in self._score]))
+        rows = [offsets.searchsorted(part.index.values) for part in self._score]
+        events = numpy.empty((len(offsets), len(self._score)), dtype=object)
+        events[:] = numpy.nan
+        for i, part in enumerate(self._score):
+            events[rows[i], i] = part.values
+        events = pandas.DataFrame(events)
+        # Compare each event with the part's previous event, wherever that was.
+        filled = events.fillna(method=u'ffill')
+        keep = (events.notnull() & (filled != filled.shift(1))).values
+        # Selecting from the input keeps its index and dtype (ints like pitch codes stay ints).
+        return [part[keep[rows[i], i]] for i, part in enumerate(self._score)]
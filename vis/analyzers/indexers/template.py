@@ -30,7 +30,6 @@ The :class:`TemplateIndexer` does nothing, and should only be used by programmer
 """
 # NOTE: you should replace my name with yours, in the "codeauthor" directive above
 
-from music21 import stream
 from vis.analyzers import indexer
 
 
@@ -63,10 +62,12 @@ class TemplateIndexer(indexer.Indexer):
     Template for an :class:`Indexer` subclass.
     """
 
-    required_score_type = stream.Part
+    required_score_type = indexer.StreamType(u'Part')
     """
     Depending on how this Indexer works, you'll either need to provide :class:`music21.stream.Part`,
-    :class:`music21.stream.Score`, or :class:`pandas.Series`.
+    :class:`music21.stream.Score`, or :class:`pandas.Series`. Name the :mod:`music21` classes with
+    :class:`~vis.analyzers.indexer.StreamType`, so importing your indexer does not import
+    :mod:`music21`.
     """
 
     possible_settings = [u'fake_setting']
@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               models/compact_corpus.py
+# Purpose:                Compact, memory-mapped NoteRestIndexer results for a whole corpus.
+#
+# Copyright (C) 2014 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+.. codeauthor:: Christopher Antila <crantila@fedoraproject.org>
+
+A compact binary format for the :class:`~vis.analyzers.indexers.noterest.NoteRestIndexer` results
+of a whole corpus. Use it through :meth:`vis.workflow.WorkflowManager.load` with the
+``u'compact'`` instruction.
+
+Rather than a :class:`pandas.Series` of unicode strings for every part of every piece, the corpus
+is held in a few flat arrays, saved as NumPy ``.npy`` files in one directory:
+
+* ``ticks.npy``: the offset of every event (``int64``), in
+  :const:`~vis.analyzers.indexers.offset.TICKS_PER_QUARTER`. Offsets that aren't a whole number of
+  ticks (usually because of rounding error in music21) are also held exactly in ``exact_at.npy``
+  and ``exact_offsets.npy``.
+* ``events.npy``: the code of every event (``uint16``), an index into the symbol table shared by
+  the whole corpus. :const:`NO_EVENT` stands for :obj:`numpy.NaN`.
+* ``parts.npy``: where each part starts and ends in those arrays.
+* ``pieces.npy``: where each piece starts and ends in ``parts.npy``.
+* ``corpus.pickle``: the symbol table and each piece's pathname and metadata.
+
+The arrays are opened with :func:`numpy.load` in memory-map mode, so several worker processes that
+open the same corpus share one copy in the operating system's page cache. An
+:class:`~vis.models.indexed_piece.IndexedPiece` attached to a corpus only decodes its own
+:class:`Series` when they're needed, and doesn't send them when it's pickled to another process.
+"""
+
+import os
+import shutil
+import tempfile
+import cPickle as pickle
+import numpy
+import pandas
+from vis.analyzers.indexers import noterest
+from vis.analyzers.indexers.offset import TICKS_PER_QUARTER
+from vis.models import score_cache
+
+CORPUS_VERSION = 1
+"Increase this when the format changes, so older corpora are not used."
+
+NO_EVENT = numpy.iinfo(numpy.uint16).max
+"The event code for :obj:`numpy.NaN`. There may be at most this many distinct events in a corpus."
+
+# the file with the symbol table and metadata
+_CORPUS_FILE = u'corpus.pickle'
+# the arrays in the directory
+_ARRAYS = (u'ticks', u'events', u'parts', u'pieces', u'exact_at', u'exact_offsets')
+
+# corpora opened in this process, so they're only opened once; refer to open_corpus()
+_OPENED = {}
+
+
+def _file_stat(pathname):
+    """
+    Find the size and modification time of a file, to know whether it changed since it was written.
+
+    :returns: The size and modification time, or ``None`` if the file can't be found.
+    :rtype: 2-tuple of int and float, or None
+    """
+    try:
+        stat = os.stat(pathname)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime)
+
+
+def write_corpus(directory, pieces):
+    """
+    Write the :class:`NoteRestIndexer` results and metadata of some pieces as a compact corpus,
+    replacing a corpus already in ``directory``.
+
+    :param directory: The directory in which to write the corpus.
+    :type directory: basestring
+    :param pieces: The pieces to write. Their :class:`NoteRestIndexer` results are computed if
+        required.
+    :type pieces: list of :class:`~vis.models.indexed_piece.IndexedPiece`
+
+    :raises: :exc:`ValueError` if there are :const:`NO_EVENT` or more distinct events.
+    """
+    # pylint: disable=W0212
+    symbols = {}
+    ticks, events, exact_at, exact_offsets = [], [], [], []
+    parts, piece_bounds, records = [0], [0], []
+    opus_counts = {}
+    for piece in pieces:
+        for series in piece.get_data([noterest.NoteRestIndexer]):
+            offsets = numpy.asarray(series.index, dtype=numpy.float64)
+            these_ticks = numpy.round(offsets * TICKS_PER_QUARTER).astype(numpy.int64)
+            inexact = numpy.nonzero(these_ticks / float(TICKS_PER_QUARTER) != offsets)[0]
+            exact_at.append(inexact + parts[-1])
+            exact_offsets.append(offsets[inexact])
+            codes, uniques = pandas.factorize(series.values)
+            lookup = numpy.array([symbols.setdefault(sym, len(symbols)) for sym in uniques] +
+                                 [NO_EVENT], dtype=numpy.int64)
+            if len(symbols) >= NO_EVENT:
+                raise ValueError(u'A compact corpus holds at most %d distinct events' % NO_EVENT)
+            ticks.append(these_ticks)
+            events.append(lookup[codes].astype(numpy.uint16))  # NaN is -1, so it's NO_EVENT
+            parts.append(parts[-1] + len(series))
+        piece_bounds.append(len(parts) - 1)
+        pathname = piece.metadata(u'pathname')
+        records.append({u'pathname': pathname, u'opus_id': piece._opus_id,
+                        u'stat': _file_stat(pathname), u'metadata': dict(piece._metadata),
+                        u'imported': piece._imported})
+        if piece._opus_id is not None:
+            opus_counts[os.path.abspath(pathname)] = \
+                max(opus_counts.get(os.path.abspath(pathname), 0), piece._opus_id + 1)
+    arrays = {u'ticks': ticks, u'events': events, u'exact_at': exact_at,
+              u'exact_offsets': exact_offsets}
+    empty = {u'ticks': numpy.int64, u'events': numpy.uint16, u'exact_at': numpy.int64,
+             u'exact_offsets': numpy.float64}
+    for name in arrays:
+        arrays[name] = numpy.concatenate(arrays[name]) if len(arrays[name]) > 0 else \
+                       numpy.array([], dtype=empty[name])
+    arrays[u'parts'] = numpy.array(parts, dtype=numpy.int64)
+    arrays[u'pieces'] = numpy.array(piece_bounds, dtype=numpy.int64)
+    by_code = [None] * len(symbols)
+    for sym, code in symbols.iteritems():
+        by_code[code] = sym
+
+    # write everything in a new directory, then replace the old one
+    parent = os.path.dirname(os.path.abspath(directory))
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    temp_dir = tempfile.mkdtemp(dir=parent)
+    try:
+        for name in _ARRAYS:
+            numpy.save(os.path.join(temp_dir, name + u'.npy'), arrays[name])
+        with open(os.path.join(temp_dir, _CORPUS_FILE), 'wb') as the_file:
+            pickle.dump({u'version': (CORPUS_VERSION, score_cache.music21_version()),
+                         u'symbols': by_code, u'pieces': records, u'opus': opus_counts},
+                        the_file, pickle.HIGHEST_PROTOCOL)
+        if os.path.isdir(directory):
+            old_dir = tempfile.mkdtemp(dir=parent)
+            os.rename(directory, os.path.join(old_dir, u'old'))
+            os.rename(temp_dir, directory)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.rename(temp_dir, directory)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+
+def open_corpus(directory):
+    """
+    Open a compact corpus, re-using the :class:`CompactCorpus` already opened in this process if
+    the corpus hasn't been written since.
+
+    :param directory: The directory of the corpus.
+    :type directory: basestring
+
+    :returns: The corpus, or ``None`` if there is no corpus in ``directory`` or it was written by
+        a different version of vis or music21.
+    :rtype: :class:`CompactCorpus` or None
+    """
+    directory = os.path.abspath(directory)
+    try:
+        stat = os.stat(os.path.join(directory, _CORPUS_FILE))
+    except OSError:
+        return None
+    # a rewritten corpus is a new file, even if its size and time are the same
+    stat = (stat.st_ino, stat.st_size, stat.st_mtime)
+    if directory not in _OPENED or _OPENED[directory][0] != stat:
+        try:
+            _OPENED[directory] = (stat, CompactCorpus(directory))
+        except RuntimeError:
+            return None
+    return _OPENED[directory][1]
+
+
+class CompactCorpus(object):
+    """
+    The :class:`NoteRestIndexer` results and metadata of many pieces, memory-mapped from the files
+    written by :func:`write_corpus`.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: The directory of the corpus.
+        :type directory: basestring
+
+        :raises: :exc:`RuntimeError` if the corpus was written by a different version of vis or
+            music21.
+        :raises: :exc:`IOError` if the corpus can't be read.
+        """
+        super(CompactCorpus, self).__init__()
+        self.directory = os.path.abspath(directory)
+        with open(os.path.join(self.directory, _CORPUS_FILE), 'rb') as the_file:
+            info = pickle.load(the_file)
+        if info[u'version'] != (CORPUS_VERSION, score_cache.music21_version()):
+            raise RuntimeError(u'This compact corpus was written by a different version')
+        self._records = info[u'pieces']
+        self._opus = info[u'opus']
+        self._where = {(os.path.abspath(rec[u'pathname']), rec[u'opus_id']): i \
+                       for i, rec in enumerate(self._records)}
+        self._symbols = numpy.empty(len(info[u'symbols']) + 1, dtype=object)
+        self._symbols[:-1] = info[u'symbols']
+        self._symbols[-1] = numpy.NaN
+        self._arrays = {}
+        for name in _ARRAYS:
+            try:
+                self._arrays[name] = numpy.load(os.path.join(self.directory, name + u'.npy'),
+                                                mmap_mode='r')
+            except ValueError:
+                # an empty array can't be memory-mapped
+                self._arrays[name] = numpy.load(os.path.join(self.directory, name + u'.npy'))
+
+    def __len__(self):
+        """
+        Return the number of pieces in the corpus.
+        """
+        return len(self._records)
+
+    @property
+    def symbols(self):
+        """
+        The symbol table: the event for each code. The last symbol, for :const:`NO_EVENT`, is
+        :obj:`numpy.NaN`.
+        """
+        return self._symbols
+
+    def pieces(self):
+        """
+        Find the pieces in the corpus.
+
+        :returns: The pathname and Opus index of every piece, in order.
+        :rtype: list of 2-tuple of unicode and int or None
+        """
+        return [(rec[u'pathname'], rec[u'opus_id']) for rec in self._records]
+
+    def find(self, pathname, opus_id=None):
+        """
+        Find a piece in the corpus, if its file hasn't changed since the corpus was written.
+
+        :param pathname: The pathname of the piece.
+        :type pathname: basestring
+        :param opus_id: The index of the :class:`Score` in an :class:`Opus`, if relevant.
+        :type opus_id: int or None
+
+        :returns: The index of the piece in the corpus, a list of the indices of every
+            :class:`Score` if the file imports as an :class:`Opus` and ``opus_id`` is ``None``, or
+            ``None`` if the piece isn't in the corpus.
+        :rtype: int or list of int or None
+        """
+        abspath = os.path.abspath(pathname)
+        if opus_id is None and abspath in self._opus:
+            post = [self.find(pathname, i) for i in xrange(self._opus[abspath])]
+            return None if None in post else post
+        stat = _file_stat(pathname)
+        post = self._where.get((abspath, opus_id))
+        if post is None or (stat is not None and stat != self._records[post][u'stat']):
+            return None
+        return post
+
+    def attach(self, piece, index):
+        """
+        Set the metadata of an :class:`IndexedPiece` from the corpus, so that its
+        :class:`NoteRestIndexer` results are read from the corpus rather than imported.
+
+        :param piece: The piece.
+        :type piece: :class:`~vis.models.indexed_piece.IndexedPiece`
+        :param index: The index of the piece in the corpus.
+        :type index: int
+        """
+        # pylint: disable=W0212
+        rec = self._records[index]
+        piece._metadata.update(rec[u'metadata'])
+        piece._imported = rec[u'imported']
+        piece._noterest_results = None
+        piece._compact = (self.directory, index)
+
+    def events(self, index):
+        """
+        The events of every part of a piece, without decoding them. The arrays are read-only views
+        of the memory-mapped corpus.
+
+        :param index: The index of the piece in the corpus.
+        :type index: int
+
+        :returns: The offset of each event in ticks, and the code of each event, for each part.
+        :rtype: list of 2-tuple of :class:`numpy.ndarray`
+        """
+        parts = self._arrays[u'parts']
+        first, last = self._arrays[u'pieces'][index:index + 2]
+        return [(self._arrays[u'ticks'][parts[i]:parts[i + 1]],
+                 self._arrays[u'events'][parts[i]:parts[i + 1]]) for i in xrange(first, last)]
+
+    def noterest(self, index):
+        """
+        Decode the :class:`NoteRestIndexer` results of a piece. They're the same as when the piece
+        was written, including the exact offsets.
+
+        :param index: The index of the piece in the corpus.
+        :type index: int
+
+        :returns: The results of :class:`NoteRestIndexer`.
+        :rtype: list of :class:`pandas.Series`
+        """
+        parts = self._arrays[u'parts']
+        exact_at = self._arrays[u'exact_at']
+        first, last = self._arrays[u'pieces'][index:index + 2]
+        post = []
+        for i, (ticks, codes) in zip(xrange(first, last), self.events(index)):
+            offsets = ticks / float(TICKS_PER_QUARTER)
+            fix_from, fix_to = numpy.searchsorted(exact_at, parts[i:i + 2])
+            offsets[exact_at[fix_from:fix_to] - parts[i]] = \
+                self._arrays[u'exact_offsets'][fix_from:fix_to]
+            post.append(pandas.Series(self._symbols[numpy.minimum(codes, len(self._symbols) - 1)],
+                                      index=offsets.astype(object)))
+        return post
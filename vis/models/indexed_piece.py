@@ -31,13 +31,124 @@ This model represents an indexed and analyzed piece of music.
 
 # Imports
 import os
-from music21 import converter, stream
+from collections import OrderedDict
+import numpy
+import pandas
 from vis.analyzers.experimenter import Experimenter
 from vis.analyzers.indexer import Indexer
 from vis.analyzers.indexers import noterest
+from vis.models import score_cache, compact_corpus, profiling
 
 
-def _find_piece_title(the_score):
+MEMO_BYTES = 2 ** 28
+"""
+The maximum number of bytes of analyzer results, and their inputs, that each :class:`IndexedPiece`
+keeps in memory. Refer to :func:`_memo_nbytes`.
+"""
+
+
+def _settings_key(settings):
+    """
+    Make a hashable version of a settings dict, for use in the key of a memoized result.
+
+    :param settings: The settings given to an analyzer.
+    :type settings: dict or None
+
+    :returns: A hashable equivalent of ``settings``.
+    :rtype: tuple
+
+    :raises: :exc:`TypeError` if there is a value that cannot be hashed.
+    """
+    if isinstance(settings, dict):
+        return (dict, tuple(sorted((key, _settings_key(val)) for key, val in settings.iteritems())))
+    elif isinstance(settings, (list, tuple)):
+        return (list, tuple(_settings_key(val) for val in settings))
+    elif settings is None:
+        return (dict, ())  # None and {} mean the same thing to an analyzer
+    hash(settings)
+    return settings
+
+
+def _input_objects(data):
+    """
+    Find the objects whose identity determines the input for an analyzer.
+
+    :param data: The input given to an analyzer.
+    :type data: list or dict or object
+
+    :returns: The objects in ``data``, and the keys if ``data`` is a dict.
+    :rtype: 2-tuple of list of object and tuple or None
+    """
+    if isinstance(data, (list, tuple)):
+        return list(data), None
+    elif isinstance(data, dict):
+        keys = tuple(sorted(data.iterkeys()))
+        return [data[key] for key in keys], keys
+    else:
+        return [data], None
+
+
+def _memo_nbytes(obj):
+    """
+    Estimate the memory used by a memoized result or its input: the values and index of every
+    :class:`Series` and :class:`DataFrame`, and every :class:`numpy.ndarray`, in ``obj``. Only the
+    references in an ``object`` array are counted, not the objects (like strings) they refer to.
+
+    :param obj: The result or input.
+    :type obj: :class:`pandas.Series`, :class:`pandas.DataFrame`, list, dict, or object
+
+    :returns: The estimated number of bytes.
+    :rtype: int
+    """
+    if isinstance(obj, pandas.MultiIndex):
+        return sum(_memo_nbytes(level) for level in obj.levels) + \
+               sum(labels.nbytes for labels in obj.labels)
+    elif isinstance(obj, pandas.Series):
+        return obj.values.nbytes + _memo_nbytes(obj.index)
+    elif isinstance(obj, pandas.DataFrame):
+        return sum(col.values.nbytes for _, col in obj.iteritems()) + \
+               _memo_nbytes(obj.index) + _memo_nbytes(obj.columns)
+    elif isinstance(obj, numpy.ndarray):
+        return obj.nbytes
+    elif isinstance(obj, (list, tuple)):
+        return sum(_memo_nbytes(each) for each in obj)
+    elif isinstance(obj, dict):
+        return sum(_memo_nbytes(each) for each in obj.itervalues())
+    else:
+        return 0
+
+
+def _shallow_copy(result):
+    """
+    Copy the container of a memoized result, so that callers who add or remove elements don't
+    change the memoized version. The elements themselves are not copied.
+    """
+    if isinstance(result, list):
+        return list(result)
+    elif isinstance(result, dict):
+        return dict(result)
+    else:
+        return result
+
+
+def _title_is_filename(the_score):
+    """
+    Find whether the title of a score is only its filename, which music21 uses when a file has no
+    title of its own.
+
+    :param the_score: The score to check.
+    :type the_score: :class:`music21.stream.Score`
+
+    :returns: Whether the title is the filename.
+    :rtype: boolean
+    """
+    if the_score.metadata is None:
+        return True
+    file_path = getattr(the_score, 'filePath', None)
+    return file_path is not None and the_score.metadata.title == os.path.basename(file_path)
+
+
+def _find_piece_title(the_score, pathname=None):
     """
     Find the title of a score. If there is none, return the filename without an extension.
 
@@ -45,6 +156,9 @@ def _find_piece_title(the_score):
     ==========
     :param the_score: The score of which to find the title.
     :type the_score: :class:`music21.stream.Score`
+    :param pathname: The pathname of the file, used instead of the score's own ``filePath``,
+        which is wrong for a score from the cache of an identical file elsewhere.
+    :type pathname: basestring or None
 
     Returns
     =======
@@ -52,9 +166,11 @@ def _find_piece_title(the_score):
     :rtype: :obj:`unicode`
     """
     # First try to get the title from a Metadata object, but if it doesn't
-    # exist, use the filename without directory.
-    if the_score.metadata is not None:
+    # exist (or is only the filename), use the filename without directory.
+    if the_score.metadata is not None and not _title_is_filename(the_score):
         post = the_score.metadata.title
+    elif pathname is not None:
+        post = os.path.basename(pathname)
     elif hasattr(the_score, 'filePath'):
         post = os.path.basename(the_score.filePath)
     else:  # if the Score was part of an Opus
@@ -151,8 +267,31 @@ class IndexedPiece(object):
         self._noterest_results = None
         self._metadata = {}
         self._opus_id = opus_id  # if the file imports as an Opus, this is the index of the Score
+        # memoized analyzer results; refer to _run_analyzer()
+        self._memo = OrderedDict()
+        # directory and index of this piece in a CompactCorpus, if it's attached to one
+        self._compact = None
         init_metadata()
 
+    def __getstate__(self):
+        """
+        Pickle the piece, but without its memoized analyzer results, or its
+        :class:`NoteRestIndexer` results if they can be read from a
+        :class:`~vis.models.compact_corpus.CompactCorpus`, so that sending the piece to another
+        process is cheap.
+        """
+        post = dict(self.__dict__)
+        del post[u'_memo']
+        if self._compact is not None:
+            post[u'_noterest_results'] = None
+        return post
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._memo = OrderedDict()
+        if not hasattr(self, u'_compact'):
+            self._compact = None
+
     def __repr__(self):
         return u''.join([u'vis.models.indexed_piece.IndexedPiece(u\'',
                          self.metadata(u'pathname'),
@@ -192,7 +331,24 @@ class IndexedPiece(object):
             ``known_opus`` if ``False``, or if ``known_opus`` is ``True`` but the file does not
             import as an :class:`Opus`.
         """
-        score = converter.parse(self.metadata('pathname'))
+        cache = score_cache.get_cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key(self.metadata('pathname'), u'score', self._opus_id)
+            score = cache.get(cache_key)
+            if score is not None:
+                if self._opus_id is not None:
+                    # a Score from an Opus doesn't set metadata, just like below
+                    return score
+                return self._import_metadata(score, known_opus)
+        from music21 import converter, stream
+        score = profiling.measure(self, u'import',
+                                  lambda: converter.parse(self.metadata('pathname')))
+        if cache is not None:
+            if self._opus_id is not None and isinstance(score, stream.Opus):
+                cache.put(cache_key, score.scores[self._opus_id])
+            elif not isinstance(score, stream.Opus):
+                cache.put(cache_key, score)
         if isinstance(score, stream.Opus):
             if known_opus is False and self._opus_id is None:
                 # unexpected Opus---can't continue
@@ -204,7 +360,25 @@ class IndexedPiece(object):
             else:
                 # we'll return the appropriate Score
                 score = score.scores[self._opus_id]
-        elif known_opus is True:
+        else:
+            score = self._import_metadata(score, known_opus)
+        return score
+
+    def _import_metadata(self, score, known_opus):
+        """
+        Set this piece's metadata from a :class:`Score` that is not part of an :class:`Opus`.
+
+        :param score: The score imported from this piece's file.
+        :type score: :class:`music21.stream.Score`
+        :param known_opus: Whether you expect the file to import as a :class:`Opus`.
+        :type known_opus: boolean
+
+        :returns: the score
+        :rtype: :class:`music21.stream.Score`
+
+        :raises: :exc:`OpusWarning` if ``known_opus`` is ``True``.
+        """
+        if known_opus is True:
             raise OpusWarning(u'You expected a music21.stream.Opus but ' + \
                               self.metadata('pathname') + u' is not an Opus '
                                   u'(refer to the IndexedPiece.get_data() documentation)')
@@ -215,7 +389,7 @@ class IndexedPiece(object):
                     if self._metadata[field] is None:
                         self._metadata[field] = u'???'
             self._metadata[u'parts'] = _find_part_names(score)
-            self._metadata[u'title'] = _find_piece_title(score)
+            self._metadata[u'title'] = _find_piece_title(score, self.metadata(u'pathname'))
             self._imported = True
         return score
 
@@ -306,7 +480,10 @@ class IndexedPiece(object):
 
         This method is used automatically by :meth:`get_data` to cache results, which avoids having
         to re-import the music21 file for every Indexer or Experimenter that uses the
-        :class:`NoteRestIndexer`.
+        :class:`NoteRestIndexer`. If there is a :class:`~vis.models.score_cache.ScoreCache`, the
+        results are also kept there, so other pieces with the same file need not import it at all.
+        If the piece is attached to a :class:`~vis.models.compact_corpus.CompactCorpus`, the
+        results are read from there instead.
 
         :param known_opus: Whether the caller knows this file will be imported as a
             :class:`music21.stream.Opus` object. Refer to the "Note about Opus Objects" in the
@@ -318,9 +495,36 @@ class IndexedPiece(object):
         """
         if known_opus is True:
             return self._import_score(known_opus=known_opus)
-        elif self._noterest_results is None:
-            data = [x for x in self._import_score().parts]
+        elif self._noterest_results is None and self._compact is not None:
+            corpus = compact_corpus.open_corpus(self._compact[0])
+            if corpus is not None:
+                self._noterest_results = corpus.noterest(self._compact[1])
+                return self._noterest_results
+            self._compact = None  # the corpus is gone, so import the file as usual
+        if self._noterest_results is None:
+            cache = score_cache.get_cache()
+            cache_key = None
+            if cache is not None:
+                cache_key = cache.key(self.metadata('pathname'), u'noterest', self._opus_id)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    self._noterest_results, metadata, self._imported = cached
+                    self._metadata.update(metadata)
+                    if metadata[u'title'] is None:
+                        self._metadata[u'title'] = os.path.splitext(
+                            os.path.basename(self.metadata(u'pathname')))[0]
+                    return self._noterest_results
+            score = self._import_score()
+            data = [x for x in score.parts]
             self._noterest_results = noterest.NoteRestIndexer(data).run()
+            if cache is not None:
+                # an identical file elsewhere has the same key, so only store what doesn't depend
+                # on this file's pathname
+                metadata = dict(self._metadata)
+                del metadata[u'pathname']
+                if self._imported and _title_is_filename(score):
+                    metadata[u'title'] = None  # it's the filename
+                cache.put(cache_key, (self._noterest_results, metadata, self._imported))
         return self._noterest_results
 
     @staticmethod
@@ -398,23 +602,83 @@ class IndexedPiece(object):
         IndexedPiece._type_verifier(analyzer_cls)
         if data is None:
             if analyzer_cls[0] is noterest.NoteRestIndexer:
-                data = self._get_note_rest_index(known_opus=known_opus)
-            # NB: Experimenter subclasses don't have "required_score_type"
-            elif hasattr(analyzer_cls[0], 'required_score_type') and \
-            analyzer_cls[0].required_score_type == stream.Part:
-                data = self._import_score(known_opus=known_opus)
-                data = [x for x in data.parts]  # Indexers require a list of Parts
-            elif analyzer_cls[0].required_score_type == stream.Score:  # TODO: test this
-                data = [self._import_score()]  # TODO: test this
+                data = profiling.measure(self, u'NoteRestIndexer',
+                                         lambda: self._get_note_rest_index(known_opus=known_opus),
+                                         memoized=self._noterest_results is not None)
             else:
-                msg = u'{} is missing required data from another analyzer.'.format(analyzer_cls[0])
-                raise RuntimeError(msg)
+                from music21 import stream
+                # NB: Experimenter subclasses don't have "required_score_type"
+                score_type = getattr(analyzer_cls[0], 'required_score_type', None)
+                if score_type == stream.Part:
+                    data = self._import_score(known_opus=known_opus)
+                    data = [x for x in data.parts]  # Indexers require a list of Parts
+                elif score_type == stream.Score:  # TODO: test this
+                    data = [self._import_score()]  # TODO: test this
+                else:
+                    msg = u'{} is missing required data from another analyzer.'.format(
+                        analyzer_cls[0])
+                    raise RuntimeError(msg)
+            from_score = True
+        else:
+            from_score = False
         if len(analyzer_cls) > 1:
             if analyzer_cls[0] is noterest.NoteRestIndexer:
                 return self.get_data(analyzer_cls[1:], settings, data)
-            return self.get_data(analyzer_cls[1:], settings, analyzer_cls[0](data, settings).run())
+            return self.get_data(analyzer_cls[1:], settings,
+                                 self._run_analyzer(analyzer_cls[0], settings, data, from_score))
         else:
             if analyzer_cls[0] is noterest.NoteRestIndexer:
                 return data
             else:
-                return analyzer_cls[0](data, settings).run()
+                return self._run_analyzer(analyzer_cls[0], settings, data, from_score)
+
+    def _run_analyzer(self, analyzer_cls, settings, data, from_score=False):
+        """
+        Run an analyzer, or return its memoized result if it already ran on the same input with
+        the same settings.
+
+        Results are memoized by analyzer class, settings, and input. When the input comes from the
+        score, we know it's always the same, and otherwise we use the identity of the objects in
+        the input (for example, the :class:`Series` returned by a previous analyzer). Since the
+        input is kept in the memo too, it's counted with the result, even though it's usually
+        held elsewhere as well. When the results and inputs use more than :const:`MEMO_BYTES`,
+        the least-recently used are forgotten; a result too big for the memo isn't kept at all.
+
+        :param analyzer_cls: The analyzer to run.
+        :type analyzer_cls: type
+        :param settings: Settings for the analyzer.
+        :type settings: dict or None
+        :param data: Input for the analyzer.
+        :type data: list of :class:`pandas.Series` or :class:`pandas.DataFrame`
+        :param from_score: Whether ``data`` was imported from this piece's score.
+        :type from_score: boolean
+
+        :returns: Results of the analyzer.
+        :rtype: :class:`pandas.DataFrame` or list of :class:`pandas.Series`
+        """
+        run = lambda: analyzer_cls(data, settings).run()
+        try:
+            setts_key = _settings_key(settings)
+        except TypeError:
+            # we can't tell whether the settings are the same, so run the analyzer every time
+            return profiling.measure(self, analyzer_cls, run, data)
+        if from_score:
+            inputs = []
+            key = (analyzer_cls, setts_key, None, None)
+        else:
+            inputs, names = _input_objects(data)
+            key = (analyzer_cls, setts_key, tuple(id(obj) for obj in inputs), names)
+        if key in self._memo:
+            memo_inputs, result, nbytes = self._memo.pop(key)
+            # an object's id() may be re-used once the object is gone, so check they're the same
+            if len(memo_inputs) == len(inputs) and \
+            all(memo is obj for memo, obj in zip(memo_inputs, inputs)):
+                self._memo[key] = (memo_inputs, result, nbytes)  # now the most-recently used
+                return profiling.measure(self, analyzer_cls, lambda: _shallow_copy(result), data,
+                                         memoized=True)
+        result = profiling.measure(self, analyzer_cls, run, data)
+        self._memo[key] = (inputs, result, _memo_nbytes(result) + _memo_nbytes(inputs))
+        total = sum(nbytes for _, _, nbytes in self._memo.itervalues())
+        while total > MEMO_BYTES:
+            total -= self._memo.popitem(last=False)[1][2]
+        return _shallow_copy(result)
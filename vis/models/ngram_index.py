@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               models/ngram_index.py
+# Purpose:                An inverted index of where every n-gram occurs in a corpus.
+#
+# Copyright (C) 2014 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+.. codeauthor:: Christopher Antila <crantila@fedoraproject.org>
+
+An inverted index of the :class:`~vis.analyzers.indexers.ngram.NGramIndexer` results of a whole
+corpus, to find where an n-gram occurs without analyzing the corpus again. Write one with
+:meth:`vis.workflow.WorkflowManager.export` and the ``u'n-gram index'`` format, after running the
+``u'interval n-grams'`` experiment with ``count frequency`` set to ``False``.
+
+For every distinct n-gram, the index holds a "posting" for each of its occurrences: the piece, the
+voice combination, and the offset. The index is saved as NumPy ``.npy`` files in one directory:
+
+* ``terms.npy``: every distinct n-gram, sorted, so an n-gram or a prefix is found with a binary
+  search.
+* ``starts.npy``: where the postings of each n-gram start and end in the arrays below.
+* ``pieces.npy``, ``combinations.npy``, and ``offsets.npy``: the piece, voice combination, and
+  offset of every posting, sorted by n-gram, then piece, combination, and offset.
+* ``index.pickle``: the pathname of every piece, and the name of every voice combination.
+
+The arrays are opened with :func:`numpy.load` in memory-map mode, so opening an index is quick
+however large the corpus, and a query only reads the postings it needs.
+
+Postings are returned as a :class:`pandas.DataFrame` with the columns in :const:`COLUMNS`:
+
+* ``u'n-gram'``: the n-gram.
+* ``u'piece'``: the index of the piece in :meth:`NGramIndex.pieces`.
+* ``u'combination'``: the voice combination, like ``u'0,3'``.
+* ``u'offset'``: the offset of the n-gram's first event.
+"""
+
+import os
+import shutil
+import tempfile
+import cPickle as pickle
+import numpy
+import pandas
+
+INDEX_VERSION = 1
+"Increase this when the format changes, so older indices are not used."
+
+COLUMNS = [u'n-gram', u'piece', u'combination', u'offset']
+"The columns of the :class:`DataFrame` returned by every query."
+
+# the file with the pieces and combinations
+_INDEX_FILE = u'index.pickle'
+# the arrays in the directory
+_ARRAYS = (u'terms', u'starts', u'pieces', u'combinations', u'offsets')
+
+# indices opened in this process, so they're only opened once; refer to open_index()
+_OPENED = {}
+
+
+def write_index(directory, pieces, results):
+    """
+    Write an inverted index of the n-grams in some pieces, replacing an index already in
+    ``directory``.
+
+    :param directory: The directory in which to write the index.
+    :type directory: basestring
+    :param pieces: The pieces.
+    :type pieces: list of :class:`~vis.models.indexed_piece.IndexedPiece`
+    :param results: For each piece, the :class:`NGramIndexer` result of every voice combination.
+        The name of each :class:`Series` is used as the name of its voice combination; a
+        :class:`Series` without a name is named for its position in the list.
+    :type results: list of list of :class:`pandas.Series`
+
+    :raises: :exc:`ValueError` if there are not as many results as pieces.
+    """
+    # pylint: disable=W0212
+    if len(pieces) != len(results):
+        raise ValueError(u'There must be one list of n-grams for every piece')
+    combinations = {}
+    terms, piece_ids, combo_ids, offsets = [], [], [], []
+    for i, result in enumerate(results):
+        for j, series in enumerate(result):
+            name = unicode(j) if series.name is None else unicode(series.name)
+            code = combinations.setdefault(name, len(combinations))
+            terms.append(numpy.asarray(series.values, dtype=object))
+            piece_ids.append(numpy.repeat(numpy.int32(i), len(series)))
+            combo_ids.append(numpy.repeat(numpy.int32(code), len(series)))
+            offsets.append(numpy.asarray(series.index, dtype=numpy.float64))
+    if len(terms) > 0:
+        terms, piece_ids, combo_ids, offsets = [numpy.concatenate(x) for x in
+                                                (terms, piece_ids, combo_ids, offsets)]
+    else:
+        terms = numpy.array([], dtype=object)
+        piece_ids = numpy.array([], dtype=numpy.int32)
+        combo_ids = numpy.array([], dtype=numpy.int32)
+        offsets = numpy.array([], dtype=numpy.float64)
+
+    # number the distinct n-grams in sorted order, then sort the postings by them
+    codes, uniques = pandas.factorize(terms)
+    uniques = numpy.array([unicode(x) for x in uniques], dtype=numpy.unicode_) \
+              if len(uniques) > 0 else numpy.array([], dtype=u'U1')
+    order = numpy.argsort(uniques, kind='mergesort')
+    ranks = numpy.empty(len(order), dtype=numpy.int64)
+    ranks[order] = numpy.arange(len(order))
+    codes = ranks[codes]
+    sort = numpy.lexsort((offsets, combo_ids, piece_ids, codes))
+    arrays = {u'terms': uniques[order],
+              u'starts': numpy.searchsorted(codes[sort], numpy.arange(len(order) + 1)),
+              u'pieces': piece_ids[sort], u'combinations': combo_ids[sort],
+              u'offsets': offsets[sort]}
+    arrays[u'starts'] = arrays[u'starts'].astype(numpy.int64)
+    by_code = [None] * len(combinations)
+    for name, code in combinations.iteritems():
+        by_code[code] = name
+    records = [(piece.metadata(u'pathname'), piece._opus_id) for piece in pieces]
+
+    # write everything in a new directory, then replace the old one
+    parent = os.path.dirname(os.path.abspath(directory))
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    temp_dir = tempfile.mkdtemp(dir=parent)
+    try:
+        for name in _ARRAYS:
+            numpy.save(os.path.join(temp_dir, name + u'.npy'), arrays[name])
+        with open(os.path.join(temp_dir, _INDEX_FILE), 'wb') as the_file:
+            pickle.dump({u'version': INDEX_VERSION, u'pieces': records,
+                         u'combinations': by_code},
+                        the_file, pickle.HIGHEST_PROTOCOL)
+        if os.path.isdir(directory):
+            old_dir = tempfile.mkdtemp(dir=parent)
+            os.rename(directory, os.path.join(old_dir, u'old'))
+            os.rename(temp_dir, directory)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.rename(temp_dir, directory)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+
+def open_index(directory):
+    """
+    Open an n-gram index, re-using the :class:`NGramIndex` already opened in this process if the
+    index hasn't been written since.
+
+    :param directory: The directory of the index.
+    :type directory: basestring
+
+    :returns: The index, or ``None`` if there is no index in ``directory`` or it was written by a
+        different version of vis.
+    :rtype: :class:`NGramIndex` or None
+    """
+    directory = os.path.abspath(directory)
+    try:
+        stat = os.stat(os.path.join(directory, _INDEX_FILE))
+    except OSError:
+        return None
+    # a rewritten index is a new file, even if its size and time are the same
+    stat = (stat.st_ino, stat.st_size, stat.st_mtime)
+    if directory not in _OPENED or _OPENED[directory][0] != stat:
+        try:
+            _OPENED[directory] = (stat, NGramIndex(directory))
+        except RuntimeError:
+            return None
+    return _OPENED[directory][1]
+
+
+class NGramIndex(object):
+    """
+    Where every n-gram occurs in a corpus, memory-mapped from the files written by
+    :func:`write_index`.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: The directory of the index.
+        :type directory: basestring
+
+        :raises: :exc:`RuntimeError` if the index was written by a different version of vis.
+        :raises: :exc:`IOError` if the index can't be read.
+        """
+        super(NGramIndex, self).__init__()
+        self.directory = os.path.abspath(directory)
+        with open(os.path.join(self.directory, _INDEX_FILE), 'rb') as the_file:
+            info = pickle.load(the_file)
+        if info[u'version'] != INDEX_VERSION:
+            raise RuntimeError(u'This n-gram index was written by a different version')
+        self._pieces = info[u'pieces']
+        self._combinations = numpy.array(info[u'combinations'] + [None], dtype=object)
+        self._arrays = {}
+        for name in _ARRAYS:
+            try:
+                self._arrays[name] = numpy.load(os.path.join(self.directory, name + u'.npy'),
+                                                mmap_mode='r')
+            except ValueError:
+                # an empty array can't be memory-mapped
+                self._arrays[name] = numpy.load(os.path.join(self.directory, name + u'.npy'))
+        # the n-gram of every posting, computed when it's first needed; refer to _term_ids()
+        self._posting_terms = None
+
+    def __len__(self):
+        """
+        Return the number of distinct n-grams.
+        """
+        return len(self._arrays[u'terms'])
+
+    def pieces(self):
+        """
+        Find the pieces in the index.
+
+        :returns: The pathname and Opus index of every piece, in order.
+        :rtype: list of 2-tuple of unicode and int or None
+        """
+        return list(self._pieces)
+
+    def _term_range(self, prefix, exact):
+        """
+        Find the n-grams that start with, or are, some text.
+
+        :returns: The position of the first such n-gram in ``terms.npy``, and one after the last.
+        :rtype: 2-tuple of int
+        """
+        terms = self._arrays[u'terms']
+        if 0 == len(terms):
+            return 0, 0
+        width = terms.dtype.itemsize // numpy.dtype(u'U1').itemsize
+        if len(prefix) > width:
+            # NumPy would shorten the text to compare it, but no n-gram is this long
+            return 0, 0
+        first = int(numpy.searchsorted(terms, prefix, side='left'))
+        if exact or len(prefix) == width:
+            # no n-gram is longer than "width," so only an equal one can start with the prefix
+            last = int(numpy.searchsorted(terms, prefix, side='right'))
+        else:
+            last = int(numpy.searchsorted(terms, prefix + u'\uffff', side='left'))
+        return first, last
+
+    def _postings(self, positions, term_ids):
+        """
+        Make the :class:`DataFrame` of some postings.
+
+        :param positions: The positions of the postings in the arrays.
+        :type positions: :class:`numpy.ndarray` of int
+        :param term_ids: The position of each posting's n-gram in ``terms.npy``.
+        :type term_ids: :class:`numpy.ndarray` of int
+
+        :returns: The postings.
+        :rtype: :class:`pandas.DataFrame`
+        """
+        terms = self._arrays[u'terms']
+        return pandas.DataFrame({u'n-gram': numpy.array([unicode(terms[i]) for i in term_ids],
+                                                        dtype=object),
+                                 u'piece': numpy.asarray(self._arrays[u'pieces'][positions]),
+                                 u'combination': self._combinations[numpy.asarray(
+                                     self._arrays[u'combinations'][positions], dtype=numpy.int64)],
+                                 u'offset': numpy.asarray(self._arrays[u'offsets'][positions])},
+                                columns=COLUMNS)
+
+    def _range_postings(self, first, last):
+        "Make the :class:`DataFrame` of the postings of the n-grams from ``first`` to ``last``."
+        starts = self._arrays[u'starts'][first:last + 1]
+        if 0 == len(starts):
+            return self._postings(numpy.array([], dtype=numpy.int64), [])
+        positions = numpy.arange(starts[0], starts[-1])
+        term_ids = numpy.repeat(numpy.arange(first, last), numpy.diff(starts))
+        return self._postings(positions, term_ids)
+
+    def ngrams(self, prefix=u''):
+        """
+        Find the distinct n-grams, in sorted order.
+
+        :param prefix: Only find the n-grams that start with this. The default finds them all.
+        :type prefix: basestring
+
+        :returns: The n-grams.
+        :rtype: list of unicode
+        """
+        first, last = self._term_range(unicode(prefix), False)
+        return [unicode(x) for x in self._arrays[u'terms'][first:last]]
+
+    def lookup(self, ngram):
+        """
+        Find where an n-gram occurs.
+
+        :param ngram: The n-gram.
+        :type ngram: basestring
+
+        :returns: Every occurrence, sorted by piece, combination, and offset.
+        :rtype: :class:`pandas.DataFrame`
+        """
+        return self._range_postings(*self._term_range(unicode(ngram), True))
+
+    def prefix(self, prefix):
+        """
+        Find where the n-grams that start with some text occur.
+
+        :param prefix: The start of the n-grams.
+        :type prefix: basestring
+
+        :returns: Every occurrence, sorted by n-gram, then piece, combination, and offset.
+        :rtype: :class:`pandas.DataFrame`
+        """
+        return self._range_postings(*self._term_range(unicode(prefix), False))
+
+    def _term_ids(self):
+        "Return the position in ``terms.npy`` of every posting's n-gram."
+        if self._posting_terms is None:
+            self._posting_terms = numpy.repeat(numpy.arange(len(self)),
+                                               numpy.diff(self._arrays[u'starts']))
+        return self._posting_terms
+
+    def shared(self, piece, others=None):
+        """
+        Find the n-grams of a piece that also occur in other pieces, like the contrapuntal modules
+        of a Kyrie that also appear in another movement of the same mass.
+
+        :param piece: The index of the piece in :meth:`pieces`.
+        :type piece: int
+        :param others: The indices of the pieces in which to look for the n-grams. The default is
+            to look in every other piece.
+        :type others: list of int
+
+        :returns: Every occurrence in ``piece`` of an n-gram that also occurs in one of ``others``,
+            sorted by n-gram, then combination and offset.
+        :rtype: :class:`pandas.DataFrame`
+        """
+        if 0 == len(self):
+            return self._range_postings(0, 0)
+        term_ids = self._term_ids()
+        piece_ids = numpy.asarray(self._arrays[u'pieces'])
+        mine = piece_ids == piece
+        if others is None:
+            theirs = ~mine
+        else:
+            theirs = numpy.in1d(piece_ids, numpy.array(others, dtype=numpy.int64)) & ~mine
+        in_others = numpy.bincount(term_ids[theirs], minlength=len(self)) > 0
+        positions = numpy.nonzero(mine & in_others[term_ids])[0]
+        return self._postings(positions, term_ids[positions])
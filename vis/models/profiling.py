@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               models/profiling.py
+# Purpose:                Measure the time and memory used by each stage of an analysis.
+#
+# Copyright (C) 2014 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+.. codeauthor:: Christopher Antila <crantila@fedoraproject.org>
+
+Measure the time and memory used by each stage of an analysis: importing a score, and every
+analyzer that :meth:`~vis.models.indexed_piece.IndexedPiece.get_data` runs.
+
+Nothing is measured unless you choose a :class:`Profiler` with :func:`set_profiler`. Each
+measurement is a dict with the keys in :const:`COLUMNS`:
+
+* ``u'piece'``: the pathname of the piece.
+* ``u'opus id'``: the index of the piece in its :class:`~music21.stream.Opus`, or ``None``.
+* ``u'stage'``: ``u'import'`` when a file is imported, the name of an analyzer's class, or the
+    name of a :class:`~vis.workflow.WorkflowManager` step (``u'load'`` or ``u'run'``) that covers
+    every stage of one piece.
+* ``u'depth'``: how many other stages were running when this one started. Stages run by another
+    stage are included in its times, so add the times of a single depth to avoid counting them
+    twice.
+* ``u'wall'``: the elapsed time, in seconds.
+* ``u'cpu'``: the processor time used by this process, in seconds.
+* ``u'rss'``: how much the stage raised the process' peak resident memory, in bytes. This is
+    ``None`` where the :mod:`resource` module is missing.
+* ``u'rows in'`` and ``u'rows out'``: the total length of the :mod:`pandas` objects given to and
+    returned by the stage, or ``None`` if they aren't :mod:`pandas` objects.
+* ``u'memoized'``: whether the result was found without running the stage again.
+* ``u'process'``: the ID of the process in which the stage ran.
+"""
+
+import os
+import sys
+from timeit import default_timer
+import pandas
+try:
+    import resource
+except ImportError:
+    resource = None
+
+COLUMNS = [u'piece', u'opus id', u'stage', u'depth', u'wall', u'cpu', u'rss', u'rows in',
+           u'rows out', u'memoized', u'process']
+"The keys of every measurement, in the order of the columns of :meth:`Profiler.dataframe`."
+
+
+def _cpu_time():
+    "Return the processor time used by this process so far, in seconds."
+    times = os.times()
+    return times[0] + times[1]
+
+
+def _peak_rss():
+    "Return the peak resident memory of this process so far, in bytes, or ``None``."
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kibibytes, but OS X reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def count_rows(data):
+    """
+    Find the total length of the :mod:`pandas` objects in an analyzer's input or output.
+
+    :param data: The input or output.
+    :type data: :class:`pandas.Series`, :class:`pandas.DataFrame`, or a list or dict of them
+
+    :returns: The total length, or ``None`` if ``data`` holds something else.
+    :rtype: int or None
+    """
+    if isinstance(data, (pandas.Series, pandas.DataFrame)):
+        return len(data)
+    elif isinstance(data, dict):
+        data = data.values()
+    if isinstance(data, (list, tuple)) and \
+    all(isinstance(x, (pandas.Series, pandas.DataFrame)) for x in data):
+        return sum(len(x) for x in data)
+    return None
+
+
+class Profiler(object):
+    """
+    Hold the measurements of every stage run while this is the current profiler (refer to
+    :func:`set_profiler`).
+    """
+
+    def __init__(self, callback=None):
+        """
+        :param callback: A function called with every measurement, as soon as it is made.
+        :type callback: callable or None
+        """
+        super(Profiler, self).__init__()
+        self._records = []
+        self._callback = callback
+        self._depth = 0
+
+    def __len__(self):
+        "Return the number of measurements."
+        return len(self._records)
+
+    def measure(self, piece, stage, func, data=None, memoized=False):
+        """
+        Call a function, then record how long it took.
+
+        :param piece: The piece being analyzed.
+        :type piece: :class:`~vis.models.indexed_piece.IndexedPiece`
+        :param stage: The name of the stage, or the analyzer class whose name to use.
+        :type stage: unicode or type
+        :param func: The function that runs the stage, without arguments.
+        :type func: callable
+        :param data: The input to the stage, for counting rows.
+        :type data: object
+        :param memoized: Whether ``func`` only returns a result found before.
+        :type memoized: boolean
+
+        :returns: What ``func`` returns.
+        :rtype: object
+        """
+        depth = self._depth
+        self._depth += 1
+        rss = _peak_rss()
+        cpu = _cpu_time()
+        wall = default_timer()
+        try:
+            result = func()
+        finally:
+            self._depth -= 1
+        wall = default_timer() - wall
+        cpu = _cpu_time() - cpu
+        if rss is not None:
+            rss = _peak_rss() - rss
+        self.add([{u'piece': piece.metadata(u'pathname'),
+                   u'opus id': piece._opus_id,  # pylint: disable=W0212
+                   u'stage': stage if isinstance(stage, basestring) else stage.__name__,
+                   u'depth': depth, u'wall': wall, u'cpu': cpu, u'rss': rss,
+                   u'rows in': count_rows(data), u'rows out': count_rows(result),
+                   u'memoized': memoized, u'process': os.getpid()}])
+        return result
+
+    def add(self, records):
+        """
+        Add measurements, like those made in another process, and give each to the callback.
+
+        :param records: The measurements.
+        :type records: list of dict
+        """
+        for record in records:
+            self._records.append(record)
+            if self._callback is not None:
+                self._callback(record)
+
+    def records(self):
+        """
+        :returns: Every measurement, in the order they were made.
+        :rtype: list of dict
+        """
+        return list(self._records)
+
+    def dataframe(self):
+        """
+        :returns: Every measurement, one per row, in the order they were made.
+        :rtype: :class:`pandas.DataFrame`
+        """
+        return pandas.DataFrame(self._records, columns=COLUMNS)
+
+
+# The profiler currently used by IndexedPiece, if any, chosen with set_profiler().
+_profiler = {u'profiler': None}
+
+
+def set_profiler(profiler):
+    """
+    Choose the :class:`Profiler` in which every :class:`IndexedPiece` records its measurements.
+
+    :param profiler: The profiler, or ``None`` to stop measuring.
+    :type profiler: :class:`Profiler` or None
+
+    :returns: The profiler that was used before, or ``None``.
+    :rtype: :class:`Profiler` or None
+    """
+    previous = _profiler[u'profiler']
+    _profiler[u'profiler'] = profiler
+    return previous
+
+
+def get_profiler():
+    """
+    :returns: The :class:`Profiler` used by every :class:`IndexedPiece`, or ``None`` if nothing is
+        measured.
+    :rtype: :class:`Profiler` or None
+    """
+    return _profiler[u'profiler']
+
+
+def measure(piece, stage, func, data=None, memoized=False):
+    """
+    Call a function, and record how long it took if there is a :class:`Profiler`. Refer to
+    :meth:`Profiler.measure` for the arguments.
+    """
+    if _profiler[u'profiler'] is None:
+        return func()
+    return _profiler[u'profiler'].measure(piece, stage, func, data, memoized)
@@ -0,0 +1,411 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               models/result_store.py
+# Purpose:                Columnar, on-disk store of analysis results.
+#
+# Copyright (C) 2013 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+.. codeauthor:: Christopher Antila <crantila@fedoraproject.org>
+
+A persistent store of analysis results, so an analyzed corpus can be reopened without importing
+or indexing it again. Use it through :meth:`vis.workflow.WorkflowManager.load` with the
+``u'store'`` instruction.
+
+Results are stored by column: every :class:`pandas.Series` in a result is saved as separate
+NumPy ``.npy`` files for its index and its values. Reading a result only reads the columns you ask
+for, and numeric arrays are memory-mapped rather than read into memory. Columns of objects (like
+the strings from most indexers) are dictionary-encoded: the distinct objects are stored once, and
+the values are stored as integer codes into that list.
+
+The directory holds one subdirectory per piece, named for a hash of the piece's pathname and Opus
+index. It holds the piece's metadata and :class:`NoteRestIndexer` results, and one subdirectory
+per result, named for a hash of the result's name and settings. A piece's results are ignored when
+its file has changed (by size or modification time) or when music21, pandas, or the store's format
+has changed.
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+import cPickle as pickle
+import numpy
+import pandas
+from vis.models import indexed_piece, score_cache
+
+STORE_VERSION = 1
+"Increase this when the format of the store changes, so older results are ignored."
+
+# names of the files in each piece's directory and each result's directory
+_PIECE_FILE = u'piece.pickle'
+_MANIFEST_FILE = u'manifest.pickle'
+
+
+def _hash(*parts):
+    "Return the hexadecimal SHA1 digest of the repr() of the arguments."
+    return unicode(hashlib.sha1(repr(parts)).hexdigest())
+
+
+def _file_stat(pathname):
+    """
+    Find the size and modification time of a file, to know whether it changed since it was stored.
+
+    :returns: The size and modification time, or ``None`` if the file can't be found.
+    :rtype: 2-tuple of int and float, or None
+    """
+    try:
+        stat = os.stat(pathname)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime)
+
+
+def _write_pickle(pathname, obj):
+    "Pickle an object to a temporary file, then rename it, so readers never see part of a file."
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(pathname))
+    try:
+        with os.fdopen(handle, 'wb') as the_file:
+            pickle.dump(obj, the_file, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, pathname)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
+def _read_pickle(pathname):
+    "Unpickle an object, or return ``None`` if it can't be read."
+    try:
+        with open(pathname, 'rb') as the_file:
+            return pickle.load(the_file)
+    except Exception:  # pylint: disable=W0703
+        return None
+
+
+def _encode(values):
+    """
+    Convert an array to the form stored on disk.
+
+    :param values: The array to store.
+    :type values: :class:`numpy.ndarray`
+
+    :returns: The kind of encoding (``u'raw'``, ``u'object'``, or ``u'labels'``), the distinct
+        objects for ``u'labels'`` (otherwise ``None``), and the array to save.
+    :rtype: 3-tuple of unicode, list or None, and :class:`numpy.ndarray`
+    """
+    values = numpy.asarray(values)
+    if values.dtype != object:
+        return u'raw', None, values
+    inferred = pandas.lib.infer_dtype(values)
+    if u'floating' == inferred:
+        return u'object', None, values.astype(numpy.float64)
+    elif u'integer' == inferred:
+        return u'object', None, values.astype(numpy.int64)
+    codes, labels = pandas.factorize(values)
+    return u'labels', list(labels), codes.astype(numpy.int32)
+
+
+def _decode(kind, labels, values):
+    """
+    Convert an array stored on disk back to its original form. This is the inverse of
+    :func:`_encode`, except that :obj:`None` is restored as :obj:`numpy.NaN`.
+    """
+    if u'raw' == kind:
+        return values
+    elif u'object' == kind:
+        return values.astype(object)
+    post = numpy.empty(len(values), dtype=object)
+    post[:] = numpy.NaN
+    labels = numpy.array(labels + [None], dtype=object)[:-1]  # keep tuples etc. as objects
+    found = values >= 0
+    post[found] = labels[values[found]]
+    return post
+
+
+def _load_array(pathname, mmap):
+    "Load an ``.npy`` file, memory-mapped if requested and possible."
+    if mmap:
+        try:
+            return numpy.load(pathname, mmap_mode='r')
+        except ValueError:
+            pass  # an empty array can't be memory-mapped
+    return numpy.load(pathname)
+
+
+class ResultStore(object):
+    """
+    A directory of analysis results for many pieces, stored by column.
+
+    Every file is written to a temporary name then renamed, so many processes may safely share a
+    directory. A result that cannot be read is treated as missing.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: The directory in which to store results. It is created if it doesn't
+            exist.
+        :type directory: basestring
+        """
+        super(ResultStore, self).__init__()
+        self._directory = directory
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # another process may have made it in the meantime
+                if not os.path.isdir(directory):
+                    raise
+
+    @staticmethod
+    def _version():
+        "The versions that must match for stored results to be used."
+        return (STORE_VERSION, score_cache.music21_version(), unicode(pandas.__version__))
+
+    def _piece_dir(self, pathname, opus_id):
+        "Return the directory for a piece."
+        return os.path.join(self._directory, _hash(os.path.abspath(pathname), opus_id))
+
+    def _piece_record(self, pathname, opus_id):
+        """
+        Read the record of a piece, if it's current.
+
+        :returns: The record, or ``None`` if there is no current record.
+        :rtype: dict or None
+        """
+        record = _read_pickle(os.path.join(self._piece_dir(pathname, opus_id), _PIECE_FILE))
+        if record is None or record[u'version'] != ResultStore._version():
+            return None
+        stat = _file_stat(pathname)
+        if stat is not None and stat != record[u'stat']:
+            return None
+        return record
+
+    def _put_record(self, pathname, opus_id, record):
+        """
+        Store the record of a piece, removing its previous results.
+        """
+        piece_dir = self._piece_dir(pathname, opus_id)
+        if os.path.isdir(piece_dir):
+            shutil.rmtree(piece_dir, ignore_errors=True)
+        try:
+            os.makedirs(piece_dir)
+        except OSError:
+            if not os.path.isdir(piece_dir):
+                raise
+        record.update({u'pathname': pathname, u'opus_id': opus_id,
+                       u'version': ResultStore._version(), u'stat': _file_stat(pathname)})
+        _write_pickle(os.path.join(piece_dir, _PIECE_FILE), record)
+
+    def pieces(self):
+        """
+        Find all the pieces in the store. A file that imports as an :class:`Opus` is listed once
+        for each of its scores.
+
+        :returns: The pathname and Opus index of every piece, sorted.
+        :rtype: list of 2-tuple of unicode and int or None
+        """
+        post = []
+        for name in os.listdir(self._directory):
+            record = _read_pickle(os.path.join(self._directory, name, _PIECE_FILE))
+            if record is not None and record[u'opus'] is None:
+                if self._piece_record(record[u'pathname'], record[u'opus_id']) is not None:
+                    post.append((record[u'pathname'], record[u'opus_id']))
+        return sorted(post)
+
+    def get_piece(self, piece):
+        """
+        Restore an :class:`IndexedPiece` from the store, without importing it. The metadata and
+        :class:`NoteRestIndexer` results are set in ``piece``.
+
+        :param piece: The piece to restore.
+        :type piece: :class:`~vis.models.indexed_piece.IndexedPiece`
+
+        :returns: ``piece``, or a list of new :class:`IndexedPiece` objects if the file imports as
+            an :class:`Opus`, or ``None`` if the piece isn't in the store.
+        :rtype: :class:`IndexedPiece` or list of :class:`IndexedPiece` or None
+        """
+        # pylint: disable=W0212
+        pathname, opus_id = piece.metadata(u'pathname'), piece._opus_id
+        record = self._piece_record(pathname, opus_id)
+        if record is None:
+            return None
+        elif record[u'opus'] is not None:
+            post = [indexed_piece.IndexedPiece(pathname, i) for i in xrange(record[u'opus'])]
+            if any(self.get_piece(each) is None for each in post):
+                return None
+            return post
+        noterest = self.get(piece, u'noterest')
+        if noterest is None:
+            return None
+        piece._noterest_results = noterest
+        piece._metadata.update(record[u'metadata'])
+        piece._imported = record[u'imported']
+        return piece
+
+    def put_piece(self, piece, opus_pieces=None):
+        """
+        Store an :class:`IndexedPiece` that has been imported, with its metadata and
+        :class:`NoteRestIndexer` results. This removes the piece's previous results.
+
+        :param piece: The piece to store.
+        :type piece: :class:`~vis.models.indexed_piece.IndexedPiece`
+        :param opus_pieces: If ``piece`` imports as an :class:`Opus`, the :class:`IndexedPiece`
+            objects for its scores, each of which is stored too.
+        :type opus_pieces: list of :class:`IndexedPiece`
+        """
+        # pylint: disable=W0212
+        pathname = piece.metadata(u'pathname')
+        if opus_pieces is not None:
+            for each in opus_pieces:
+                self.put_piece(each)
+            self._put_record(pathname, piece._opus_id, {u'opus': len(opus_pieces)})
+        else:
+            self._put_record(pathname, piece._opus_id, {u'opus': None,
+                                                         u'metadata': dict(piece._metadata),
+                                                         u'imported': piece._imported})
+            self.put(piece, u'noterest', None, piece._get_note_rest_index())
+
+    def _result_dir(self, piece, name, settings):
+        "Return the directory for a result."
+        # pylint: disable=W0212
+        return os.path.join(self._piece_dir(piece.metadata(u'pathname'), piece._opus_id),
+                            _hash(name, indexed_piece._settings_key(settings)))
+
+    def has(self, piece, name, settings=None):
+        """
+        Whether a result is in the store.
+
+        :param piece: The piece to which the result belongs.
+        :type piece: :class:`~vis.models.indexed_piece.IndexedPiece`
+        :param name: The name of the result, like ``u'noterest'`` or ``u'_intervs_piece'``.
+        :type name: basestring
+        :param settings: The settings used to make the result.
+        :type settings: dict or None
+
+        :returns: Whether the result is in the store.
+        :rtype: boolean
+        """
+        # pylint: disable=W0212
+        if self._piece_record(piece.metadata(u'pathname'), piece._opus_id) is None:
+            return False
+        return os.path.isfile(os.path.join(self._result_dir(piece, name, settings),
+                                           _MANIFEST_FILE))
+
+    def get(self, piece, name, settings=None, columns=None, mmap=True):
+        """
+        Read a result from the store.
+
+        :param piece: The piece to which the result belongs.
+        :type piece: :class:`~vis.models.indexed_piece.IndexedPiece`
+        :param name: The name of the result, like ``u'noterest'`` or ``u'_intervs_piece'``.
+        :type name: basestring
+        :param settings: The settings used to make the result.
+        :type settings: dict or None
+        :param columns: The list indices or dict keys of the :class:`Series` to read. The default
+            is to read all of them.
+        :type columns: list of int or of basestring
+        :param mmap: Whether to memory-map numeric arrays rather than reading them into memory.
+            Memory-mapped arrays are read-only.
+        :type mmap: boolean
+
+        :returns: The result, or ``None`` if it isn't in the store.
+        :rtype: list or dict of :class:`pandas.Series`, or None
+        """
+        if not self.has(piece, name, settings):
+            return None
+        result_dir = self._result_dir(piece, name, settings)
+        manifest = _read_pickle(os.path.join(result_dir, _MANIFEST_FILE))
+        if manifest is None:
+            return None
+        keys = manifest[u'keys']
+        wanted = range(len(keys)) if columns is None else \
+                 [i for i, key in enumerate(keys) if key in columns]
+        post = []
+        try:
+            for i in wanted:
+                col = manifest[u'columns'][i]
+                arrays = {}
+                for part in (u'index', u'values'):
+                    prefix = os.path.join(result_dir, u'%d.%s' % (i, part))
+                    labels = None
+                    if u'labels' == col[part]:
+                        labels = _read_pickle(prefix + u'.labels')
+                        if labels is None:
+                            return None
+                    arrays[part] = _decode(col[part], labels, _load_array(prefix + u'.npy', mmap))
+                index = pandas.Index(arrays[u'index'], name=col[u'index name'])
+                post.append(pandas.Series(arrays[u'values'], index=index, name=col[u'name']))
+        except (IOError, OSError, ValueError):
+            return None
+        if manifest[u'dict']:
+            return {keys[i]: series for i, series in zip(wanted, post)}
+        return post
+
+    def put(self, piece, name, settings, data):
+        """
+        Write a result to the store, replacing an older version with the same name and settings.
+
+        :param piece: The piece to which the result belongs. It must already be stored with
+            :meth:`put_piece`, or the result will be ignored.
+        :type piece: :class:`~vis.models.indexed_piece.IndexedPiece`
+        :param name: The name of the result, like ``u'noterest'`` or ``u'_intervs_piece'``.
+        :type name: basestring
+        :param settings: The settings used to make the result.
+        :type settings: dict or None
+        :param data: The result.
+        :type data: list or dict of :class:`pandas.Series`
+
+        :raises: :exc:`TypeError` if ``data`` is not a list or dict of :class:`Series`.
+        """
+        is_dict = isinstance(data, dict)
+        keys = sorted(data.iterkeys()) if is_dict else range(len(data))
+        if not isinstance(data, (list, dict)) or \
+        not all(isinstance(data[key], pandas.Series) for key in keys):
+            raise TypeError(u'ResultStore can only store a list or dict of pandas.Series')
+        # pylint: disable=W0212
+        if self._piece_record(piece.metadata(u'pathname'), piece._opus_id) is None:
+            return
+        result_dir = self._result_dir(piece, name, settings)
+        temp_dir = tempfile.mkdtemp(dir=os.path.dirname(result_dir))
+        try:
+            columns = []
+            for i, key in enumerate(keys):
+                series = data[key]
+                col = {u'name': series.name, u'index name': series.index.name}
+                for part, values in ((u'index', series.index.values),
+                                     (u'values', series.values)):
+                    kind, labels, array = _encode(values)
+                    prefix = os.path.join(temp_dir, u'%d.%s' % (i, part))
+                    numpy.save(prefix + u'.npy', array)
+                    if labels is not None:
+                        _write_pickle(prefix + u'.labels', labels)
+                    col[part] = kind
+                columns.append(col)
+            _write_pickle(os.path.join(temp_dir, _MANIFEST_FILE),
+                          {u'dict': is_dict, u'keys': keys, u'columns': columns})
+            if os.path.isdir(result_dir):
+                shutil.rmtree(result_dir, ignore_errors=True)
+            os.rename(temp_dir, result_dir)
+        except OSError:
+            # another process stored the same result in the meantime
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               models/score_cache.py
+# Purpose:                Hold a persistent on-disk cache of imported scores.
+#
+# Copyright (C) 2014 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+.. codeauthor:: Christopher Antila <crantila@fedoraproject.org>
+
+A persistent, content-addressed cache of imported scores, shared by every
+:class:`~vis.models.indexed_piece.IndexedPiece` in every process that uses the same directory.
+
+Entries are keyed by a hash of the file's contents plus the versions of music21 and pandas, so a
+changed file or an upgraded library never returns a stale result. The cache holds two kinds of
+entries:
+
+* ``u'score'``: the :class:`music21.stream.Score`, frozen with :func:`music21.converter.freezeStr`.
+* ``u'noterest'``: the results of :class:`~vis.analyzers.indexers.noterest.NoteRestIndexer`,
+    plus the piece's metadata.
+
+Enable the cache with :func:`set_cache` or the ``VIS_CACHE_DIR`` environment variable. The
+``VIS_CACHE_SIZE`` environment variable sets the maximum size, in bytes. If either is invalid, vis
+gives a warning and doesn't use a cache. When the cache grows past its maximum size, the
+least-recently used entries are removed.
+"""
+
+import os
+import hashlib
+import tempfile
+import warnings
+import cPickle as pickle
+import pandas
+from vis.analyzers.indexer import is_stream
+
+CACHE_VERSION = 2
+"Increase this when the format of cached entries changes, so older entries are ignored."
+
+DEFAULT_SIZE = 2 ** 30
+"The default maximum size of a :class:`ScoreCache`, in bytes (1 GiB)."
+
+# the file extension for cache entries; we ignore everything else in the directory
+_EXTENSION = u'.vis-cache'
+
+# the music21 version, once music21_version() has found it
+_music21 = {}
+
+
+def music21_version():
+    """
+    Find the version of :mod:`music21`, which is part of the key of every cached or stored result.
+    The version is read from the installed package's metadata, because importing :mod:`music21`
+    takes about a second; :mod:`music21` itself is only imported if there is no metadata.
+
+    :returns: The version, like ``u'1.9.3'``.
+    :rtype: unicode
+    """
+    if u'version' not in _music21:
+        try:
+            import pkg_resources
+            _music21[u'version'] = unicode(pkg_resources.get_distribution('music21').version)
+        except Exception:  # pylint: disable=W0703
+            # pkg_resources is missing, or music21 isn't installed as a distribution
+            import music21
+            _music21[u'version'] = unicode(music21.VERSION_STR)
+    return _music21[u'version']
+
+
+class ScoreCache(object):
+    """
+    A size-bounded, content-addressed cache of scores and :class:`NoteRestIndexer` results in a
+    directory on the filesystem.
+
+    Every entry is written to a temporary file then renamed, so many processes may safely share a
+    directory. An entry that disappears or cannot be read is treated as a cache miss.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_SIZE):
+        """
+        :param directory: The directory in which to store entries. It is created if it doesn't
+            exist.
+        :type directory: basestring
+        :param max_size: The maximum total size of all entries, in bytes.
+        :type max_size: int
+
+        :raises: :exc:`RuntimeError` if ``max_size`` is less than ``1``.
+        """
+        if max_size < 1:
+            raise RuntimeError(u'ScoreCache requires a "max_size" of at least 1 byte')
+        super(ScoreCache, self).__init__()
+        self._directory = directory
+        self._max_size = max_size
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # another process may have made it in the meantime
+                if not os.path.isdir(directory):
+                    raise
+
+    @staticmethod
+    def key(pathname, kind, opus_id=None):
+        """
+        Make the key for an entry.
+
+        :param pathname: The pathname of the file music21 will import.
+        :type pathname: basestring
+        :param kind: The kind of entry, either ``u'score'`` or ``u'noterest'``.
+        :type kind: basestring
+        :param opus_id: The index of the :class:`Score` in an :class:`Opus`, if relevant.
+        :type opus_id: int or None
+
+        :returns: The key, or ``None`` if the file cannot be read.
+        :rtype: unicode or None
+        """
+        hasher = hashlib.sha1()
+        try:
+            with open(pathname, 'rb') as the_file:
+                for chunk in iter(lambda: the_file.read(65536), b''):
+                    hasher.update(chunk)
+        except (IOError, OSError):
+            return None
+        hasher.update(u'|'.join([unicode(CACHE_VERSION), music21_version(),
+                                 unicode(pandas.__version__), unicode(kind),
+                                 unicode(opus_id)]).encode('utf-8'))
+        return unicode(hasher.hexdigest())
+
+    def _path(self, key):
+        "Return the pathname of the entry with this key."
+        return os.path.join(self._directory, key + _EXTENSION)
+
+    def _entries(self):
+        """
+        Find all the entries in the cache.
+
+        :returns: The pathname, size, and modification time of every entry.
+        :rtype: list of 3-tuple of unicode, int, float
+        """
+        post = []
+        for name in os.listdir(self._directory):
+            if name.endswith(_EXTENSION):
+                pathname = os.path.join(self._directory, name)
+                try:
+                    stat = os.stat(pathname)
+                except OSError:
+                    continue  # removed by another process
+                post.append((pathname, stat.st_size, stat.st_mtime))
+        return post
+
+    def get(self, key):
+        """
+        Fetch an entry from the cache.
+
+        :param key: The key from :meth:`key`.
+        :type key: basestring
+
+        :returns: The cached object, or ``None`` on a cache miss.
+        :rtype: object or None
+        """
+        if key is None:
+            return None
+        pathname = self._path(key)
+        try:
+            with open(pathname, 'rb') as the_file:
+                frozen, value = pickle.load(the_file)
+            os.utime(pathname, None)  # mark as recently used
+        except (IOError, OSError):
+            return None
+        except Exception:  # pylint: disable=W0703
+            # a corrupt entry; remove it so we don't try again
+            try:
+                os.remove(pathname)
+            except OSError:
+                pass
+            return None
+        if frozen:
+            from music21 import converter
+            return converter.thawStr(value)
+        return value
+
+    def put(self, key, value):
+        """
+        Store an entry in the cache, then remove the least-recently used entries, if required.
+
+        :param key: The key from :meth:`key`. If ``None``, nothing is stored.
+        :type key: basestring
+        :param value: The object to store. A :class:`music21.stream.Stream` is frozen; anything
+            else must be pickle-able.
+        :type value: object
+        """
+        if key is None:
+            return
+        frozen = is_stream(value)
+        if frozen:
+            from music21 import converter
+            value = converter.freezeStr(value, u'pickle')
+        handle, temp_path = tempfile.mkstemp(dir=self._directory)
+        try:
+            with os.fdopen(handle, 'wb') as the_file:
+                pickle.dump((frozen, value), the_file, pickle.HIGHEST_PROTOCOL)
+            os.rename(temp_path, self._path(key))
+        except Exception:
+            os.remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least-recently used entries until the cache is no larger than its maximum size.
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for pathname, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= self._max_size:
+                break
+            try:
+                os.remove(pathname)
+            except OSError:
+                pass  # removed by another process
+            total -= size
+
+    def size(self):
+        """
+        :returns: The total size of all entries, in bytes.
+        :rtype: int
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+        """
+        for pathname, _, _ in self._entries():
+            try:
+                os.remove(pathname)
+            except OSError:
+                pass
+
+
+def _default_cache(environ):
+    """
+    Make the default cache from the ``VIS_CACHE_DIR`` and ``VIS_CACHE_SIZE`` environment variables.
+    If the size is invalid or the directory can't be made, this gives a warning and uses no cache.
+
+    :param environ: The environment variables, like :obj:`os.environ`.
+    :type environ: dict
+
+    :returns: The cache, or ``None``.
+    :rtype: :class:`ScoreCache` or None
+    """
+    if 'VIS_CACHE_DIR' not in environ:
+        return None
+    try:
+        return ScoreCache(environ['VIS_CACHE_DIR'],
+                          int(environ.get('VIS_CACHE_SIZE', DEFAULT_SIZE)))
+    except (ValueError, RuntimeError, OSError) as err:
+        warnings.warn(u'Ignoring VIS_CACHE_DIR and VIS_CACHE_SIZE, using no cache: ' +
+                      unicode(err))
+        return None
+
+
+# The cache currently used by IndexedPiece, if any. The default is read from the VIS_CACHE_DIR and
+# VIS_CACHE_SIZE environment variables, and may be changed at runtime with set_cache().
+_cache = {u'cache': _default_cache(os.environ)}
+
+
+def set_cache(directory, max_size=DEFAULT_SIZE):
+    """
+    Choose the directory of the :class:`ScoreCache` used by every
+    :class:`~vis.models.indexed_piece.IndexedPiece`.
+
+    :param directory: The directory in which to store entries, or ``None`` to stop caching.
+    :type directory: basestring or None
+    :param max_size: The maximum total size of all entries, in bytes.
+    :type max_size: int
+
+    :returns: The new cache, or ``None``.
+    :rtype: :class:`ScoreCache` or None
+    """
+    _cache[u'cache'] = None if directory is None else ScoreCache(directory, max_size)
+    return _cache[u'cache']
+
+
+def get_cache():
+    """
+    :returns: The :class:`ScoreCache` used by every :class:`IndexedPiece`, or ``None`` if there is
+        no cache.
+    :rtype: :class:`ScoreCache` or None
+    """
+    return _cache[u'cache']
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               test_compact_corpus.py
+# Purpose:                Tests for models/compact_corpus.py.
+#
+# Copyright (C) 2014 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+Tests for :py:class:`~vis.models.compact_corpus.CompactCorpus`.
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import TestCase, TestLoader
+from mock import patch
+import numpy
+import pandas
+from vis.analyzers.indexers import noterest
+from vis.models import compact_corpus
+from vis.models.indexed_piece import IndexedPiece
+from vis.workflow import WorkflowManager
+
+
+# pylint: disable=R0904
+# pylint: disable=C0111
+# pylint: disable=W0212
+class TestCompactCorpus(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.corpus_dir = os.path.join(self.directory, u'corpus')
+        self.sources = []
+        self.pieces = []
+        for i in xrange(2):
+            self.sources.append(os.path.join(self.directory, u'source%d.txt' % i))
+            with open(self.sources[-1], 'w') as the_file:
+                the_file.write(str(i))
+            self.pieces.append(IndexedPiece(self.sources[-1]))
+            self.pieces[-1]._imported = True
+            self.pieces[-1].metadata(u'title', u'Piece %d' % i)
+        # NB: 1.0 / 3 isn't a whole number of ticks
+        self.pieces[0]._noterest_results = [
+            pandas.Series([u'C4', u'Rest', float('nan')],
+                          index=numpy.array([0.0, 1.0 / 3, 401.99999999999994], dtype=object)),
+            pandas.Series([u'E-5'], index=numpy.array([0.5], dtype=object))]
+        self.pieces[1]._noterest_results = [
+            pandas.Series([u'Rest', u'C4'], index=numpy.array([0.0, 2.0], dtype=object))]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSeriesEqual(self, expected, actual):  # pylint: disable=C0103
+        self.assertSequenceEqual([repr(x) for x in expected.index],
+                                 [repr(x) for x in actual.index])
+        self.assertEqual(expected.index.dtype, actual.index.dtype)
+        self.assertSequenceEqual([unicode(x) for x in expected.values],
+                                 [unicode(x) for x in actual.values])
+
+    def test_write_1(self):
+        # results round-trip exactly, and the symbols are shared
+        compact_corpus.write_corpus(self.corpus_dir, self.pieces)
+        corpus = compact_corpus.open_corpus(self.corpus_dir)
+        self.assertEqual(2, len(corpus))
+        self.assertEqual([(src, None) for src in self.sources], corpus.pieces())
+        self.assertEqual(4, len(corpus.symbols))
+        for i, piece in enumerate(self.pieces):
+            actual = corpus.noterest(i)
+            self.assertEqual(len(piece._noterest_results), len(actual))
+            for exp, act in zip(piece._noterest_results, actual):
+                self.assertSeriesEqual(exp, act)
+
+    def test_write_2(self):
+        # the raw events are memory-mapped ticks and codes
+        compact_corpus.write_corpus(self.corpus_dir, self.pieces)
+        corpus = compact_corpus.open_corpus(self.corpus_dir)
+        ticks, codes = corpus.events(1)[0]
+        self.assertEqual(numpy.int64, ticks.dtype)
+        self.assertEqual(numpy.uint16, codes.dtype)
+        self.assertSequenceEqual([0, 2 * compact_corpus.TICKS_PER_QUARTER], list(ticks))
+        self.assertSequenceEqual([u'Rest', u'C4'], list(corpus.symbols[codes]))
+        self.assertEqual(compact_corpus.NO_EVENT, corpus.events(0)[0][1][2])
+        self.assertIsInstance(corpus._arrays[u'ticks'], numpy.memmap)
+
+    def test_write_3(self):
+        # too many distinct events
+        self.pieces[0]._noterest_results = [pandas.Series(range(compact_corpus.NO_EVENT))]
+        self.assertRaises(ValueError, compact_corpus.write_corpus, self.corpus_dir, self.pieces)
+
+    def test_open_1(self):
+        # no corpus; the same corpus is opened once; a new corpus is opened again
+        self.assertIsNone(compact_corpus.open_corpus(self.corpus_dir))
+        compact_corpus.write_corpus(self.corpus_dir, self.pieces)
+        first = compact_corpus.open_corpus(self.corpus_dir)
+        self.assertIs(first, compact_corpus.open_corpus(self.corpus_dir))
+        compact_corpus.write_corpus(self.corpus_dir, self.pieces[:1])
+        second = compact_corpus.open_corpus(self.corpus_dir)
+        self.assertIsNot(first, second)
+        self.assertEqual(1, len(second))
+
+    def test_find_1(self):
+        # a piece whose file changed isn't found; an Opus is found as a list
+        opus = [IndexedPiece(self.sources[1], i) for i in xrange(2)]
+        for each in opus:
+            each._noterest_results = [pandas.Series([u'C4'])]
+        compact_corpus.write_corpus(self.corpus_dir, self.pieces[:1] + opus)
+        corpus = compact_corpus.open_corpus(self.corpus_dir)
+        self.assertEqual(0, corpus.find(self.sources[0]))
+        self.assertEqual([1, 2], corpus.find(self.sources[1]))
+        self.assertEqual(2, corpus.find(self.sources[1], 1))
+        self.assertIsNone(corpus.find(u'/this/does/not/exist'))
+        os.utime(self.sources[0], (1, 1))
+        self.assertIsNone(corpus.find(self.sources[0]))
+
+    def test_attach_1(self):
+        # an attached piece reads its results from the corpus, but doesn't pickle them
+        compact_corpus.write_corpus(self.corpus_dir, self.pieces)
+        corpus = compact_corpus.open_corpus(self.corpus_dir)
+        piece = IndexedPiece(self.sources[0])
+        corpus.attach(piece, 0)
+        self.assertEqual(u'Piece 0', piece.metadata(u'title'))
+        with patch(u'music21.converter.parse') as mock_parse:
+            actual = piece.get_data([noterest.NoteRestIndexer])
+            self.assertEqual(0, mock_parse.call_count)
+        self.assertSeriesEqual(self.pieces[0]._noterest_results[0], actual[0])
+        copied = pickle.loads(pickle.dumps(piece, pickle.HIGHEST_PROTOCOL))
+        self.assertIsNone(copied._noterest_results)
+        self.assertSeriesEqual(actual[1], copied.get_data([noterest.NoteRestIndexer])[1])
+        # a piece that isn't attached keeps its results when pickled
+        copied = pickle.loads(pickle.dumps(self.pieces[1], pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(1, len(copied._noterest_results))
+
+
+class TestWorkflowCompact(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, u'bwv77.mxl')
+        shutil.copy(u'vis/tests/corpus/bwv77.mxl', self.source)
+        self.corpus_dir = os.path.join(self.directory, u'corpus')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_1(self):
+        # loading again, or from the corpus alone, doesn't import the file
+        first = WorkflowManager([self.source])
+        first.load(u'compact', self.corpus_dir)
+        first.settings(None, u'count frequency', False)
+        expected = first.run(u'intervals')
+        with patch(u'music21.converter.parse') as mock_parse:
+            for pathnames in ([self.source], []):
+                test_wm = WorkflowManager(pathnames)
+                test_wm.load(u'compact', self.corpus_dir)
+                self.assertEqual(1, len(test_wm))
+                self.assertEqual(u'bwv77', test_wm.metadata(0, u'title'))
+                test_wm.settings(None, u'count frequency', False)
+                actual = test_wm.run(u'intervals')
+                for exp, act in zip(expected[0], actual[0]):
+                    self.assertSequenceEqual(list(exp.index), list(act.index))
+                    self.assertSequenceEqual(list(exp.values), list(act.values))
+            self.assertEqual(0, mock_parse.call_count)
+
+    def test_load_2(self):
+        # a piece not in the corpus is imported and added
+        other = os.path.join(self.directory, u'bwv2.xml')
+        shutil.copy(u'vis/tests/corpus/bwv2.xml', other)
+        WorkflowManager([self.source]).load(u'compact', self.corpus_dir)
+        test_wm = WorkflowManager([self.source, other])
+        test_wm.load(u'compact', self.corpus_dir)
+        corpus = compact_corpus.open_corpus(self.corpus_dir)
+        self.assertEqual([(self.source, None), (other, None)], corpus.pieces())
+        self.assertEqual([(self.corpus_dir, 0), (self.corpus_dir, 1)],
+                         [piece._compact for piece in test_wm])
+
+    def test_load_3(self):
+        # the "compact" instruction needs a pathname
+        self.assertRaises(RuntimeError, WorkflowManager([self.source]).load, u'compact')
+
+
+#-------------------------------------------------------------------------------------------------#
+# Definitions                                                                                     #
+#-------------------------------------------------------------------------------------------------#
+COMPACT_CORPUS_SUITE = TestLoader().loadTestsFromTestCase(TestCompactCorpus)
+WORKFLOW_COMPACT_SUITE = TestLoader().loadTestsFromTestCase(TestWorkflowCompact)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               analyzers_tests/test_entropy_experimenter.py
+# Purpose:                Tests for the EntropyExperimenter.
+#
+# Copyright (C) 2013 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+
+# allow "no docstring" for everything
+# pylint: disable=C0111
+# allow "too many public methods" for TestCase
+# pylint: disable=R0904
+
+
+import math
+import unittest
+from mock import MagicMock
+import pandas
+from vis.analyzers.indexers import ngram
+from vis.analyzers.experimenters.entropy import EntropyExperimenter
+from vis.models.aggregated_pieces import AggregatedPieces
+from vis.models.indexed_piece import IndexedPiece
+
+
+def ngrams(*parts):
+    "Find the 1-grams and 2-grams of every part, as the NGramIndexer does for a list of 'n'."
+    combos = [([i], []) for i in xrange(len(parts))]
+    setts = {u'n': [1, 2], u'combinations': combos, u'mark_singles': False}
+    return ngram.NGramIndexer([pandas.Series(part) for part in parts], setts).run()
+
+
+class TestEntropyExperimenter(unittest.TestCase):
+    def test_entropy_1(self):
+        # "A" is followed by "B" twice and "C" once; "B" and "C" are always followed by "A"
+        actual = EntropyExperimenter(ngrams([u'A', u'B', u'A', u'C', u'A', u'B'])).run()
+        self.assertSequenceEqual([u'A', u'B', u'C'], list(actual.index))
+        self.assertSequenceEqual([3, 1, 1], list(actual[u'count']))
+        self.assertSequenceEqual([2, 1, 1], list(actual[u'continuations']))
+        expected = -(2.0 / 3 * math.log(2.0 / 3, 2) + 1.0 / 3 * math.log(1.0 / 3, 2))
+        self.assertAlmostEqual(expected, actual[u'entropy'][u'A'])
+        self.assertEqual(0.0, actual[u'entropy'][u'B'])
+        self.assertEqual(0.0, actual[u'entropy'][u'C'])
+
+    def test_entropy_2(self):
+        # the transitions of every combination are counted together, and "base" changes the units
+        index = ngrams([u'A', u'B', u'A', u'C'], [u'A', u'C', u'A'])
+        self.assertEqual(4, len(index))
+        actual = EntropyExperimenter(index, {u'base': math.e}).run()
+        self.assertSequenceEqual([3, 1, 1], list(actual[u'count']))
+        self.assertAlmostEqual(-(1.0 / 3 * math.log(1.0 / 3) + 2.0 / 3 * math.log(2.0 / 3)),
+                               actual[u'entropy'][u'A'])
+
+    def test_entropy_3(self):
+        # the transition counts, by prefix and next event
+        index = ngrams([u'A', u'B', u'A', u'C', u'A', u'B'])
+        actual = EntropyExperimenter(index, {u'transitions': True}).run()
+        self.assertSequenceEqual([(u'A', u'B'), (u'A', u'C'), (u'B', u'A'), (u'C', u'A')],
+                                 list(actual.index))
+        self.assertSequenceEqual([2, 1, 1, 1], list(actual))
+
+    def test_entropy_4(self):
+        # several pieces, counted by group; the first and third pieces are in the same group
+        pieces = [ngrams([u'A', u'B']), ngrams([u'A', u'C', u'A']), ngrams([u'A', u'C'])]
+        setts = {u'groups': [u'Josquin', u'Palestrina', u'Josquin']}
+        actual = EntropyExperimenter(pieces, setts).run()
+        self.assertSequenceEqual([(u'Josquin', u'A'), (u'Palestrina', u'A'), (u'Palestrina', u'C')],
+                                 list(actual.index))
+        self.assertSequenceEqual([2, 1, 1], list(actual[u'count']))
+        self.assertSequenceEqual([1.0, 0.0, 0.0], list(actual[u'entropy']))
+        actual = EntropyExperimenter(pieces, dict(setts, transitions=True)).run()
+        self.assertSequenceEqual([(u'Josquin', u'A', u'B'), (u'Josquin', u'A', u'C'),
+                                  (u'Palestrina', u'A', u'C'), (u'Palestrina', u'C', u'A')],
+                                 list(actual.index))
+        # without groups, all the pieces are counted together
+        actual = EntropyExperimenter(pieces).run()
+        self.assertSequenceEqual([u'A', u'C'], list(actual.index))
+        self.assertSequenceEqual([3, 1], list(actual[u'count']))
+
+    def test_entropy_5(self):
+        # the (k + 1)-grams are made of the k-grams and any horizontal events
+        score = [pandas.Series([u'A', u'B', u'A', u'B']), pandas.Series([u'x', u'y', u'x'],
+                                                                         index=[1, 2, 3])]
+        setts = {u'n': [2, 3], u'vertical': [0], u'horizontal': [1], u'mark_singles': False}
+        actual = EntropyExperimenter(ngram.NGramIndexer(score, setts).run(),
+                                     {u'transitions': True}).run()
+        self.assertSequenceEqual([(u'A x B', u'y A'), (u'B y A', u'x B')], list(actual.index))
+
+    def test_entropy_6(self):
+        # the settings must match the input
+        index = ngrams([u'A', u'B', u'A'])
+        self.assertRaises(RuntimeError, EntropyExperimenter, index[:1])
+        self.assertRaises(RuntimeError, EntropyExperimenter, [index, index], {u'groups': [u'X']})
+
+    def test_entropy_7(self):
+        # nothing to count
+        actual = EntropyExperimenter(ngrams([u'A'])).run()
+        self.assertEqual(0, len(actual))
+        self.assertSequenceEqual([u'count', u'continuations', u'entropy'], list(actual.columns))
+        self.assertEqual(0, len(EntropyExperimenter([], {u'transitions': True}).run()))
+
+    def test_entropy_8(self):
+        # through AggregatedPieces, grouped by composer
+        composers = [u'Josquin', u'Palestrina']
+        pieces = [MagicMock(spec=IndexedPiece) for _ in composers]
+        for piece, composer, index in zip(pieces, composers,
+                                          [ngrams([u'A', u'B', u'A']), ngrams([u'A', u'C'])]):
+            piece.metadata.return_value = composer
+            piece.get_data.return_value = index
+        agg_p = AggregatedPieces(pieces)
+        setts = {u'n': [1, 2], u'groups': agg_p.metadata(u'composers')}
+        actual = agg_p.get_data([EntropyExperimenter], [ngram.NGramIndexer], setts)
+        self.assertSequenceEqual([(u'Josquin', u'A'), (u'Josquin', u'B'), (u'Palestrina', u'A')],
+                                 list(actual.index))
+
+
+#--------------------------------------------------------------------------------------------------#
+# Definitions                                                                                      #
+#--------------------------------------------------------------------------------------------------#
+ENTROPY_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestEntropyExperimenter)
@@ -32,7 +32,8 @@
 import unittest
 import mock
 from pandas import Series, DataFrame
-from vis.analyzers.experimenters.frequency import FrequencyExperimenter, experimenter_func
+from vis.analyzers.experimenters.frequency import FrequencyExperimenter, experimenter_func, \
+    merge_counts
 
 
 class TestExperimenterFunc(unittest.TestCase):
@@ -153,8 +154,34 @@ class TestRun(unittest.TestCase):
             self.assertSequenceEqual(list(expected.loc[:,i].values), list(actual.loc[:,i].values))
 
 
+class TestMergeCounts(unittest.TestCase):
+    def test_merge_1(self):
+        # Series; an object missing from one result counts as zero there
+        in_a = Series({u'M3': 5, u'P5': 2})
+        in_b = Series({u'M3': 1, u'm6': 4})
+        actual = merge_counts([in_a, in_b])
+        self.assertSequenceEqual([u'M3', u'P5', u'm6'], list(actual.index))
+        self.assertSequenceEqual([6, 2, 4], list(actual.values))
+
+    def test_merge_2(self):
+        # the same as counting everything at once
+        in_a = Series([1, 2, 1, 1, 3, 1, 4, 5, 3, 2, 1])
+        in_b = Series([1, 2, 1, 1, 3, 1, 3, 2, 1, 6])
+        expected = experimenter_func((0, in_a.append(in_b)))[1]
+        actual = merge_counts([FrequencyExperimenter([in_a]).run(),
+                               FrequencyExperimenter([in_b]).run()])
+        self.assertSequenceEqual(list(expected.index), list(actual.index))
+        self.assertSequenceEqual(list(expected.values), list(actual[u'all'].values))
+        self.assertSequenceEqual(list(expected.values), list(actual[0].values))
+
+    def test_merge_3(self):
+        # nothing to merge
+        self.assertEqual(0, len(merge_counts([])))
+
+
 #--------------------------------------------------------------------------------------------------#
 # Definitions                                                                                      #
 #--------------------------------------------------------------------------------------------------#
 FREQUENCY_FUNC_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestExperimenterFunc)
 FREQUENCY_RUN_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestRun)
+FREQUENCY_MERGE_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestMergeCounts)
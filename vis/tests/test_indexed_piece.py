@@ -34,6 +34,7 @@ from vis.analyzers.indexer import Indexer
 from vis.analyzers.indexers import noterest
 from vis.analyzers.experimenter import Experimenter
 from vis.models.indexed_piece import IndexedPiece, _find_piece_title, _find_part_names, OpusWarning
+from vis.models.indexed_piece import _memo_nbytes
 
 
 # pylint: disable=R0904
@@ -238,6 +239,72 @@ class TestIndexedPieceA(TestCase):
         mock_experimenter_cls.run.assert_called_once_with()
         mock_experimenter_cls.__init__.assert_called_once_with(prev_data, {})
 
+    def test_get_data_13(self):
+        # That get_data() memoizes results: the same analyzer, settings, and input run once, and
+        # a different setting or input runs again
+        mock_indexer_cls = type('MockIndexer', (Indexer,), {})
+        mock_indexer_cls.__init__ = MagicMock(return_value=None)
+        mock_indexer_cls.run = MagicMock(side_effect=lambda: [pandas.Series([1, 2])])
+        prev_data = [pandas.Series([5]), pandas.Series([6])]
+        first = self.ind_piece.get_data([mock_indexer_cls], {u'a': [1, 2]}, prev_data)
+        second = self.ind_piece.get_data([mock_indexer_cls], {u'a': [1, 2]}, list(prev_data))
+        self.assertEqual(1, mock_indexer_cls.run.call_count)
+        self.assertIs(first[0], second[0])
+        self.assertIsNot(first, second)  # callers may change the list without changing the memo
+        self.ind_piece.get_data([mock_indexer_cls], {u'a': [1, 3]}, prev_data)
+        self.assertEqual(2, mock_indexer_cls.run.call_count)
+        self.ind_piece.get_data([mock_indexer_cls], {u'a': [1, 2]}, [prev_data[0].copy()])
+        self.assertEqual(3, mock_indexer_cls.run.call_count)
+        # None and {} are the same settings
+        self.ind_piece.get_data([mock_indexer_cls], None, prev_data)
+        self.ind_piece.get_data([mock_indexer_cls], {}, prev_data)
+        self.assertEqual(4, mock_indexer_cls.run.call_count)
+
+    def test_get_data_14(self):
+        # That the memo forgets the least-recently used result when it's full
+        mock_indexer_cls = type('MockIndexer', (Indexer,), {})
+        mock_indexer_cls.__init__ = MagicMock(return_value=None)
+        mock_indexer_cls.run = MagicMock(side_effect=lambda: [pandas.Series(range(10))])
+        prev_data = [pandas.Series([5])]
+        one_entry = _memo_nbytes(pandas.Series(range(10))) + _memo_nbytes(prev_data)
+        with patch(u'vis.models.indexed_piece.MEMO_BYTES', one_entry * 2):
+            for setts in ({u'n': 1}, {u'n': 2}, {u'n': 1}, {u'n': 3}):
+                self.ind_piece.get_data([mock_indexer_cls], setts, prev_data)
+            self.assertEqual(3, mock_indexer_cls.run.call_count)
+            self.ind_piece.get_data([mock_indexer_cls], {u'n': 1}, prev_data)  # still memoized
+            self.assertEqual(3, mock_indexer_cls.run.call_count)
+            self.ind_piece.get_data([mock_indexer_cls], {u'n': 2}, prev_data)  # forgotten
+            self.assertEqual(4, mock_indexer_cls.run.call_count)
+            self.assertEqual(2, len(self.ind_piece._memo))
+        # a result bigger than the whole memo isn't kept
+        with patch(u'vis.models.indexed_piece.MEMO_BYTES', one_entry - 1):
+            self.ind_piece.get_data([mock_indexer_cls], {u'n': 4}, prev_data)
+            self.assertEqual(0, len(self.ind_piece._memo))
+
+    def test_memo_nbytes_1(self):
+        # That the memory of Series, DataFrame, MultiIndex, and containers is counted
+        series = pandas.Series([1.0, 2.0], index=[0, 1])
+        self.assertEqual(32, _memo_nbytes(series))
+        self.assertEqual(64, _memo_nbytes([series, {u'a': series}]))
+        frame = pandas.DataFrame({u'a': [1.0, 2.0], u'b': [3, 4]}, index=[0, 1])
+        self.assertEqual(32 + 16 + frame.columns.nbytes, _memo_nbytes(frame))
+        multi = pandas.Series([1.0], index=pandas.MultiIndex.from_tuples([(1, 2)]))
+        self.assertTrue(_memo_nbytes(multi) > 8)
+        self.assertEqual(0, _memo_nbytes(u'not an array'))
+
+    def test_get_data_15(self):
+        # That a pickled piece leaves its memo behind, and gets an empty one
+        mock_indexer_cls = type('MockIndexer', (Indexer,), {})
+        mock_indexer_cls.__init__ = MagicMock(return_value=None)
+        mock_indexer_cls.run = MagicMock(return_value=[pandas.Series([1, 2])])
+        self.ind_piece.get_data([mock_indexer_cls], {}, [pandas.Series([5])])
+        self.assertEqual(1, len(self.ind_piece._memo))
+        state = self.ind_piece.__getstate__()
+        self.assertNotIn(u'_memo', state)
+        copied = IndexedPiece.__new__(IndexedPiece)
+        copied.__setstate__(state)
+        self.assertEqual(0, len(copied._memo))
+
     def test_type_verifier_1(self):
         # with an Indexer
         # pylint: disable=W0212
@@ -338,14 +405,14 @@ class TestIndexedPieceB(TestCase):
     def test_import_score_1(self):
         # That _import_score() raises an OpusWarning when it imports an Opus but "expect_opus" is
         # False
-        with patch(u'vis.models.indexed_piece.converter.parse') as mock_parse:
+        with patch(u'music21.converter.parse') as mock_parse:
             mock_parse.return_value = music21.stream.Opus()
             self.assertRaises(OpusWarning, self.ind_piece._import_score, known_opus=False)
 
     def test_import_score_2(self):
         # That _import_score() returns multiple IndexedPiece objects when it imports an Opus and
         # "expect_opus" is True
-        with patch(u'vis.models.indexed_piece.converter.parse') as mock_parse:
+        with patch(u'music21.converter.parse') as mock_parse:
             mock_parse.return_value = music21.stream.Opus()
             for _ in xrange(5):
                 mock_parse.return_value.insert(music21.stream.Score())
@@ -358,13 +425,13 @@ class TestIndexedPieceB(TestCase):
     def test_import_score_3(self):
         # That _import_score() raises an OpusWarning when "expect_opus" is True, but it doesn't
         # import an Opus
-        with patch(u'vis.models.indexed_piece.converter.parse') as mock_parse:
+        with patch(u'music21.converter.parse') as mock_parse:
             mock_parse.return_value = music21.stream.Score()
             self.assertRaises(OpusWarning, self.ind_piece._import_score, known_opus=True)
 
     def test_import_score_4(self):
         # That _import_score() returns the right Score object when it imports an Opus
-        with patch(u'vis.models.indexed_piece.converter.parse') as mock_parse:
+        with patch(u'music21.converter.parse') as mock_parse:
             mock_parse.return_value = music21.stream.Opus()
             for i in xrange(5):
                 mock_parse.return_value.insert(music21.stream.Score())
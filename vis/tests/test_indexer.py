@@ -30,8 +30,10 @@
 
 
 import unittest
+import warnings
 import mock
 import copy
+import numpy
 import pandas
 from music21 import base, stream, duration, note, converter, clef
 from vis.analyzers import indexer
@@ -503,6 +505,41 @@ class TestMpiUniqueOffsets(unittest.TestCase):
         self.assertSequenceEqual(expected, actual)
 
 
+class TestEventSweep(unittest.TestCase):
+    # pylint: disable=W0212
+    def make_stream(self, events):
+        # "events" is a list of (offset, quarterLength, name)
+        post = stream.Stream()
+        for offset, q_len, name in events:
+            thing = note.Note(name) if name != u'rest' else note.Rest()
+            thing.duration = duration.Duration(q_len)
+            post.insert(offset, thing)
+        return post.flat
+
+    def test_event_sweep_1(self):
+        # same as getElementsByOffset(), with overlapping, zero-length, and absent events
+        part = self.make_stream([(0.0, 4.0, u'C4'), (1.0, 1.0, u'D4'), (2.0, 0.0, u'E4'),
+                                 (2.0, 0.5, u'F4'), (3.5, 1.0, u'G4'), (6.0, 1.0, u'rest')])
+        offsets = [0.0, 0.5, 1.0, 2.0, 2.25, 3.5, 4.0, 4.25, 6.0, 6.5]
+        expected = [list(part.getElementsByOffset(off, mustBeginInSpan=False))[0]
+                    for off in offsets]
+        actual = indexer._event_sweep(part, offsets)
+        self.assertEqual(len(expected), len(actual))
+        for exp, act in zip(expected, actual):
+            self.assertIs(exp, act)
+
+    def test_event_sweep_2(self):
+        # IndexError when nothing is sounding
+        part = self.make_stream([(0.0, 1.0, u'C4'), (2.0, 1.0, u'D4')])
+        self.assertRaises(IndexError, indexer._event_sweep, part, [0.0, 1.0, 2.0])
+
+    def test_event_sweep_3(self):
+        # an offset with floating-point error still finds the event that starts there
+        part = self.make_stream([(0.0, 2.0 / 3.0, u'C4'), (2.0 / 3.0, 1.0, u'D4')])
+        actual = indexer._event_sweep(part, [0.0, 0.6666666666666666])
+        self.assertEqual([u'C', u'D'], [x.name for x in actual])
+
+
 class TestMpiVertAligner(unittest.TestCase):
     def test_mpi_vert_aligner_1(self):
         in_list = [[1]]
@@ -558,6 +595,126 @@ class TestMpiVertAligner(unittest.TestCase):
         actual = indexer.mpi_vert_aligner(in_list)
         self.assertSequenceEqual(expected, actual)
 
+class TestIndexerExecutors(IndexerTestBase):
+    # That every backend of _do_multiprocessing() produces the same results, in combination order.
+    class SeriesIndexer(indexer.Indexer):
+        required_score_type = pandas.Series
+        def __init__(self, score, settings=None):
+            super(TestIndexerExecutors.SeriesIndexer, self).__init__(score, settings)
+            self._indexer_func = verbatim_ser
+        def run(self):
+            return self._do_multiprocessing([[x] for x in xrange(len(self._score))])
+
+    class StreamIndexer(indexer.Indexer):
+        required_score_type = stream.Stream
+        def __init__(self, score, settings=None):
+            super(TestIndexerExecutors.StreamIndexer, self).__init__(score, settings)
+            self._indexer_func = verbatim
+            self._types = [base.ElementWrapper]
+        def run(self):
+            return self._do_multiprocessing([[x] for x in xrange(len(self._score))])
+
+    def tearDown(self):
+        indexer.set_executor(u'serial')
+
+    def test_set_executor_1(self):
+        # unrecognized names and worker counts raise RuntimeError
+        self.assertRaises(RuntimeError, indexer.set_executor, u'cluster')
+        self.assertRaises(RuntimeError, indexer.set_executor, u'thread', 0)
+
+    def test_set_executor_2(self):
+        # get_executor() reports what was set
+        indexer.set_executor(u'thread', 3)
+        self.assertEqual((u'thread', 3), indexer.get_executor())
+
+    def test_default_executor_1(self):
+        # valid environment variables are used
+        self.assertEqual({u'name': u'process', u'workers': 2},
+                         indexer._default_executor({'VIS_EXECUTOR': u'process',
+                                                    'VIS_WORKERS': u'2'}))
+        self.assertEqual({u'name': u'serial', u'workers': None}, indexer._default_executor({}))
+
+    def test_default_executor_2(self):
+        # invalid environment variables give a warning and the serial executor
+        for environ in [{'VIS_EXECUTOR': u'threads'},
+                        {'VIS_EXECUTOR': u'thread', 'VIS_WORKERS': u'four'},
+                        {'VIS_EXECUTOR': u'process', 'VIS_WORKERS': u'0'}]:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter(u'always')
+                actual = indexer._default_executor(environ)
+            self.assertEqual({u'name': u'serial', u'workers': None}, actual)
+            self.assertEqual(1, len(caught))
+
+    def test_executors_series(self):
+        parts = [self.in_series, self.mixed_series_notes, self.in_series.iloc[::-1].sort_index()]
+        indexer.set_executor(u'serial')
+        expected = TestIndexerExecutors.SeriesIndexer(parts).run()
+        for name in (u'thread', u'process'):
+            indexer.set_executor(name, 2)
+            actual = TestIndexerExecutors.SeriesIndexer(parts).run()
+            self.assertEqual(len(expected), len(actual))
+            for i in xrange(len(expected)):
+                self.assertSequenceEqual(list(expected[i].index), list(actual[i].index))
+                self.assertSequenceEqual(list(expected[i].values), list(actual[i].values))
+
+    def test_executors_stream(self):
+        # the "process" backend must freeze Streams before sending them to a worker
+        parts = [self.in_stream, self.mixed_list, self.shared_mixed_list]
+        indexer.set_executor(u'serial')
+        expected = TestIndexerExecutors.StreamIndexer(parts).run()
+        for name in (u'thread', u'process'):
+            indexer.set_executor(name, 2)
+            actual = TestIndexerExecutors.StreamIndexer(parts).run()
+            self.assertEqual(len(expected), len(actual))
+            for i in xrange(len(expected)):
+                self.assertSequenceEqual(list(expected[i].index), list(actual[i].index))
+                self.assertSequenceEqual(list(expected[i].values), list(actual[i].values))
+
+
+class TestVectorIndexer(IndexerTestBase):
+    # That the column-wise path of series_indexer() agrees with the row-wise path.
+    def test_series_indexer_vector_1(self):
+        # unique_rows() with a row-wise function is the same as DataFrame.apply()
+        parts = [self.in_series, self.mixed_series_notes, self.mixed_series_rests]
+        row_func = lambda row: u','.join(unicode(x) for x in row)
+        vector = lambda columns: indexer.unique_rows(columns, row_func)
+        expected = indexer.series_indexer(0, parts, row_func)[1]
+        actual = indexer.series_indexer(0, parts, None, vector)[1]
+        self.assertSequenceEqual(list(expected.index), list(actual.index))
+        self.assertSequenceEqual(list(expected.values), list(actual.values))
+
+    def test_series_indexer_vector_2(self):
+        # the vector_func receives every part's aligned values, and its result is used verbatim
+        parts = [pandas.Series([1, 2], index=[0.0, 1.0]), pandas.Series([5], index=[0.5])]
+        vector = mock.MagicMock(return_value=numpy.array([u'a', u'b', u'c'], dtype=object))
+        actual = indexer.series_indexer(0, parts, None, vector)[1]
+        self.assertEqual(1, vector.call_count)
+        columns = vector.call_args[0][0]
+        self.assertSequenceEqual([1, 1, 2], list(columns[0]))
+        self.assertTrue(numpy.isnan(columns[1][0]))
+        self.assertSequenceEqual([5, 5], list(columns[1][1:]))
+        self.assertSequenceEqual([0.0, 0.5, 1.0], list(actual.index))
+        self.assertSequenceEqual([u'a', u'b', u'c'], list(actual.values))
+
+    def test_unique_rows_1(self):
+        # the row-wise function is called once per distinct row, and NaN is passed through
+        columns = [numpy.array([u'A4', u'A4', u'C4', u'A4', numpy.nan], dtype=object),
+                   numpy.array([u'C4', u'C4', u'C4', u'C4', u'C4'], dtype=object)]
+        calls = []
+        def row_func(row):
+            calls.append(row)
+            return unicode(row)
+        actual = indexer.unique_rows(columns, row_func)
+        self.assertEqual(3, len(calls))
+        expected = [unicode([columns[0][i], columns[1][i]]) for i in xrange(5)]
+        self.assertSequenceEqual(expected, list(actual))
+
+    def test_unique_rows_2(self):
+        # no columns, or empty columns
+        self.assertEqual(0, len(indexer.unique_rows([], fake_indexer_func)))
+        self.assertEqual(0, len(indexer.unique_rows([numpy.array([])], fake_indexer_func)))
+
+
 #--------------------------------------------------------------------------------------------------#
 # Definitions                                                                                      #
 #--------------------------------------------------------------------------------------------------#
@@ -565,4 +722,7 @@ INDEXER_1_PART_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestIndexerSi
 INDEXER_MULTI_EVENT_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestIndexerMultiEvent)
 UNIQUE_OFFSETS_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestMpiUniqueOffsets)
 VERT_ALIGNER_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestMpiVertAligner)
+EVENT_SWEEP_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestEventSweep)
 INDEXER_HARDCORE_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestIndexerHardcore)
+INDEXER_EXECUTOR_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestIndexerExecutors)
+VECTOR_INDEXER_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestVectorIndexer)
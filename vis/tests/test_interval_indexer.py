@@ -30,8 +30,10 @@
 
 
 import unittest
+import mock
 import pandas
-from music21 import interval, note
+from music21 import interval, note, pitch, converter
+from vis.analyzers.indexers import interval as interval_module, noterest
 from vis.analyzers.indexers.interval import IntervalIndexer, HorizontalIntervalIndexer, \
     real_indexer, key_to_tuple
 from vis.tests.test_note_rest_indexer import TestNoteRestIndexer
@@ -726,6 +728,54 @@ class TestIntervalIndexerIndexer(unittest.TestCase):
         actual = real_indexer(notes, quality=True, simple=True)
         self.assertEqual(expected, actual)
 
+    @staticmethod
+    def music21_indexer(upper, lower, simple, quality):
+        # the interval name straight from music21, without the table
+        interv = interval.Interval(note.Note(lower), note.Note(upper))
+        post = u'-' if interv.direction < 0 else u''
+        if quality:
+            post += u''.join(each for each in interv.name if each in u'AMPmd')
+        if simple:
+            post += u'8' if 8 == interv.generic.undirected \
+                else unicode(interv.generic.simpleUndirected)
+        else:
+            post += unicode(interv.generic.undirected)
+        return post
+
+    def test_int_ind_indexer_23(self):
+        # the table gives the same names as music21, for every combination of settings
+        names = [step + accid + unicode(octave) for step in u'CDEFGAB'
+                 for accid in (u'', u'#', u'-', u'##', u'--') for octave in (2, 4, 5)]
+        interval_module._INTERVAL_TABLE.clear()
+        for upper in names:
+            for lower in names[::7]:
+                for simple in (True, False):
+                    for quality in (True, False):
+                        expected = self.music21_indexer(upper, lower, simple, quality)
+                        actual = real_indexer([upper, lower], simple, quality)
+                        self.assertEqual(expected, actual)
+
+    def test_int_ind_indexer_24(self):
+        # music21 is only asked about a pair of notes once, whatever the settings
+        interval_module._INTERVAL_TABLE.clear()
+        with mock.patch(u'music21.interval.Interval',
+                        wraps=interval.Interval) as mock_interval:
+            for simple in (True, False):
+                for quality in (True, False):
+                    real_indexer([u'E5', u'C4'], simple, quality)
+                    real_indexer([u'Rest', u'C4'], simple, quality)
+            self.assertEqual(1, mock_interval.call_count)
+        self.assertEqual(u'M10', real_indexer([u'E5', u'C4'], False, True))
+        self.assertEqual(u'Rest', real_indexer([u'Rest', u'C4'], False, True))
+
+    def test_int_ind_indexer_25(self):
+        # pitch codes from the NoteRestIndexer give the same intervals, even as floats
+        upper = noterest.pitch_to_code(pitch.Pitch(u'G###4'))
+        lower = noterest.pitch_to_code(pitch.Pitch(u'C4'))
+        self.assertEqual(u'AAA5', real_indexer([upper, lower], False, True))
+        self.assertEqual(u'-AAA5', real_indexer([float(lower), float(upper)], True, True))
+        self.assertEqual(u'Rest', real_indexer([noterest.REST_CODE, lower], True, True))
+
 
 class TestHorizIntervalIndexerLong(unittest.TestCase):
     bwv77_S_B_short = [(0.5, "M2"),
@@ -942,6 +992,24 @@ class TestHorizIntervalIndexerLong(unittest.TestCase):
             self.assertEqual(expected[i][0], ind)
             self.assertEqual(expected[i][1], actual[ind])
 
+    def test_interval_indexer_3(self):
+        # BWV7.7 with pitch codes: the same vertical and horizontal intervals as with note names
+        bwv77 = converter.parse('vis/tests/corpus/bwv77.mxl').parts
+        names = noterest.NoteRestIndexer(bwv77).run()
+        codes = noterest.NoteRestIndexer(bwv77, {u'pitch codes': True}).run()
+        setts = {u'simple or compound': u'compound', u'quality': True}
+        expected = IntervalIndexer(names, setts).run()
+        actual = IntervalIndexer(codes, setts).run()
+        self.assertEqual(sorted(expected.keys()), sorted(actual.keys()))
+        for key in expected:
+            self.assertSequenceEqual(list(expected[key].index), list(actual[key].index))
+            self.assertSequenceEqual(list(expected[key].values), list(actual[key].values))
+        expected = HorizontalIntervalIndexer(names, setts).run()
+        actual = HorizontalIntervalIndexer(codes, setts).run()
+        for i in xrange(len(expected)):
+            self.assertSequenceEqual(list(expected[i].index), list(actual[i].index))
+            self.assertSequenceEqual(list(expected[i].values), list(actual[i].values))
+
 
 #-------------------------------------------------------------------------------------------------#
 # Definitions                                                                                      #
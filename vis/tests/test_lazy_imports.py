@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               test_lazy_imports.py
+# Purpose:                Tests that music21 is only imported when it's needed.
+#
+# Copyright (C) 2014 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+Tests that importing :mod:`vis` does not import :mod:`music21`, and for the helpers that make it
+possible.
+"""
+
+import os
+import sys
+import subprocess
+from unittest import TestCase, TestLoader
+import music21
+import pandas
+from vis.analyzers import indexer
+from vis.analyzers.indexers import noterest, lilypond
+from vis.models import score_cache
+
+# Run in a new interpreter: import vis, then print which music21 modules it imported.
+_IMPORT_VIS = u"""
+import sys
+import vis
+import vis.workflow
+print repr(sorted(name for name in sys.modules if name.split('.')[0] == 'music21'))
+"""
+
+
+def music21_after_import():
+    """
+    Import :mod:`vis` and :mod:`vis.workflow` in a new interpreter.
+
+    :returns: The :mod:`music21` modules that were imported by :mod:`vis`.
+    :rtype: list of str
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.check_output([sys.executable, u'-c', _IMPORT_VIS], cwd=root,
+                                     stderr=open(os.devnull, 'w'))
+    return eval(output.strip().split('\n')[-1])  # pylint: disable=W0123
+
+
+# pylint: disable=R0904
+# pylint: disable=C0111
+class TestLazyImports(TestCase):
+    def test_workflow_1(self):
+        # importing vis and the WorkflowManager doesn't import music21; run_benchmarks.py times
+        # the import
+        self.assertEqual([], music21_after_import())
+
+    def test_stream_type_1(self):
+        # the class is found when the attribute is read, on the class or on an instance
+        self.assertIs(music21.stream.Part, noterest.NoteRestIndexer.required_score_type)
+        self.assertIs(music21.stream.Score, lilypond.LilyPondIndexer.required_score_type)
+        test_ind = noterest.NoteRestIndexer([music21.stream.Part()])
+        self.assertIs(music21.stream.Part, test_ind.required_score_type)
+        self.assertRaises(TypeError, noterest.NoteRestIndexer, [pandas.Series()])
+
+    def test_is_stream_1(self):
+        self.assertTrue(indexer.is_stream(music21.stream.Part()))
+        self.assertFalse(indexer.is_stream(pandas.Series()))
+        self.assertFalse(indexer.is_stream(u'frozen'))
+
+    def test_music21_version_1(self):
+        self.assertEqual(music21.VERSION_STR, score_cache.music21_version())
+
+
+#-------------------------------------------------------------------------------------------------#
+# Definitions                                                                                     #
+#-------------------------------------------------------------------------------------------------#
+LAZY_IMPORTS_SUITE = TestLoader().loadTestsFromTestCase(TestLazyImports)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               analyzers_tests/test_maximal_experimenter.py
+# Purpose:                Tests for the MaximalNGramExperimenter.
+#
+# Copyright (C) 2013 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+
+# allow "no docstring" for everything
+# pylint: disable=C0111
+# allow "too many public methods" for TestCase
+# pylint: disable=R0904
+
+
+import unittest
+import numpy
+import pandas
+from vis.analyzers.indexers import ngram
+from vis.analyzers.experimenters.maximal import MaximalNGramExperimenter, suffix_array
+
+
+def tokens(verticals, horizontals=None, terminator=None):
+    "Make the token stream of one part, or of one part and its horizontal events."
+    score = [pandas.Series(verticals)]
+    setts = {u'vertical': [0], u'n': 1, u'mark_singles': False}
+    if horizontals is not None:
+        score.append(pandas.Series(horizontals, index=range(1, len(horizontals) + 1)))
+        setts[u'horizontal'] = [1]
+    if terminator is not None:
+        setts[u'terminator'] = [terminator]
+    return ngram.NGramIndexer(score, setts).tokens()[0]
+
+
+class TestSuffixArray(unittest.TestCase):
+    def test_suffix_array_1(self):
+        # "banana"
+        suffixes, shared = suffix_array(numpy.array([1, 0, 2, 0, 2, 0]))
+        self.assertSequenceEqual([5, 3, 1, 0, 4, 2], list(suffixes))
+        self.assertSequenceEqual([0, 1, 3, 0, 0, 2], list(shared))
+
+    def test_suffix_array_2(self):
+        # every suffix is different already, and the empty sequence
+        suffixes, shared = suffix_array(numpy.array([2, 0, 1]))
+        self.assertSequenceEqual([1, 2, 0], list(suffixes))
+        self.assertSequenceEqual([0, 0, 0], list(shared))
+        suffixes, shared = suffix_array(numpy.array([], dtype=numpy.int64))
+        self.assertEqual(0, len(suffixes))
+        self.assertEqual(0, len(shared))
+
+    def test_suffix_array_3(self):
+        # the same as sorting by brute force
+        codes = [0, 1, 1, 0, 1, 1, 0, 1, 2, 0, 1, 1, 0, 1, 1, 0]
+        expected = sorted(xrange(len(codes)), key=lambda i: codes[i:])
+        suffixes, shared = suffix_array(numpy.array(codes))
+        self.assertSequenceEqual(expected, list(suffixes))
+        for i in xrange(1, len(codes)):
+            this, other = codes[suffixes[i]:], codes[suffixes[i - 1]:]
+            common = 0
+            while common < min(len(this), len(other)) and this[common] == other[common]:
+                common += 1
+            self.assertEqual(common, shared[i])
+
+
+class TestMaximalNGramExperimenter(unittest.TestCase):
+    def test_maximal_1(self):
+        # "3 5" and "5 3" are only part of "3 5 3", but "3" also comes before 6
+        stream = tokens([u'3', u'5', u'3', u'5', u'3', u'6'])
+        actual = MaximalNGramExperimenter([stream], {u'min n': 1}).run()
+        self.assertSequenceEqual([u'3', u'3 5 3'], list(actual.index))
+        self.assertSequenceEqual([1, 3], list(actual[u'n']))
+        self.assertSequenceEqual([3, 2], list(actual[u'count']))
+
+    def test_maximal_2(self):
+        # "min n" and "max n" choose the lengths
+        stream = tokens([u'3', u'5', u'3', u'5', u'3', u'6'])
+        actual = MaximalNGramExperimenter([stream]).run()
+        self.assertSequenceEqual([u'3 5 3'], list(actual.index))
+        actual = MaximalNGramExperimenter([stream], {u'min n': 1, u'max n': 2}).run()
+        self.assertSequenceEqual([u'3'], list(actual.index))
+
+    def test_maximal_3(self):
+        # "min count"
+        stream = tokens([u'3', u'5', u'3', u'5', u'3', u'6'])
+        actual = MaximalNGramExperimenter([stream], {u'min n': 1, u'min count': 3}).run()
+        self.assertSequenceEqual([u'3'], list(actual.index))
+        self.assertRaises(RuntimeError, MaximalNGramExperimenter, [stream], {u'min count': 1})
+        self.assertRaises(RuntimeError, MaximalNGramExperimenter, [stream], {u'min n': 0})
+
+    def test_maximal_4(self):
+        # no n-gram goes past a terminator, and an n-gram next to one is maximal
+        stream = tokens([u'3', u'5', u'3', u'Rest', u'3', u'5', u'3'], terminator=u'Rest')
+        actual = MaximalNGramExperimenter([stream], {u'min n': 1}).run()
+        self.assertSequenceEqual([u'3', u'3 5 3'], list(actual.index))
+        self.assertSequenceEqual([4, 2], list(actual[u'count']))
+
+    def test_maximal_5(self):
+        # streams of different pieces are counted together, but no n-gram goes from one to another
+        first = tokens([u'3', u'5', u'6'])
+        second = tokens([u'3', u'5', u'8', u'3'])
+        actual = MaximalNGramExperimenter([first, second]).run()
+        self.assertSequenceEqual([u'3 5'], list(actual.index))
+        self.assertSequenceEqual([2], list(actual[u'count']))
+        actual = MaximalNGramExperimenter({u'a': first, u'b': second}).run()
+        self.assertSequenceEqual([u'3 5'], list(actual.index))
+
+    def test_maximal_6(self):
+        # with "horizontal" events, the same n-grams (and counts) as the NGramIndexer, where an
+        # n-gram with different steps between its vertical events is a different n-gram
+        verticals = [u'3', u'5', u'3', u'5', u'3', u'5', u'6', u'3', u'5']
+        horizontals = [u'2', u'-2', u'2', u'-2', u'2', u'1', u'1', u'2']
+        stream = tokens(verticals, horizontals)
+        actual = MaximalNGramExperimenter([stream], {u'min n': 1}).run()
+        # "5" always comes after "3 2"
+        expected = {u'3 2 5 -2 3 2 5': (4, 2), u'3 2 5': (2, 4)}
+        self.assertEqual(expected, {name: (row[u'n'], row[u'count'])
+                                    for name, row in actual.iterrows()})
+        score = [pandas.Series(verticals),
+                 pandas.Series(horizontals, index=range(1, len(horizontals) + 1))]
+        for name, row in actual.iterrows():
+            setts = {u'vertical': [0], u'horizontal': [1], u'n': row[u'n'], u'mark_singles': False}
+            ngrams = ngram.NGramIndexer(score, setts).run()[0]
+            self.assertEqual(row[u'count'], list(ngrams.values).count(name))
+
+    def test_maximal_7(self):
+        # nothing to find
+        actual = MaximalNGramExperimenter([tokens([u'3', u'5', u'6'])]).run()
+        self.assertSequenceEqual([u'n', u'count'], list(actual.columns))
+        self.assertEqual(0, len(actual))
+        actual = MaximalNGramExperimenter([]).run()
+        self.assertEqual(0, len(actual))
+
+
+#--------------------------------------------------------------------------------------------------#
+# Definitions                                                                                      #
+#--------------------------------------------------------------------------------------------------#
+SUFFIX_ARRAY_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestSuffixArray)
+MAXIMAL_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestMaximalNGramExperimenter)
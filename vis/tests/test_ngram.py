@@ -213,6 +213,10 @@ class TestNGramIndexer(unittest.TestCase):
         self.assertRaises(RuntimeError, ngram.NGramIndexer, [vertical], setts)
         setts = {u'n':14, u'horizontal': [0]}  # no "vertical" parts
         self.assertRaises(RuntimeError, ngram.NGramIndexer, [vertical], setts)
+        setts = {u'n':14, u'combinations': None}  # no "vertical" parts or combinations
+        self.assertRaises(RuntimeError, ngram.NGramIndexer, [vertical], setts)
+        setts = {u'n': [2, 3, 2], u'vertical': [0]}  # the same "n" twice
+        self.assertRaises(RuntimeError, ngram.NGramIndexer, [vertical], setts)
 
     def test_ngram_7(self):
         # test _0 with a terminator; nothing should be picked up after terminator
@@ -369,20 +373,18 @@ class TestNGramIndexer(unittest.TestCase):
             mock_f.return_value = u''
             ng_ind.run()
             calls = mock_f.call_args_list
-            # 13 calls because there's one at the end when we run off the end of the list
-            self.assertEqual(13, len(calls))
-            expected_calls = [['A', 'Z', 'Q'],
-                              ['a', 'z'],
-                              ['B', 'X', 'R'],
-                              ['B', 'X', 'R'],
+            # 10 calls because every row is formatted once: first the horizontal (then the
+            # continuer, for offsets without horizontal events), then the vertical
+            self.assertEqual(10, len(calls))
+            expected_calls = [['a', 'z'],
                               ['b', 'x'],
-                              ['C', 'Y', 'S'],
-                              ['C', 'Y', 'S'],
                               ['c', 'y'],
-                              ['D', 'W', 'T'],
-                              ['D', 'W', 'T'],
                               ['d', 'w'],
-                              ['E', 'V', 'U'],
+                              ['_', '_'],
+                              ['A', 'Z', 'Q'],
+                              ['B', 'X', 'R'],
+                              ['C', 'Y', 'S'],
+                              ['D', 'W', 'T'],
                               ['E', 'V', 'U']]
             actual_calls = [x[0][0] for x in calls]  # just the "things" argument
             self.assertSequenceEqual(expected_calls, actual_calls)
@@ -433,6 +435,95 @@ class TestNGramIndexer(unittest.TestCase):
             self.assertSequenceEqual(list(expected_many[i].index), list(actual_many[i].index))
             self.assertSequenceEqual(list(expected_many[i].values), list(actual_many[i].values))
 
+    def test_ngram_19(self):
+        # n=3 with terminators: only windows without one are n-grams, and the last complete window
+        # is the last n-gram
+        vertical = pandas.Series(['A', 'B', 'C', 'T', 'D', 'E', 'T', 'F', 'G', 'H', 'I'])
+        horizontal = pandas.Series(['b', 'c', 't', 'd', 'e', 't', 'f', 'g', 'h', 'i'],
+                                   index=range(1, 11))
+        setts = {u'n': 3, u'horizontal': [1], u'vertical': [0], u'terminator': [u'T'],
+                 u'mark_singles': False}
+        expected = [pandas.Series([u'A b B c C', u'F g G h H', u'G h H i I'], index=[0, 7, 8])]
+        actual = ngram.NGramIndexer([vertical, horizontal], setts).run()
+        self.assertEqual(len(expected), len(actual))
+        self.assertSequenceEqual(list(expected[0].index), list(actual[0].index))
+        self.assertSequenceEqual(list(expected[0].values), list(actual[0].values))
+
+    def test_ngram_20(self):
+        # the "combinations" setting gives the same results as one NGramIndexer per combination,
+        # even where a combination's own offsets differ from the others'
+        upper = pandas.Series(['A', 'B', 'C', 'D'])
+        middle = pandas.Series(['M', 'N', 'O'], index=[0, 1.5, 3])
+        lower = pandas.Series(['b', 'c', 'd'], index=[1, 2, 3])
+        score = [upper, middle, lower]
+        combos = [([0], [2]), ([1], [2]), ([0, 1], [2]), ([1], [])]
+        setts = {u'n': 2, u'mark_singles': False}
+        actual = ngram.NGramIndexer(score, dict(setts, combinations=combos)).run()
+        self.assertEqual(len(combos), len(actual))
+        for (vertical, horizontal), act in zip(combos, actual):
+            one_setts = dict(setts, vertical=vertical, horizontal=horizontal)
+            expected = ngram.NGramIndexer(score, one_setts).run()[0]
+            self.assertSequenceEqual(list(expected.index), list(act.index))
+            self.assertSequenceEqual(list(expected.values), list(act.values))
+        self.assertSequenceEqual([u'M b M', u'M _ N', u'N c N', u'N d O'], list(actual[1].values))
+
+    def test_ngram_21(self):
+        # a "horizontal" index shared by combinations is formatted only once
+        upper = pandas.Series(['A', 'B', 'C'])
+        middle = pandas.Series(['M', 'N', 'O'])
+        lower = pandas.Series(['b', 'c'], index=[1, 2])
+        setts = {u'n': 2, u'combinations': [([0], [2]), ([1], [2])]}
+        ng_ind = ngram.NGramIndexer([upper, middle, lower], setts)
+        with mock.patch(u'vis.analyzers.indexers.ngram.NGramIndexer._format_horiz') as mock_f:
+            mock_f.return_value = u'(x)'
+            actual = ng_ind.run()
+        # two events and the continuer
+        self.assertEqual(3, mock_f.call_count)
+        self.assertSequenceEqual([u'[A] (x) [B]', u'[B] (x) [C]'], list(actual[0].values))
+
+    def test_ngram_22(self):
+        # a list of "n" values gives the same n-grams as one NGramIndexer for each, combination by
+        # combination, and a terminator stops all of them
+        upper = pandas.Series(['A', 'B', 'C', 'D', 'E', 'F'])
+        lower = pandas.Series(['b', 'c', 'd', 'e', 'f'], index=[1, 2, 3, 4, 5])
+        other = pandas.Series(['M', 'N', 'T', 'O', 'P', 'Q'])
+        score = [upper, lower, other]
+        setts = {u'terminator': [u'T'], u'mark_singles': False}
+        combos = [([0], [1]), ([2], [1])]
+        actual = ngram.NGramIndexer(score, dict(setts, n=[3, 1, 2], combinations=combos)).run()
+        self.assertEqual(6, len(actual))
+        for i, (vertical, horizontal) in enumerate(combos):
+            for j, n in enumerate([3, 1, 2]):
+                one_setts = dict(setts, n=n, vertical=vertical, horizontal=horizontal)
+                expected = ngram.NGramIndexer(score, one_setts).run()[0]
+                self.assertSequenceEqual(list(expected.index), list(actual[i * 3 + j].index))
+                self.assertSequenceEqual(list(expected.values), list(actual[i * 3 + j].values))
+        self.assertSequenceEqual([u'O e P', u'P f Q'], list(actual[5].values[1:]))
+        self.assertEqual(1, len(ngram.NGramIndexer(score, dict(setts, n=range(2, 3), vertical=[0],
+                                                                horizontal=[1])).run()))
+
+    def test_ngram_23(self):
+        # every "n" value must be at least 1, and there must be one
+        vertical = pandas.Series(['A', 'B', 'C', 'D'])
+        for n in ([2, 0], []):
+            self.assertRaises(RuntimeError, ngram.NGramIndexer, [vertical],
+                              {u'n': n, u'vertical': [0]})
+
+    def test_ngram_24(self):
+        # tokens() gives every combination's vertical events and the steps between them, which
+        # the n-grams are made from
+        upper = pandas.Series(['A', 'B', 'T', 'D'])
+        lower = pandas.Series(['b', 'd'], index=[1, 3])
+        setts = {u'n': 2, u'vertical': [0], u'horizontal': [1], u'terminator': [u'T'],
+                 u'mark_singles': False}
+        ng_ind = ngram.NGramIndexer([upper, lower], setts)
+        actual = ng_ind.tokens()
+        self.assertEqual(1, len(actual))
+        self.assertSequenceEqual([0, 1, 2, 3], list(actual[0].index))
+        self.assertSequenceEqual([u'A', u'B', None, u'D'], list(actual[0][u'vertical']))
+        self.assertSequenceEqual([u' _ A', u' b B', None, u' d D'], list(actual[0][u'step']))
+        self.assertSequenceEqual([u'A b B'], list(ng_ind.run()[0].values))
+
     def test_ngram_format_1(self):
         # one thing, it's a terminator (don't mark singles)
         # pylint: disable=W0212
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               test_ngram_index.py
+# Purpose:                Tests for models/ngram_index.py
+#
+# Copyright (C) 2014 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+Tests for :py:mod:`~vis.models.ngram_index`.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase, TestLoader
+import pandas
+from vis.models import ngram_index
+from vis.models.indexed_piece import IndexedPiece
+from vis.workflow import WorkflowManager
+
+
+# pylint: disable=R0904
+# pylint: disable=C0111
+# pylint: disable=W0212
+class TestNGramIndex(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.directory, u'index')
+        self.pieces = [IndexedPiece(u'kyrie.xml'), IndexedPiece(u'gloria.xml'),
+                       IndexedPiece(u'credo.xml')]
+        self.results = [[pandas.Series([u'3 -2 3', u'3 1 5', u'3 -2 3'], index=[0.0, 1.0, 2.5],
+                                       name=u'0,1'),
+                         pandas.Series([u'8 2 6'], index=[4.0], name=u'0,2')],
+                        [pandas.Series([u'8 2 6', u'3 -2 3'], index=[1.0, 0.0], name=u'0,1')],
+                        [pandas.Series([u'3 1 5', u'5 1 3'], index=[2.0, 3.0])]]
+        ngram_index.write_index(self.index_dir, self.pieces, self.results)
+        self.index = ngram_index.open_index(self.index_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertPostings(self, expected, actual):  # pylint: disable=C0103
+        self.assertEqual(ngram_index.COLUMNS, list(actual.columns))
+        self.assertEqual(expected, [tuple(row) for row in actual.values])
+
+    def test_write_1(self):
+        # the distinct n-grams are sorted, and the pieces are kept in order
+        self.assertEqual(4, len(self.index))
+        self.assertEqual([u'3 -2 3', u'3 1 5', u'5 1 3', u'8 2 6'], self.index.ngrams())
+        self.assertEqual([(u'kyrie.xml', None), (u'gloria.xml', None), (u'credo.xml', None)],
+                         self.index.pieces())
+
+    def test_write_2(self):
+        # there must be results for every piece
+        self.assertRaises(ValueError, ngram_index.write_index, self.index_dir, self.pieces,
+                          self.results[:2])
+
+    def test_write_3(self):
+        # an empty index can be written and queried
+        ngram_index.write_index(self.index_dir, [], [])
+        index = ngram_index.open_index(self.index_dir)
+        self.assertEqual(0, len(index))
+        self.assertEqual([], index.ngrams())
+        self.assertPostings([], index.lookup(u'3 1 5'))
+        self.assertPostings([], index.shared(0))
+
+    def test_open_1(self):
+        # the same index is re-used, until it's written again
+        self.assertTrue(self.index is ngram_index.open_index(self.index_dir))
+        ngram_index.write_index(self.index_dir, self.pieces[:1], self.results[:1])
+        index = ngram_index.open_index(self.index_dir)
+        self.assertFalse(self.index is index)
+        self.assertEqual(1, len(index.pieces()))
+        self.assertEqual(None, ngram_index.open_index(os.path.join(self.directory, u'nothing')))
+
+    def test_lookup_1(self):
+        # postings are sorted by piece, combination, and offset; unnamed Series are numbered
+        self.assertPostings([(u'3 -2 3', 0, u'0,1', 0.0), (u'3 -2 3', 0, u'0,1', 2.5),
+                             (u'3 -2 3', 1, u'0,1', 0.0)],
+                            self.index.lookup(u'3 -2 3'))
+        self.assertPostings([(u'3 1 5', 0, u'0,1', 1.0), (u'3 1 5', 2, u'0', 2.0)],
+                            self.index.lookup(u'3 1 5'))
+
+    def test_lookup_2(self):
+        # n-grams that aren't there, including a prefix and one longer than any in the index
+        self.assertPostings([], self.index.lookup(u'3 -2'))
+        self.assertPostings([], self.index.lookup(u'3 -2 3 -2 3 -2 3'))
+
+    def test_prefix_1(self):
+        self.assertPostings([(u'3 -2 3', 0, u'0,1', 0.0), (u'3 -2 3', 0, u'0,1', 2.5),
+                             (u'3 -2 3', 1, u'0,1', 0.0), (u'3 1 5', 0, u'0,1', 1.0),
+                             (u'3 1 5', 2, u'0', 2.0)],
+                            self.index.prefix(u'3 '))
+        self.assertEqual([u'3 1 5'], self.index.ngrams(u'3 1'))
+        self.assertEqual([u'3 1 5'], self.index.ngrams(u'3 1 5'))
+        self.assertEqual([], self.index.ngrams(u'3 1 5 '))
+        self.assertEqual(4, len(self.index.ngrams(u'')))
+
+    def test_shared_1(self):
+        # n-grams of a piece that also occur in any other piece, or in some of them
+        self.assertPostings([(u'3 -2 3', 0, u'0,1', 0.0), (u'3 -2 3', 0, u'0,1', 2.5),
+                             (u'3 1 5', 0, u'0,1', 1.0), (u'8 2 6', 0, u'0,2', 4.0)],
+                            self.index.shared(0))
+        self.assertPostings([(u'3 1 5', 0, u'0,1', 1.0)], self.index.shared(0, [2]))
+        self.assertPostings([], self.index.shared(2, [1]))
+        self.assertPostings([], self.index.shared(1, [1]))
+
+
+class TestWorkflowNGramIndex(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.directory, u'index')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_export_1(self):
+        # the index has every n-gram of every voice pair in every piece
+        test_wm = WorkflowManager([u'vis/tests/corpus/bwv77.mxl', u'vis/tests/corpus/bwv2.xml'])
+        test_wm.load(u'pieces')
+        test_wm.settings(None, u'count frequency', False)
+        for i in xrange(len(test_wm)):
+            test_wm.settings(i, u'voice combinations', u'all pairs')
+        result = test_wm.run(u'interval n-grams')
+        self.assertEqual(self.index_dir, test_wm.export(u'n-gram index', self.index_dir))
+        index = ngram_index.open_index(self.index_dir)
+        for i, piece in enumerate(result):
+            self.assertEqual(6, len(piece))
+            for series in piece:
+                for ngram in series.unique()[:5]:
+                    postings = index.lookup(ngram)
+                    postings = postings[(postings[u'piece'] == i) &
+                                        (postings[u'combination'] == series.name)]
+                    self.assertEqual(sorted(series[series == ngram].index),
+                                     list(postings[u'offset']))
+        self.assertEqual(sum(len(x) for piece in result for x in piece),
+                         len(index.prefix(u'')))
+
+    def test_export_2(self):
+        # the n-grams of every piece are needed
+        test_wm = WorkflowManager([u'vis/tests/corpus/bwv77.mxl'])
+        test_wm.load(u'pieces')
+        test_wm.run(u'intervals')
+        self.assertRaises(RuntimeError, test_wm.export, u'n-gram index', self.index_dir)
+        test_wm.settings(0, u'voice combinations', u'all pairs')
+        test_wm.run(u'interval n-grams')
+        self.assertRaises(RuntimeError, test_wm.export, u'n-gram index', self.index_dir)
+        self.assertFalse(os.path.exists(self.index_dir))
+
+
+#-------------------------------------------------------------------------------------------------#
+# Definitions                                                                                     #
+#-------------------------------------------------------------------------------------------------#
+NGRAM_INDEX_SUITE = TestLoader().loadTestsFromTestCase(TestNGramIndex)
+WORKFLOW_NGRAM_INDEX_SUITE = TestLoader().loadTestsFromTestCase(TestWorkflowNGramIndex)
@@ -30,8 +30,9 @@
 
 
 import unittest
+import numpy
 import pandas
-from music21 import converter, stream, clef, bar, note
+from music21 import converter, stream, clef, bar, note, pitch
 from vis.analyzers.indexers import noterest
 
 class TestNoteRestIndexer(unittest.TestCase):
@@ -330,6 +331,45 @@ class TestNoteRestIndexer(unittest.TestCase):
             self.assertEqual(expected[1][i][0], ind)
             self.assertEqual(expected[1][i][1], actual[1][ind])
 
+    def test_note_rest_indexer_12(self):
+        # with "pitch codes," the same parts give ints that decode to the same names
+        bwv77 = converter.parse('vis/tests/corpus/bwv77.mxl')
+        test_part = [bwv77.parts[0], bwv77.parts[3]]
+        expected = noterest.NoteRestIndexer(test_part).run()
+        actual = noterest.NoteRestIndexer(test_part, {u'pitch codes': True}).run()
+        self.assertEqual(len(expected), len(actual))
+        for i in xrange(len(expected)):
+            self.assertEqual(numpy.int64, actual[i].dtype)
+            self.assertSequenceEqual(list(expected[i].index), list(actual[i].index))
+            self.assertSequenceEqual(list(expected[i].values),
+                                     [noterest.code_to_name(x) for x in actual[i].values])
+
+    def test_note_rest_indexer_13(self):
+        # rests, and empty parts, with "pitch codes"
+        test_part = stream.Part()
+        test_part.append(note.Note(u'C4'))
+        test_part.append(note.Rest())
+        actual = noterest.NoteRestIndexer([test_part, stream.Part()], {u'pitch codes': True}).run()
+        self.assertSequenceEqual([noterest.pitch_to_code(pitch.Pitch(u'C4')), noterest.REST_CODE],
+                                 list(actual[0].values))
+        self.assertEqual(numpy.int64, actual[1].dtype)
+        self.assertEqual(0, len(actual[1]))
+
+    def test_pitch_codes_1(self):
+        # every spelling has its own code, and decodes to its nameWithOctave
+        names = [step + modifier + unicode(octave) for step in u'CDEFGAB'
+                 for modifier in (u'', u'#', u'-', u'##', u'--', u'###', u'---', u'####', u'----',
+                                  u'~', u'`', u'#~', u'-`')
+                 for octave in xrange(0, 9)]
+        codes = [noterest.pitch_to_code(pitch.Pitch(name)) for name in names]
+        self.assertEqual(len(names), len(set(codes)))
+        self.assertNotIn(noterest.REST_CODE, codes)
+        for name, code in zip(names, codes):
+            self.assertEqual(pitch.Pitch(name).nameWithOctave, noterest.code_to_name(code))
+        # what pandas makes when it fills in missing values
+        self.assertEqual(names[0], noterest.code_to_name(float(codes[0])))
+        self.assertEqual(u'Rest', noterest.code_to_name(float(noterest.REST_CODE)))
+
 
 #--------------------------------------------------------------------------------------------------#
 # Definitions                                                                                      #
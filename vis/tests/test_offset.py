@@ -30,6 +30,7 @@
 
 
 import unittest
+import numpy
 import pandas
 from vis.analyzers.indexers.offset import FilterByOffsetIndexer
 
@@ -314,9 +315,68 @@ class TestOffsetIndexerManyParts(unittest.TestCase):
             self.assertEqual(len(expected[i]), len(actual[i]))  # same number of rows?
             self.assertEqual(list(expected[i].index), list(actual[i].index))  # same row names?
 
+
+class TestOffsetIndexerTicks(unittest.TestCase):
+    # the u'ticks' and u'dataframe' settings
+    def setUp(self):
+        self.in_val = [pandas.Series(['a', 'b', 'c', 'd'], index=[0.0, 0.4, 1.1, 2.9]),
+                       pandas.Series(['q', 'w', 'e', 'r'], index=[0.5, 0.6, 1.4, 2.6]),
+                       pandas.Series(['t', 'a', 'l', 'l', 'o', 'r', 'd', 'e', 'r'],
+                                     index=[0.0, 0.2, 1.9, 2.5, 4.0, 5.0, 6.0, 7.0, 8.0])]
+
+    def test_ticks_1(self):
+        # same results as the float offsets, when those work
+        for q_l in (0.25, 0.5, 1.0, 3.0):
+            expected = FilterByOffsetIndexer(self.in_val, {u'quarterLength': q_l}).run()
+            actual = FilterByOffsetIndexer(self.in_val, {u'quarterLength': q_l,
+                                                         u'ticks': True}).run()
+            self.assertEqual(len(expected), len(actual))
+            for i in xrange(len(expected)):
+                self.assertSequenceEqual(list(expected[i].index), list(actual[i].index))
+                self.assertSequenceEqual(list(expected[i].fillna(u'NaN').values),
+                                         list(actual[i].fillna(u'NaN').values))
+
+    def test_ticks_2(self):
+        # triplets are found where they happen
+        in_val = [pandas.Series(['a', 'b', 'c', 'd'], index=[0.0, 1.0 / 3, 2.0 / 3, 1.0])]
+        actual = FilterByOffsetIndexer(in_val, {u'quarterLength': 1.0 / 3, u'ticks': True}).run()
+        self.assertSequenceEqual(list(in_val[0].index), list(actual[0].index))
+        self.assertSequenceEqual(['a', 'b', 'c', 'd'], list(actual[0].values))
+
+    def test_ticks_3(self):
+        # empty parts
+        in_val = [pandas.Series(), pandas.Series(['a', 'b', 'c'], index=[0.0, 0.5, 1.0])]
+        actual = FilterByOffsetIndexer(in_val, {u'quarterLength': 0.5, u'ticks': True}).run()
+        self.assertEqual(0, len(actual[0]))
+        self.assertSequenceEqual(['a', 'b', 'c'], list(actual[1].values))
+        actual = FilterByOffsetIndexer([pandas.Series(), pandas.Series()],
+                                       {u'quarterLength': 0.5, u'ticks': True}).run()
+        self.assertEqual([0, 0], [len(x) for x in actual])
+
+    def test_dataframe_1(self):
+        # all parts aligned to the same offsets, with NaN after a part ends
+        actual = FilterByOffsetIndexer(self.in_val, {u'quarterLength': 1.0,
+                                                     u'dataframe': True}).run()
+        self.assertIsInstance(actual, pandas.DataFrame)
+        self.assertSequenceEqual([0, 1, 2], list(actual.columns))
+        self.assertSequenceEqual([float(x) for x in xrange(9)], list(actual.index))
+        self.assertSequenceEqual(['a', 'b', 'c', 'd'], list(actual[0].iloc[:4]))
+        self.assertTrue(actual[0].iloc[4:].isnull().all())
+        self.assertTrue(numpy.isnan(actual[1].iloc[0]))
+        self.assertSequenceEqual(['w', 'e', 'r'], list(actual[1].iloc[1:4]))
+        self.assertSequenceEqual(['t', 'a', 'l', 'l', 'o', 'r', 'd', 'e', 'r'], list(actual[2]))
+
+    def test_dataframe_2(self):
+        # no parts have events
+        actual = FilterByOffsetIndexer([pandas.Series(), pandas.Series()],
+                                       {u'quarterLength': 1.0, u'dataframe': True}).run()
+        self.assertEqual((0, 2), actual.shape)
+
+
 #--------------------------------------------------------------------------------------------------#
 # Definitions                                                                                      #
 #--------------------------------------------------------------------------------------------------#
 OFFSET_INDEXER_SINGLE_SUITE = \
     unittest.TestLoader().loadTestsFromTestCase(TestOffsetIndexerSinglePart)
 OFFSET_INDEXER_MULTI_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestOffsetIndexerManyParts)
+OFFSET_INDEXER_TICKS_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestOffsetIndexerTicks)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               test_profiling.py
+# Purpose:                Tests for models/profiling.py
+#
+# Copyright (C) 2014 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+Tests for :py:mod:`~vis.models.profiling`.
+"""
+
+import os
+from unittest import TestCase, TestLoader
+import pandas
+from vis.analyzers.indexers import noterest
+from vis.models import profiling
+from vis.models.indexed_piece import IndexedPiece
+from vis.workflow import WorkflowManager
+
+
+# pylint: disable=R0904
+# pylint: disable=C0111
+# pylint: disable=W0212
+class TestProfiler(TestCase):
+    def setUp(self):
+        self.piece = IndexedPiece(u'piece.xml')
+        self.previous = profiling.set_profiler(None)
+
+    def tearDown(self):
+        profiling.set_profiler(self.previous)
+
+    def test_count_rows_1(self):
+        series = pandas.Series([1, 2, 3])
+        self.assertEqual(3, profiling.count_rows(series))
+        self.assertEqual(5, profiling.count_rows([series, pandas.Series([4, 5])]))
+        self.assertEqual(4, profiling.count_rows({u'a': series, u'b': pandas.DataFrame([1])}))
+        self.assertEqual(None, profiling.count_rows([series, u'a']))
+        self.assertEqual(None, profiling.count_rows(None))
+
+    def test_measure_1(self):
+        # a record has every column; nested stages are one deeper
+        profiler = profiling.Profiler()
+        series = pandas.Series([1, 2])
+        inner = lambda: profiler.measure(self.piece, noterest.NoteRestIndexer, lambda: [series])
+        self.assertEqual(u'result', profiler.measure(self.piece, u'outer', lambda: inner() and
+                                                     u'result', data=series, memoized=True))
+        records = profiler.records()
+        self.assertEqual(2, len(profiler))
+        self.assertEqual([u'NoteRestIndexer', u'outer'], [rec[u'stage'] for rec in records])
+        self.assertEqual([1, 0], [rec[u'depth'] for rec in records])
+        self.assertEqual([None, 2], [rec[u'rows in'] for rec in records])
+        self.assertEqual([2, None], [rec[u'rows out'] for rec in records])
+        self.assertEqual([False, True], [rec[u'memoized'] for rec in records])
+        for rec in records:
+            self.assertEqual(sorted(profiling.COLUMNS), sorted(rec.keys()))
+            self.assertEqual(u'piece.xml', rec[u'piece'])
+            self.assertTrue(rec[u'wall'] >= 0.0)
+        self.assertEqual(profiling.COLUMNS, list(profiler.dataframe().columns))
+
+    def test_measure_2(self):
+        # an exception is raised without a record, and the depth is restored
+        profiler = profiling.Profiler()
+        self.assertRaises(ZeroDivisionError, profiler.measure, self.piece, u'x', lambda: 1 / 0)
+        self.assertEqual(0, len(profiler))
+        profiler.measure(self.piece, u'x', lambda: None)
+        self.assertEqual(0, profiler.records()[0][u'depth'])
+
+    def test_measure_3(self):
+        # without a profiler, the module-level measure() only calls the function
+        self.assertEqual(4, profiling.measure(self.piece, u'x', lambda: 4))
+        profiler = profiling.Profiler()
+        self.assertEqual(None, profiling.set_profiler(profiler))
+        self.assertEqual(4, profiling.measure(self.piece, u'x', lambda: 4))
+        self.assertEqual(1, len(profiler))
+        self.assertTrue(profiling.get_profiler() is profiler)
+
+    def test_callback_1(self):
+        # the callback gets records as they are made or added
+        received = []
+        profiler = profiling.Profiler(received.append)
+        profiler.measure(self.piece, u'x', lambda: None)
+        profiler.add([{u'stage': u'y'}])
+        self.assertEqual([u'x', u'y'], [rec[u'stage'] for rec in received])
+
+
+class TestWorkflowProfiling(TestCase):
+    def setUp(self):
+        self.pathnames = [u'vis/tests/corpus/bwv77.mxl', u'vis/tests/corpus/bwv2.xml']
+
+    def check_profile(self, test_wm, stage):
+        "Every piece has one record for the WorkflowManager step, and one for NoteRestIndexer."
+        profile = test_wm.profile()
+        self.assertEqual(profiling.COLUMNS, list(profile.columns))
+        for pathname in self.pathnames:
+            of_piece = profile[profile[u'piece'] == pathname]
+            self.assertEqual([stage], list(of_piece[of_piece[u'depth'] == 0][u'stage']))
+            self.assertEqual(1, (of_piece[u'stage'] == u'NoteRestIndexer').sum())
+        return profile
+
+    def test_profile_1(self):
+        # load() and run() each make a new profile, in one process
+        test_wm = WorkflowManager(self.pathnames)
+        test_wm.settings(None, u'profile', True)
+        test_wm.load(u'pieces')
+        profile = self.check_profile(test_wm, u'load')
+        self.assertFalse(profile[u'memoized'].any())
+        test_wm.run(u'intervals')
+        profile = self.check_profile(test_wm, u'run')
+        self.assertTrue(profile[profile[u'stage'] == u'NoteRestIndexer'][u'memoized'].all())
+        self.assertEqual(2, (profile[u'stage'] == u'IntervalIndexer').sum())
+        self.assertEqual(None, profiling.get_profiler())
+
+    def test_profile_2(self):
+        # records made in worker processes are collected, and given to the callback
+        received = []
+        test_wm = WorkflowManager(self.pathnames)
+        test_wm.settings(None, u'processes', 2)
+        test_wm.settings(None, u'profile', received.append)
+        test_wm.load(u'pieces')
+        loaded = len(self.check_profile(test_wm, u'load'))
+        self.assertEqual(loaded, len(received))
+        test_wm.run(u'intervals')
+        profile = self.check_profile(test_wm, u'run')
+        self.assertEqual(len(profile), len(received) - loaded)
+        self.assertFalse((profile[u'process'] == os.getpid()).any())
+        self.assertEqual(None, profiling.get_profiler())
+
+    def test_profile_3(self):
+        # without the "profile" setting there is nothing to get
+        test_wm = WorkflowManager(self.pathnames)
+        test_wm.load(u'pieces')
+        self.assertRaises(RuntimeError, test_wm.profile)
+
+
+#-------------------------------------------------------------------------------------------------#
+# Definitions                                                                                     #
+#-------------------------------------------------------------------------------------------------#
+PROFILING_SUITE = TestLoader().loadTestsFromTestCase(TestProfiler)
+WORKFLOW_PROFILING_SUITE = TestLoader().loadTestsFromTestCase(TestWorkflowProfiling)
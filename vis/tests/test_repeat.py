@@ -118,6 +118,20 @@ class TestRepeatIndexer(unittest.TestCase):
             self.assertSequenceEqual(list(expected[i].index), list(actual[i].index))
             self.assertSequenceEqual(list(expected[i].values), list(actual[i].values))
 
+    def test_offset_1part_7(self):
+        # the input isn't modified
+        in_val = [pandas.Series(['a', 'a', 'b', 'b'], index=[0.0, 0.25, 0.5, 0.75])]
+        FilterByRepeatIndexer(in_val).run()
+        self.assertSequenceEqual(['a', 'a', 'b', 'b'], list(in_val[0].values))
+
+    def test_offset_1part_8(self):
+        # pitch codes from the NoteRestIndexer stay ints
+        in_val = [pandas.Series([463, 463, -1, 470, 470], index=[0.0, 0.25, 0.5, 0.75, 1.0])]
+        actual = FilterByRepeatIndexer(in_val).run()
+        self.assertEqual(in_val[0].dtype, actual[0].dtype)
+        self.assertSequenceEqual([0.0, 0.5, 0.75], list(actual[0].index))
+        self.assertSequenceEqual([463, -1, 470], list(actual[0].values))
+
     def test_offset_2parts_1(self):
         # pseudo-random, many parts
         in_val = [pandas.Series(['d', 'd', 'a', 's', 's', 'd', 'f', 'a', 'f', 'f', 's', 'd', 'f',
@@ -140,6 +154,25 @@ class TestRepeatIndexer(unittest.TestCase):
         for i in xrange(len(expected)):  # compare each Series
             self.assertSequenceEqual(list(expected[i].index), list(actual[i].index))
             self.assertSequenceEqual(list(expected[i].values), list(actual[i].values))
+    def test_offset_2parts_2(self):
+        # the "batch" setting gives the same results, even when the parts have different offsets
+        in_val = [pandas.Series(['d', 'd', 'a', 's', 's', 'd', 'f', 'a', 'f', 'f'],
+                                index=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10]),
+                  pandas.Series(['a', 'a', 'b', 'b', 'b', 'a'], index=[0, 2, 3, 5, 8, 11]),
+                  pandas.Series([463, 463, -1, 470], index=[0.5, 1, 2, 2.5]),
+                  pandas.Series()]
+        expected = FilterByRepeatIndexer(in_val).run()
+        actual = FilterByRepeatIndexer(in_val, {u'batch': True}).run()
+        self.assertEqual(len(expected), len(actual))
+        for i in xrange(len(expected)):
+            self.assertEqual(expected[i].dtype, actual[i].dtype)
+            self.assertSequenceEqual(list(expected[i].index), list(actual[i].index))
+            self.assertSequenceEqual(list(expected[i].values), list(actual[i].values))
+
+    def test_offset_2parts_3(self):
+        # "batch" with no parts
+        self.assertEqual([], FilterByRepeatIndexer([], {u'batch': True}).run())
+
 
 #--------------------------------------------------------------------------------------------------#
 # Definitions                                                                                      #
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               test_result_store.py
+# Purpose:                Tests for models/result_store.py.
+#
+# Copyright (C) 2014 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+Tests for :py:class:`~vis.models.result_store.ResultStore`.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase, TestLoader
+from mock import patch
+import numpy
+import pandas
+from vis.models import result_store
+from vis.models.indexed_piece import IndexedPiece
+from vis.workflow import WorkflowManager
+
+
+# pylint: disable=R0904
+# pylint: disable=C0111
+# pylint: disable=W0212
+class TestResultStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, u'source.txt')
+        with open(self.source, 'w') as the_file:
+            the_file.write('one')
+        self.store = result_store.ResultStore(os.path.join(self.directory, u'store'))
+        self.piece = IndexedPiece(self.source)
+        self.piece._noterest_results = [pandas.Series([u'C4', u'Rest'],
+                                                      index=numpy.array([0.0, 1.5], dtype=object))]
+        self.piece._imported = True
+        self.piece.metadata(u'title', u'Source')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSeriesEqual(self, expected, actual):  # pylint: disable=C0103
+        self.assertSequenceEqual(list(expected.index), list(actual.index))
+        self.assertEqual(expected.index.dtype, actual.index.dtype)
+        self.assertEqual(expected.dtype, actual.dtype)
+        self.assertEqual(expected.name, actual.name)
+        for exp, act in zip(expected.values, actual.values):
+            if isinstance(exp, float) and numpy.isnan(exp):
+                self.assertTrue(isinstance(act, float) and numpy.isnan(act))
+            else:
+                self.assertEqual(exp, act)
+
+    def test_piece_1(self):
+        # a stored piece is restored without importing it
+        self.store.put_piece(self.piece)
+        actual = IndexedPiece(self.source)
+        self.assertIs(actual, self.store.get_piece(actual))
+        self.assertTrue(actual._imported)
+        self.assertEqual(u'Source', actual.metadata(u'title'))
+        self.assertSeriesEqual(self.piece._noterest_results[0], actual._noterest_results[0])
+        self.assertEqual([(self.source, None)], self.store.pieces())
+
+    def test_piece_2(self):
+        # a piece that isn't stored, or whose file changed, isn't restored
+        self.assertIsNone(self.store.get_piece(IndexedPiece(self.source)))
+        self.store.put_piece(self.piece)
+        self.store.put(self.piece, u'thing', None, [pandas.Series([1, 2])])
+        os.utime(self.source, (1, 1))
+        self.assertIsNone(self.store.get_piece(IndexedPiece(self.source)))
+        self.assertFalse(self.store.has(self.piece, u'thing'))
+        self.assertEqual([], self.store.pieces())
+
+    def test_piece_3(self):
+        # an Opus is restored as new IndexedPiece objects
+        scores = [IndexedPiece(self.source, i) for i in xrange(2)]
+        for i, each in enumerate(scores):
+            each._noterest_results = [pandas.Series([unicode(i)])]
+        self.store.put_piece(IndexedPiece(self.source), scores)
+        actual = self.store.get_piece(IndexedPiece(self.source))
+        self.assertEqual(2, len(actual))
+        self.assertEqual([0, 1], [each._opus_id for each in actual])
+        self.assertEqual([u'1'], list(actual[1]._noterest_results[0]))
+        self.assertEqual([(self.source, 0), (self.source, 1)], self.store.pieces())
+
+    def test_put_get_1(self):
+        # a list of Series round-trips, including object indices, NaN, and numbers
+        self.store.put_piece(self.piece)
+        data = [pandas.Series([u'a', float('nan'), u'b', u'a'], index=[0.0, 0.5, 1.0, 2.0],
+                              name=u'one'),
+                pandas.Series([3, 1, 4], index=pandas.Index([0, 1, 2], name=u'offset')),
+                pandas.Series([0.5, 1.5], index=numpy.array([0.0, 1.0], dtype=object)),
+                pandas.Series([], dtype=object)]
+        settings = {u'n': 2, u'continuer': u'_'}
+        self.assertFalse(self.store.has(self.piece, u'thing', settings))
+        self.assertIsNone(self.store.get(self.piece, u'thing', settings))
+        self.store.put(self.piece, u'thing', settings, data)
+        self.assertTrue(self.store.has(self.piece, u'thing', settings))
+        self.assertFalse(self.store.has(self.piece, u'thing', {u'n': 3, u'continuer': u'_'}))
+        actual = self.store.get(self.piece, u'thing', settings)
+        self.assertEqual(len(data), len(actual))
+        for exp, act in zip(data, actual):
+            self.assertSeriesEqual(exp, act)
+
+    def test_put_get_2(self):
+        # a dict round-trips; only the requested columns are read; numbers are memory-mapped
+        self.store.put_piece(self.piece)
+        data = {u'0,1': pandas.Series([u'P5', u'M3']), u'1,2': pandas.Series([1.5, 2.5])}
+        self.store.put(self.piece, u'thing', None, data)
+        actual = self.store.get(self.piece, u'thing', columns=[u'1,2'])
+        self.assertEqual([u'1,2'], actual.keys())
+        self.assertSeriesEqual(data[u'1,2'], actual[u'1,2'])
+        self.assertIsInstance(actual[u'1,2'].values, numpy.memmap)
+        actual = self.store.get(self.piece, u'thing', mmap=False)
+        self.assertEqual(sorted(data.keys()), sorted(actual.keys()))
+        self.assertNotIsInstance(actual[u'1,2'].values, numpy.memmap)
+        actual = self.store.get(self.piece, u'thing', columns=[u'0,1'])
+        self.assertSeriesEqual(data[u'0,1'], actual[u'0,1'])
+
+    def test_put_get_3(self):
+        # results of pieces not stored are ignored; only Series can be stored
+        self.store.put(self.piece, u'thing', None, [pandas.Series([1])])
+        self.assertFalse(self.store.has(self.piece, u'thing'))
+        self.store.put_piece(self.piece)
+        self.assertRaises(TypeError, self.store.put, self.piece, u'thing', None, [[1, 2]])
+        self.assertRaises(TypeError, self.store.put, self.piece, u'thing', None, pandas.DataFrame())
+
+
+class TestWorkflowStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, u'bwv77.mxl')
+        shutil.copy(u'vis/tests/corpus/bwv77.mxl', self.source)
+        self.store_dir = os.path.join(self.directory, u'store')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_1(self):
+        # loading again, or from the store alone, doesn't import the file
+        first = WorkflowManager([self.source])
+        first.load(u'store', self.store_dir)
+        first.settings(None, u'count frequency', False)
+        expected = first.run(u'intervals')
+        with patch(u'music21.converter.parse') as mock_parse:
+            for pathnames in ([self.source], []):
+                test_wm = WorkflowManager(pathnames)
+                test_wm.load(u'store', self.store_dir)
+                self.assertEqual(1, len(test_wm))
+                self.assertEqual(u'bwv77', test_wm.metadata(0, u'title'))
+                test_wm.settings(None, u'count frequency', False)
+                actual = test_wm.run(u'intervals')
+                self.assertEqual(len(expected[0]), len(actual[0]))
+                for exp, act in zip(expected[0], actual[0]):
+                    self.assertSequenceEqual(list(exp.index), list(act.index))
+                    self.assertSequenceEqual(list(exp.values), list(act.values))
+            self.assertEqual(0, mock_parse.call_count)
+
+    def test_load_2(self):
+        # a stored result is used with the same settings; others are analyzed and stored
+        test_wm = WorkflowManager([self.source])
+        test_wm.load(u'store', self.store_dir)
+        expected = test_wm.run(u'intervals')
+        with patch.object(WorkflowManager, u'_intervs_piece') as mock_piece:
+            mock_piece.return_value = [pandas.Series([u'P5'])]
+            second = WorkflowManager([self.source])
+            second.load(u'store', self.store_dir)
+            self.assertSequenceEqual(list(expected), list(second.run(u'intervals')))
+            self.assertEqual(0, mock_piece.call_count)
+            second.settings(None, u'simple intervals', True)
+            self.assertSequenceEqual([1.0], list(second.run(u'intervals')))
+            self.assertEqual(1, mock_piece.call_count)
+            self.assertSequenceEqual([1.0], list(second.run(u'intervals')))
+            self.assertEqual(1, mock_piece.call_count)
+        # "processes," "count frequency," "profile," and "sort results" don't change the results
+        # of a piece
+        self.assertNotEqual(test_wm._store_settings(0), second._store_settings(0))
+        second.settings(None, u'simple intervals', False)
+        second.settings(None, u'processes', 2)
+        second.settings(None, u'count frequency', False)
+        second.settings(None, u'profile', True)
+        second.settings(None, u'sort results', False)
+        self.assertEqual(test_wm._store_settings(0), second._store_settings(0))
+
+    def test_load_3(self):
+        # the "store" instruction needs a pathname
+        self.assertRaises(RuntimeError, WorkflowManager([self.source]).load, u'store')
+
+
+#-------------------------------------------------------------------------------------------------#
+# Definitions                                                                                     #
+#-------------------------------------------------------------------------------------------------#
+RESULT_STORE_SUITE = TestLoader().loadTestsFromTestCase(TestResultStore)
+WORKFLOW_STORE_SUITE = TestLoader().loadTestsFromTestCase(TestWorkflowStore)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               test_score_cache.py
+# Purpose:                Tests for models/score_cache.py.
+#
+# Copyright (C) 2014 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+Tests for :py:class:`~vis.models.score_cache.ScoreCache`.
+"""
+
+import os
+import shutil
+import tempfile
+import warnings
+from unittest import TestCase, TestLoader
+from mock import patch
+import music21
+from vis.analyzers.indexers import noterest
+from vis.models import score_cache
+from vis.models.indexed_piece import IndexedPiece
+
+
+# pylint: disable=R0904
+# pylint: disable=C0111
+class TestScoreCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, u'source.txt')
+        with open(self.source, 'w') as the_file:
+            the_file.write('one')
+
+    def tearDown(self):
+        score_cache.set_cache(None)
+        shutil.rmtree(self.directory)
+
+    def test_init_1(self):
+        # max_size must be positive
+        self.assertRaises(RuntimeError, score_cache.ScoreCache, self.directory, 0)
+
+    def test_key_1(self):
+        # the key changes with the file's contents, the kind, and the opus_id
+        first = score_cache.ScoreCache.key(self.source, u'score')
+        self.assertEqual(first, score_cache.ScoreCache.key(self.source, u'score'))
+        self.assertNotEqual(first, score_cache.ScoreCache.key(self.source, u'noterest'))
+        self.assertNotEqual(first, score_cache.ScoreCache.key(self.source, u'score', 0))
+        with open(self.source, 'w') as the_file:
+            the_file.write('two')
+        self.assertNotEqual(first, score_cache.ScoreCache.key(self.source, u'score'))
+
+    def test_key_2(self):
+        # a missing file has no key
+        self.assertIsNone(score_cache.ScoreCache.key(u'/this/does/not/exist', u'score'))
+
+    def test_put_get_1(self):
+        # ordinary objects round-trip
+        cache = score_cache.ScoreCache(os.path.join(self.directory, u'cache'))
+        key = cache.key(self.source, u'noterest')
+        self.assertIsNone(cache.get(key))
+        cache.put(key, {u'a': [1, 2, 3]})
+        self.assertEqual({u'a': [1, 2, 3]}, cache.get(key))
+        self.assertTrue(cache.size() > 0)
+        cache.clear()
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(0, cache.size())
+
+    def test_put_get_2(self):
+        # Streams are frozen and thawed
+        cache = score_cache.ScoreCache(os.path.join(self.directory, u'cache'))
+        key = cache.key(self.source, u'score')
+        the_stream = music21.stream.Stream([music21.note.Note(u'C4'), music21.note.Rest()])
+        cache.put(key, the_stream)
+        actual = cache.get(key)
+        self.assertIsInstance(actual, music21.stream.Stream)
+        self.assertEqual([u'Note', u'Rest'], [x.__class__.__name__ for x in actual.notesAndRests])
+
+    def test_put_get_3(self):
+        # a None key is never stored
+        cache = score_cache.ScoreCache(os.path.join(self.directory, u'cache'))
+        cache.put(None, u'whatever')
+        self.assertIsNone(cache.get(None))
+        self.assertEqual(0, cache.size())
+
+    def test_evict_1(self):
+        # the least-recently used entry is removed first
+        cache = score_cache.ScoreCache(os.path.join(self.directory, u'cache'))
+        cache.put(u'a', u'x' * 1000)
+        cache.put(u'b', u'x' * 1000)
+        one_entry = cache.size() // 2
+        os.utime(cache._path(u'a'), (1, 1))  # pylint: disable=W0212
+        os.utime(cache._path(u'b'), (2, 2))  # pylint: disable=W0212
+        cache.get(u'a')  # now "b" is the oldest
+        cache._max_size = one_entry * 2  # pylint: disable=W0212
+        cache.put(u'c', u'x' * 1000)
+        self.assertIsNone(cache.get(u'b'))
+        self.assertIsNotNone(cache.get(u'a'))
+        self.assertIsNotNone(cache.get(u'c'))
+        self.assertTrue(cache.size() <= one_entry * 2)
+
+    def test_default_cache_1(self):
+        # valid environment variables are used
+        cache_dir = os.path.join(self.directory, u'cache')
+        actual = score_cache._default_cache({'VIS_CACHE_DIR': cache_dir,
+                                             'VIS_CACHE_SIZE': u'100'})
+        self.assertEqual(cache_dir, actual._directory)  # pylint: disable=W0212
+        self.assertEqual(100, actual._max_size)  # pylint: disable=W0212
+        self.assertIsNone(score_cache._default_cache({}))
+
+    def test_default_cache_2(self):
+        # invalid environment variables give a warning and no cache
+        not_a_dir = os.path.join(self.directory, u'file')
+        open(not_a_dir, 'w').close()
+        cache_dir = os.path.join(self.directory, u'cache')
+        for environ in [{'VIS_CACHE_DIR': cache_dir, 'VIS_CACHE_SIZE': u'lots'},
+                        {'VIS_CACHE_DIR': cache_dir, 'VIS_CACHE_SIZE': u'0'},
+                        {'VIS_CACHE_DIR': os.path.join(not_a_dir, u'cache')}]:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter(u'always')
+                actual = score_cache._default_cache(environ)
+            self.assertIsNone(actual)
+            self.assertEqual(1, len(caught))
+
+    def test_set_cache_1(self):
+        self.assertIsNone(score_cache.get_cache())
+        cache = score_cache.set_cache(self.directory)
+        self.assertIs(cache, score_cache.get_cache())
+        self.assertIsNone(score_cache.set_cache(None))
+        self.assertIsNone(score_cache.get_cache())
+
+
+class TestIndexedPieceCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        score_cache.set_cache(self.directory)
+
+    def tearDown(self):
+        score_cache.set_cache(None)
+        shutil.rmtree(self.directory)
+
+    def test_noterest_1(self):
+        # a second piece with the same file gets the same results without importing the file
+        path = u'vis/tests/corpus/bwv77.mxl'
+        expected = IndexedPiece(path).get_data([noterest.NoteRestIndexer])
+        with patch(u'music21.converter.parse') as mock_parse:
+            second = IndexedPiece(path)
+            actual = second.get_data([noterest.NoteRestIndexer])
+            self.assertEqual(0, mock_parse.call_count)
+        self.assertEqual(len(expected), len(actual))
+        for exp, act in zip(expected, actual):
+            self.assertSequenceEqual(list(exp.index), list(act.index))
+            self.assertSequenceEqual(list(exp.values), list(act.values))
+        self.assertEqual(u'bwv77', second.metadata(u'title'))
+        self.assertEqual(4, len(second.metadata(u'parts')))
+
+    def test_noterest_2(self):
+        # identical files at different pathnames share the entry, but keep their own pathname
+        first_path = os.path.join(self.directory, u'a.mxl')
+        second_path = os.path.join(self.directory, u'b.mxl')
+        shutil.copy(u'vis/tests/corpus/bwv77.mxl', first_path)
+        shutil.copy(u'vis/tests/corpus/bwv77.mxl', second_path)
+        first = IndexedPiece(first_path)
+        first.get_data([noterest.NoteRestIndexer])
+        with patch(u'music21.converter.parse') as mock_parse:
+            second = IndexedPiece(second_path)
+            second.get_data([noterest.NoteRestIndexer])
+            self.assertEqual(0, mock_parse.call_count)
+        self.assertEqual(first_path, first.metadata(u'pathname'))
+        self.assertEqual(u'a', first.metadata(u'title'))
+        self.assertEqual(second_path, second.metadata(u'pathname'))
+        self.assertEqual(u'b', second.metadata(u'title'))
+
+    def test_score_2(self):
+        # the title of a Score from the cache of an identical file comes from this file's name
+        first_path = os.path.join(self.directory, u'a.mxl')
+        second_path = os.path.join(self.directory, u'b.mxl')
+        shutil.copy(u'vis/tests/corpus/bwv77.mxl', first_path)
+        shutil.copy(u'vis/tests/corpus/bwv77.mxl', second_path)
+        IndexedPiece(first_path)._import_score()  # pylint: disable=W0212
+        with patch(u'music21.converter.parse') as mock_parse:
+            second = IndexedPiece(second_path)
+            second._import_score()  # pylint: disable=W0212
+            self.assertEqual(0, mock_parse.call_count)
+        self.assertEqual(second_path, second.metadata(u'pathname'))
+        self.assertEqual(u'b', second.metadata(u'title'))
+
+    def test_score_1(self):
+        # a second piece with the same file gets a Score without importing the file
+        path = u'vis/tests/corpus/bwv77.mxl'
+        expected = IndexedPiece(path)._import_score()  # pylint: disable=W0212
+        with patch(u'music21.converter.parse') as mock_parse:
+            second = IndexedPiece(path)
+            actual = second._import_score()  # pylint: disable=W0212
+            self.assertEqual(0, mock_parse.call_count)
+        self.assertEqual(len(expected.parts), len(actual.parts))
+        self.assertEqual(len(expected.flat.notes), len(actual.flat.notes))
+        self.assertSequenceEqual(second.metadata(u'parts'), [u'Soprano', u'Alto', u'Tenor', u'Bass'])
+
+
+#-------------------------------------------------------------------------------------------------#
+# Definitions                                                                                     #
+#-------------------------------------------------------------------------------------------------#
+SCORE_CACHE_SUITE = TestLoader().loadTestsFromTestCase(TestScoreCache)
+INDEXED_PIECE_CACHE_SUITE = TestLoader().loadTestsFromTestCase(TestIndexedPieceCache)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           vis
+# Program Description:    Helps analyze music with computers.
+#
+# Filename:               analyzers_tests/test_sketch_experimenter.py
+# Purpose:                Tests for the approximate frequency experimenters.
+#
+# Copyright (C) 2013 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+
+# allow "no docstring" for everything
+# pylint: disable=C0111
+# allow "too many public methods" for TestCase
+# pylint: disable=R0904
+# allow "access to protected member" for testing
+# pylint: disable=W0212
+
+
+import pickle
+import unittest
+from pandas import Series
+from vis.analyzers.experimenters.sketch import FrequencySketch, FrequencySketchExperimenter, \
+    merge_sketches
+
+
+class TestFrequencySketch(unittest.TestCase):
+    def test_sketch_1(self):
+        # with room for everything, the counts are exact
+        sketch = FrequencySketch(width=1024, depth=4, capacity=10)
+        sketch.update(Series([u'a', u'b', u'a', u'c', u'a', u'b']))
+        actual = sketch.top()
+        self.assertSequenceEqual([u'a', u'b', u'c'], list(actual.index))
+        self.assertSequenceEqual([3, 2, 1], list(actual[u'lower']))
+        self.assertSequenceEqual([3, 2, 1], list(actual[u'upper']))
+        self.assertEqual(6, sketch.total)
+        self.assertEqual(0, sketch.missed_bound)
+
+    def test_sketch_2(self):
+        # NaN is ignored, as by FrequencyExperimenter
+        sketch = FrequencySketch(width=64, capacity=5)
+        sketch.update(Series([1, float('nan'), 1, 2]))
+        self.assertEqual(3, sketch.total)
+        self.assertSequenceEqual([2, 1], list(sketch.estimate([1, 2])))
+
+    def test_sketch_3(self):
+        # a small sketch never underestimates, and the bounds hold for every object it keeps
+        in_val = Series([unicode(i % 37) for i in xrange(2000)] + [u'x'] * 300)
+        exact = in_val.value_counts()
+        sketch = FrequencySketch(width=16, depth=3, capacity=8).update(in_val)
+        estimates = sketch.estimate(exact.index)
+        self.assertTrue((estimates.values >= exact.values).all())
+        actual = sketch.top()
+        self.assertTrue(len(actual) <= 8)
+        self.assertEqual(u'x', actual.index[0])
+        for obj in actual.index:
+            self.assertTrue(actual[u'lower'][obj] <= exact[obj] <= actual[u'upper'][obj])
+        self.assertTrue(sketch.missed_bound <= sketch.total / 9.0)
+        # anything more common than missed_bound is kept
+        for obj in exact.index:
+            if exact[obj] > sketch.missed_bound:
+                self.assertTrue(obj in actual.index)
+
+    def test_sketch_4(self):
+        # top_x and threshold work like WorkflowManager.export(), threshold first
+        sketch = FrequencySketch(width=1024, capacity=10)
+        sketch.add_counts(Series({u'a': 5, u'b': 4, u'c': 3, u'd': 1}))
+        self.assertSequenceEqual([u'a', u'b'], list(sketch.top(top_x=2).index))
+        self.assertSequenceEqual([u'a', u'b', u'c'], list(sketch.top(threshold=2).index))
+        self.assertSequenceEqual([u'a'], list(sketch.top(top_x=1, threshold=2).index))
+        self.assertEqual(0, len(sketch.top(threshold=5)))
+
+    def test_sketch_5(self):
+        # error bounds follow from the settings
+        sketch = FrequencySketch(width=100, depth=2, capacity=3)
+        sketch.add_counts(Series({u'a': 50, u'b': 50}))
+        self.assertAlmostEqual(2.718281828 / 100 * 100, sketch.error_bound, places=6)
+        self.assertAlmostEqual(1.0 - 0.135335283, sketch.confidence, places=6)
+
+    def test_sketch_6(self):
+        # invalid settings
+        self.assertRaises(ValueError, FrequencySketch, 0)
+        self.assertRaises(ValueError, FrequencySketch, 16, 0)
+        self.assertRaises(ValueError, FrequencySketch, 16, 4, 0)
+
+    def test_sketch_7(self):
+        # a sketch survives pickling, so it can come back from a worker process
+        sketch = FrequencySketch(width=64, capacity=4).update(Series([u'a', u'b', u'a']))
+        actual = pickle.loads(pickle.dumps(sketch))
+        self.assertSequenceEqual(list(sketch.top()[u'upper']), list(actual.top()[u'upper']))
+        self.assertSequenceEqual(list(sketch.estimate([u'a', u'z'])),
+                                 list(actual.estimate([u'a', u'z'])))
+
+
+class TestMergeSketches(unittest.TestCase):
+    def test_merge_1(self):
+        # merging is the same as counting everything in one sketch
+        parts = [Series([u'a', u'b', u'a']), Series([u'b', u'c']), Series([u'a', u'd', u'd'])]
+        one = FrequencySketch(width=32, depth=3, capacity=2)
+        for part in parts:
+            one.update(part)
+        many = [FrequencySketch(width=32, depth=3, capacity=2).update(part) for part in parts]
+        actual = merge_sketches(many)
+        self.assertEqual(one.total, actual.total)
+        self.assertSequenceEqual(one._table.tolist(), actual._table.tolist())
+        for obj, count in ((u'a', 3), (u'b', 2), (u'c', 1), (u'd', 2)):
+            self.assertTrue(actual.estimate([obj])[obj] >= count)
+        for obj in actual.top().index:
+            lower, upper = actual.top()[u'lower'][obj], actual.top()[u'upper'][obj]
+            self.assertTrue(lower <= {u'a': 3, u'b': 2, u'c': 1, u'd': 2}[obj] <= upper)
+        # the inputs are unchanged
+        self.assertEqual(3, many[0].total)
+
+    def test_merge_2(self):
+        # nothing to merge
+        self.assertEqual(None, merge_sketches([]))
+
+    def test_merge_3(self):
+        # sketches with different settings can't be merged
+        first = FrequencySketch(width=32)
+        self.assertRaises(ValueError, first.merge, FrequencySketch(width=64))
+        self.assertRaises(ValueError, first.merge, FrequencySketch(width=32, seed=1))
+
+
+class TestFrequencySketchExperimenter(unittest.TestCase):
+    def test_run_1(self):
+        # list of parts, default settings
+        in_val = [Series([u'a', u'b', u'a']), Series([u'b', u'a'])]
+        actual = FrequencySketchExperimenter(in_val).run()
+        self.assertEqual(262144, actual.width)
+        self.assertSequenceEqual([u'a', u'b'], list(actual.top().index))
+        self.assertSequenceEqual([3, 2], list(actual.top()[u'upper']))
+
+    def test_run_2(self):
+        # dict of parts, with settings (and an extra one to ignore)
+        in_val = {u'0,1': Series([u'a', u'b', u'a']), u'1,2': Series([u'c'])}
+        setts = {u'width': 128, u'depth': 2, u'capacity': 5, u'seed': 4, u'n': 2}
+        actual = FrequencySketchExperimenter(in_val, setts).run()
+        self.assertEqual((128, 2, 5, 4), (actual.width, actual.depth, actual.capacity, actual.seed))
+        self.assertEqual(4, actual.total)
+        self.assertSequenceEqual([u'a', u'b', u'c'], list(actual.top().index))
+
+
+#--------------------------------------------------------------------------------------------------#
+# Definitions                                                                                      #
+#--------------------------------------------------------------------------------------------------#
+SKETCH_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestFrequencySketch)
+SKETCH_MERGE_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestMergeSketches)
+SKETCH_RUN_SUITE = unittest.TestLoader().loadTestsFromTestCase(TestFrequencySketchExperimenter)
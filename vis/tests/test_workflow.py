@@ -26,17 +26,34 @@
 Tests for the WorkflowManager
 """
 
+import os
+import shutil
 from subprocess import CalledProcessError
+import tempfile
 from unittest import TestCase, TestLoader
 import mock
 from mock import MagicMock
+import numpy
 import pandas
 from music21.humdrum.spineParser import GlobalReference
+from vis import workflow
 from vis.workflow import WorkflowManager
 from vis.models.indexed_piece import IndexedPiece
 from vis.analyzers.indexers import noterest, lilypond
 
 
+def _fail_opus_score(args):
+    """
+    Load a piece like :func:`vis.workflow._load_piece`, but fail to load the second Score of an
+    Opus. This is a module-level function so it can be pickled.
+    """
+    if args[0]._opus_id == 1:  # pylint: disable=W0212
+        return None, RuntimeError(u'the second Score failed'), []
+    return _LOAD_PIECE(args)
+
+_LOAD_PIECE = workflow._load_piece  # pylint: disable=W0212
+
+
 # pylint: disable=R0904
 # pylint: disable=C0111
 class WorkflowTests(TestCase):
@@ -61,7 +78,8 @@ class WorkflowTests(TestCase):
                     self.assertEqual(False, piece_sett[sett])
             exp_sh_setts = {u'n': 2, u'continuer': u'_', u'mark singles': False,
                             u'interval quality': False, u'simple intervals': False,
-                            u'include rests': False, u'count frequency': True}
+                            u'include rests': False, u'count frequency': True,
+                            u'processes': 1, u'profile': False, u'sort results': True}
             self.assertEqual(exp_sh_setts, test_wc._shared_settings)
 
     def test_init_2(self):
@@ -80,7 +98,8 @@ class WorkflowTests(TestCase):
                 self.assertEqual(False, piece_sett[sett])
         exp_sh_setts = {u'n': 2, u'continuer': u'_', u'mark singles': False,
                         u'interval quality': False, u'simple intervals': False,
-                        u'include rests': False, u'count frequency': True}
+                        u'include rests': False, u'count frequency': True,
+                        u'processes': 1, u'profile': False, u'sort results': True}
         self.assertEqual(exp_sh_setts, test_wc._shared_settings)
 
     def test_init_3(self):
@@ -99,7 +118,8 @@ class WorkflowTests(TestCase):
                 self.assertEqual(False, piece_sett[sett])
         exp_sh_setts = {u'n': 2, u'continuer': u'_', u'mark singles': False,
                         u'interval quality': False, u'simple intervals': False,
-                        u'include rests': False, u'count frequency': True}
+                        u'include rests': False, u'count frequency': True,
+                        u'processes': 1, u'profile': False, u'sort results': True}
         self.assertEqual(exp_sh_setts, test_wc._shared_settings)
 
     def test_init_4(self):
@@ -117,7 +137,8 @@ class WorkflowTests(TestCase):
                 self.assertEqual(False, piece_sett[sett])
         exp_sh_setts = {u'n': 2, u'continuer': u'_', u'mark singles': False,
                         u'interval quality': False, u'simple intervals': False,
-                        u'include rests': False, u'count frequency': True}
+                        u'include rests': False, u'count frequency': True,
+                        u'processes': 1, u'profile': False, u'sort results': True}
         self.assertEqual(exp_sh_setts, test_wc._shared_settings)
 
     def test_load_1(self):
@@ -163,6 +184,52 @@ class WorkflowTests(TestCase):
         self.assertRaises(RuntimeError, test_wc.load, u'all the data')
         self.assertRaises(RuntimeError, test_wc.load, u'not sure why I wanted three of these')
 
+    def test_load_5(self):
+        # that load() with many processes gives the same pieces, in the same order, as serial
+        # mode, including Opus expansion
+        # NB: this is more of an integration test
+        pathnames = [u'vis/tests/corpus/try_opus.krn', u'vis/tests/corpus/bwv77.mxl']
+        serial_wm = WorkflowManager(pathnames)
+        serial_wm.load(u'pieces')
+        test_wm = WorkflowManager(pathnames)
+        original_piece = test_wm[1]
+        test_wm.settings(None, u'processes', 2)
+        test_wm.load(u'pieces')
+        self.assertTrue(test_wm._loaded)
+        self.assertEqual(len(serial_wm), len(test_wm))
+        # the IndexedPiece objects we already held are updated, not replaced
+        self.assertIs(original_piece, test_wm[0])
+        for i in xrange(len(serial_wm)):
+            self.assertEqual(serial_wm[i]._opus_id, test_wm[i]._opus_id)
+            self.assertIsNotNone(test_wm[i]._noterest_results)
+        self.assertEqual(serial_wm.metadata(0, u'title'), test_wm.metadata(0, u'title'))
+        for exp_part, act_part in zip(serial_wm[0]._noterest_results,
+                                      test_wm[0]._noterest_results):
+            self.assertSequenceEqual(list(exp_part.index), list(act_part.index))
+            self.assertSequenceEqual(list(exp_part.values), list(act_part.values))
+
+    def test_load_6(self):
+        # that load() with many processes raises the same exception as serial mode
+        pathnames = [u'vis/tests/corpus/bwv77.mxl', u'vis/tests/corpus/does_not_exist.xml']
+        serial_wm = WorkflowManager(pathnames)
+        test_wm = WorkflowManager(pathnames)
+        test_wm.settings(None, u'processes', 2)
+        try:
+            serial_wm.load(u'pieces')
+        except Exception as exc:  # pylint: disable=W0703
+            expected = type(exc)
+        self.assertRaises(expected, test_wm.load, u'pieces')
+        self.assertFalse(test_wm._loaded)
+
+    def test_load_7(self):
+        # that load() with many processes raises an exception from a Score in an Opus, rather than
+        # keeping the exception as a piece
+        test_wm = WorkflowManager([u'vis/tests/corpus/try_opus.krn'])
+        test_wm.settings(None, u'processes', 2)
+        with mock.patch(u'vis.workflow._load_piece', new=_fail_opus_score):
+            self.assertRaises(RuntimeError, test_wm.load, u'pieces')
+        self.assertFalse(test_wm._loaded)
+
     def test_run_1(self):
         # properly deals with "intervals" experiment
         mock_path = u'vis.workflow.WorkflowManager._intervs'
@@ -650,12 +717,14 @@ class Export(TestCase):
         # --> test_export_3() with a Series that requires calling _get_dataframe()
         test_wm = WorkflowManager([])
         test_wm._result = mock.MagicMock(spec=pandas.Series)
-        # CSV
+        # CSV is written straight from the results, without a DataFrame
         mock_gdf.return_value = MagicMock(spec=pandas.DataFrame)
-        test_wm.export(u'CSV', u'test_path')
-        mock_gdf.assert_called_once_with(u'data', None, None)
-        mock_gdf.return_value.to_csv.assert_called_once_with(u'test_path.csv')
-        mock_gdf.reset_mock()
+        with mock.patch(u'vis.workflow.WorkflowManager._get_series') as mock_gs:
+            with mock.patch(u'vis.workflow.WorkflowManager._write_csv') as mock_csv:
+                test_wm.export(u'CSV', u'test_path')
+        mock_gs.assert_called_once_with(None, None)
+        mock_csv.assert_called_once_with(mock_gs.return_value, u'data', u'test_path.csv')
+        self.assertEqual(0, mock_gdf.call_count)
         # Excel
         test_wm.export(u'Excel', u'test_path', 5)
         mock_gdf.assert_called_once_with(u'data', 5, None)
@@ -671,6 +740,30 @@ class Export(TestCase):
         mock_gdf.assert_called_once_with(u'data', None, 10)
         mock_gdf.return_value.to_html.assert_called_once_with(u'test_path.html')
 
+    def test_export_8(self):
+        # --> with a DataFrame, the top results and threshold are applied to each column
+        test_wm = WorkflowManager([])
+        test_wm._result = mock.MagicMock(spec=pandas.DataFrame)
+        with mock.patch(u'vis.workflow.WorkflowManager._get_frame') as mock_gf:
+            test_wm.export(u'CSV', u'test_path', 5, 10)
+        mock_gf.assert_called_once_with(5, 10)
+        mock_gf.return_value.to_csv.assert_called_once_with(u'test_path.csv')
+
+    def test_export_7(self):
+        # --> a CSV file of a Series is the same as pandas would write for a DataFrame
+        test_wm = WorkflowManager([])
+        test_wm._result = pandas.Series([4.0, 2.5, 1.0], index=[u'a b', u'c,d', u'\xe9'])
+        directory = tempfile.mkdtemp()
+        try:
+            actual = test_wm.export(u'CSV', os.path.join(directory, u'test_path'), top_x=2)
+            self.assertEqual(os.path.join(directory, u'test_path.csv'), actual)
+            pathname = os.path.join(directory, u'expected.csv')
+            pandas.DataFrame({u'data': test_wm._result[:2]}).to_csv(pathname)
+            with open(actual, 'rb') as actual_file, open(pathname, 'rb') as expected_file:
+                self.assertEqual(expected_file.read(), actual_file.read())
+        finally:
+            shutil.rmtree(directory)
+
     def test_export_6(self):
         # --> the method always outputs a DataFrame, even if self._result isn't a DF yet
         # TODO: I don't know how to test this. I want to mock DataFrame, but it also needs to pass
@@ -726,6 +819,45 @@ class GetDataFrame(TestCase):
             self.assertSequenceEqual(list(expected.loc[:,i].values), list(actual.loc[:,i].values))
 
 
+    def test_get_dataframe_5(self):
+        # unsorted results give the same top results, and equal counts are in index order
+        test_wc = WorkflowManager([])
+        test_wc._result = pandas.Series([3, 9, 1, 7, 3, 3, 9, 5], index=list(u'hbcdefga'))
+        actual = test_wc._get_dataframe(top_x=5, threshold=1)
+        self.assertSequenceEqual([u'b', u'g', u'd', u'a', u'e'], list(actual.index))
+        self.assertSequenceEqual([9, 9, 7, 5, 3], list(actual[u'data']))
+        actual = test_wc._get_dataframe(threshold=4)
+        self.assertSequenceEqual([u'b', u'g', u'd', u'a'], list(actual.index))
+        self.assertEqual(8, len(test_wc._get_dataframe()))
+        self.assertEqual(0, len(test_wc._get_dataframe(top_x=0)))
+
+    def test_get_frame_1(self):
+        # with a column for every "n," the top results and threshold apply to each column
+        test_wc = WorkflowManager([])
+        test_wc._result = pandas.DataFrame({2: [5.0, 1.0, 3.0, None, None, None],
+                                            3: [None, None, None, 2.0, 4.0, 6.0]},
+                                           index=list(u'abcdef'))
+        actual = test_wc._get_frame(top_x=2, threshold=1)
+        self.assertSequenceEqual([2, 3], list(actual.columns))
+        self.assertSequenceEqual([u'a', u'c', u'f', u'e'], list(actual.index))
+        self.assertSequenceEqual([5.0, 3.0], list(actual[2].dropna()))
+        self.assertSequenceEqual([6.0, 4.0], list(actual[3].dropna()))
+        actual = test_wc._get_frame(threshold=2)
+        self.assertSequenceEqual([u'a', u'c', u'f', u'e'], list(actual.index))
+        self.assertIs(test_wc._result, test_wc._get_frame())
+
+    def test_top_counts_1(self):
+        # the same as sorting everything then taking the first X, however many counts are equal
+        counts = pandas.Series([i % 7 for i in xrange(100)],
+                               index=[(i * 37) % 100 for i in xrange(100)])
+        ordered = counts.sort_index()
+        ordered = ordered.iloc[numpy.argsort(-ordered.values, kind='mergesort')]
+        for top_x in (1, 14, 15, 50, 99, 100, 150):
+            actual = WorkflowManager._top_counts(counts, top_x)
+            self.assertSequenceEqual(list(ordered.index[:top_x]), list(actual.index))
+            self.assertSequenceEqual(list(ordered.values[:top_x]), list(actual.values))
+
+
 class AuxiliaryExperimentMethods(TestCase):
     @mock.patch(u'vis.workflow.repeat.FilterByRepeatIndexer')
     @mock.patch(u'vis.workflow.offset.FilterByOffsetIndexer')
@@ -812,6 +944,56 @@ class AuxiliaryExperimentMethods(TestCase):
         self.assertSequenceEqual(in_val, actual)
         self.assertEqual(0, workm._data[1].get_data.call_count)
 
+    def test_run_freq_agg_1(self):
+        # counts from every part of every piece are added up, then sorted by frequency
+        workm = WorkflowManager(['', ''])
+        pieces = [[pandas.Series(['a', 'b', 'a']), pandas.Series(['c'])],
+                  {'0,1': pandas.Series(['b', 'a', 'a', 'b', 'b'])}]
+        expected = pandas.Series({'a': 4.0, 'b': 4.0, 'c': 1.0})
+        actual = workm._run_freq_agg(iter(pieces))
+        self.assertSequenceEqual([4.0, 4.0, 1.0], list(actual.values))
+        self.assertEqual(u'c', actual.index[2])
+        self.assertEqual(expected.sort_index().tolist(), actual.sort_index().tolist())
+        self.assertIs(actual, workm._result)
+
+    def test_run_freq_agg_2(self):
+        # without an argument, the per-piece results in self._result are counted and replaced
+        workm = WorkflowManager(['', ''])
+        workm._result = [[pandas.Series(['x', 'y'])], [pandas.Series(['y'])]]
+        actual = workm._run_freq_agg()
+        self.assertSequenceEqual([u'y', u'x'], list(actual.index))
+        self.assertSequenceEqual([2.0, 1.0], list(actual.values))
+        self.assertIs(actual, workm._result)
+
+    def test_run_freq_agg_3(self):
+        # pieces may come one at a time from a generator
+        workm = WorkflowManager(['', ''])
+        seen = []
+        def pieces():
+            for i in xrange(2):
+                seen.append(i)
+                yield [pandas.Series([i, i])]
+        actual = workm._run_freq_agg(pieces())
+        self.assertSequenceEqual([0, 1], seen)
+        self.assertSequenceEqual([2.0, 2.0], list(actual.values))
+
+    def test_run_freq_agg_4(self):
+        # no pieces at all
+        workm = WorkflowManager([])
+        actual = workm._run_freq_agg(iter([]))
+        self.assertTrue(isinstance(actual, pandas.DataFrame))
+        self.assertEqual(0, len(actual))
+
+    def test_run_freq_agg_5(self):
+        # with "sort results" False, the same counts, in no particular order
+        workm = WorkflowManager(['', ''])
+        workm.settings(None, u'sort results', False)
+        pieces = [[pandas.Series(['a', 'b', 'a']), pandas.Series(['c'])],
+                  {'0,1': pandas.Series(['b', 'a', 'a', 'b', 'b'])}]
+        actual = workm._run_freq_agg(iter(pieces))
+        self.assertEqual({'a': 4.0, 'b': 4.0, 'c': 1.0}, actual.to_dict())
+        self.assertIs(actual, workm._result)
+
 #-------------------------------------------------------------------------------------------------#
 # Definitions                                                                                     #
 #-------------------------------------------------------------------------------------------------#
@@ -60,18 +60,20 @@ class Intervals(TestCase):
         expected = [pandas.Series(['P5', 'm3'], index=[1, 2]) for _ in xrange(len(test_pieces))]
         # 2.) run the test
         test_wc = WorkflowManager(test_pieces)
-        actual = test_wc._intervs()
+        test_wc._intervs()
         # 3.) confirm everything was called in the right order
+        # NB: _run_freq_agg() gets a generator, so no piece is analyzed until it asks
+        self.assertEqual(1, mock_rfa.call_count)
+        self.assertEqual(0, mock_ror.call_count)
+        actual = list(mock_rfa.call_args[0][0])
         for piece in test_pieces:
             self.assertEqual(1, piece.get_data.call_count)
             piece.get_data.assert_called_once_with([mock_nri, mock_int], test_settings)
         self.assertEqual(len(test_pieces), mock_ror.call_count)
-        mock_rfa.assert_called_once_with()
         self.assertEqual(len(test_pieces), len(expected), len(actual))
         for i in xrange(len(actual)):
             # NB: in real use, _run_freq_agg() would aggregate a piece's voice pairs, so we
-            #     wouldn't need to ask for the [0] index here... but also, this experiment shouldn't
-            #     call _run_freq_agg() anyway
+            #     wouldn't need to ask for the [0] index here
             self.assertSequenceEqual(list(expected[i]), list(actual[i][0]))
             self.assertSequenceEqual(list(expected[i].index), list(actual[i][0].index))
 
@@ -142,17 +144,18 @@ class IntervalNGrams(TestCase):
         test_wm.settings(0, u'voice combinations', u'all')
         test_wm.settings(1, u'voice combinations', u'all pairs')
         test_wm.settings(2, u'voice combinations', u'[[0, 1]]')
-        actual = test_wm._interval_ngrams()
+        test_wm._interval_ngrams()
         # 3.) verify the mocks
         # NB: in actual use, _run_freq_agg() would have the final say on the value of
         #     test_wm._result... but it's mocked out, which means we can test whether
-        #     _interval_ngrams() puts the right stuff there
+        #     _interval_ngrams() gives it the right stuff, one piece at a time
+        self.assertEqual(1, mock_rfa.call_count)
+        self.assertEqual(0, mock_all.call_count)
+        actual = list(mock_rfa.call_args[0][0])
         mock_two.assert_called_once_with(1)
         mock_all.assert_called_once_with(0)
         mock_var.assert_called_once_with(2)
-        mock_rfa.assert_called_once_with()
         self.assertSequenceEqual(expected, actual)
-        self.assertSequenceEqual(expected, test_wm._result)
 
     @mock.patch(u'vis.workflow.WorkflowManager._run_freq_agg')
     @mock.patch(u'vis.workflow.WorkflowManager._variable_part_modules')
@@ -215,14 +218,15 @@ class IntervalNGrams(TestCase):
         vert_ret = u"IntervalIndexer's return"
         horiz_ret = u"HorizontalIntervalIndexer's return"
         # set up return values for IndexedPiece.get_data()
-        returns = [vert_ret, horiz_ret, [u'piece2 3rd get_data()'], [u'piece2 4th get_data()']]
+        returns = [vert_ret, horiz_ret, [MagicMock(name=u'piece2 1st combo'),
+                                         MagicMock(name=u'piece2 2nd combo')]]
         def side_effect(*args):
             # NB: we need to accept "args" as a mock framework formality
             # pylint: disable=W0613
             return returns.pop(0)
         for piece in test_pieces:
             piece.get_data.side_effect = side_effect
-        expected = [x[0] for x in returns[2:]]
+        expected = [x.copy.return_value for x in returns[2]]
         # 2.) prepare WorkflowManager and run the test
         test_wc = WorkflowManager(test_pieces)
         test_index = 1
@@ -236,11 +240,12 @@ class IntervalNGrams(TestCase):
         # - that every IP is asked for its vertical and horizontal interval indexes
         #   (that "mark singles" and "continuer" weren't put in the settings)
         expected_interv_setts = {u'quality': True, u'simple or compound': u'simple'}
-        expected_ngram_settings = {u'horizontal': [1], u'vertical': [0], u'n': 2,
+        # both combinations share the lowest voice's horizontal intervals
+        expected_ngram_settings = {u'combinations': [[[0], [1]], [[2], [1]]], u'n': 2,
                                    u'continuer': u'_', u'mark singles': False,
                                    u'terminator': u'Rest'}
-        # 2 combinations for NGramIndexer, plus 2 calls to interval indexers
-        self.assertEqual(4, test_pieces[1].get_data.call_count)
+        # 1 NGramIndexer for both combinations, plus 2 calls to interval indexers
+        self.assertEqual(3, test_pieces[1].get_data.call_count)
         exp_calls = [mock.call([mock_nri, mock_int], expected_interv_setts),
                     mock.call([mock_nri, mock_horiz], expected_interv_setts)]
         for i in xrange(len(exp_calls)):
@@ -249,13 +254,12 @@ class IntervalNGrams(TestCase):
         self.assertEqual(2, mock_ror.call_count)
         mock_ror.assert_any_call(test_index, vert_ret)
         mock_ror.assert_any_call(test_index, horiz_ret)
-        # - that each IndP.get_data() called NGramIndexer with the right settings at some point
-        for combo in selected_part_combos:
-            zombo = str(combo[0]) + u',' + str(combo[1])
-            test_pieces[1].get_data.assert_any_call([mock_ng],
-                                                    expected_ngram_settings,
-                                                    [ror_vert_ret[zombo],
-                                                    ror_horiz_ret[combo[1]]])
+        # - that IndP.get_data() called NGramIndexer with the right settings and every part once
+        test_pieces[1].get_data.assert_called_with([mock_ng],
+                                                   expected_ngram_settings,
+                                                   [ror_vert_ret[u'0,3'],
+                                                    ror_horiz_ret[3],
+                                                    ror_vert_ret[u'2,3']])
         self.assertEqual(expected, actual)
 
     @mock.patch(u'vis.workflow.WorkflowManager._run_off_rep')
@@ -285,14 +289,15 @@ class IntervalNGrams(TestCase):
         vert_ret = u"IntervalIndexer's return"
         horiz_ret = u"HorizontalIntervalIndexer's return"
         # set up return values for IndexedPiece.get_data()
-        returns = [vert_ret, horiz_ret, [u'piece2 3rd get_data()'], [u'piece2 4th get_data()']]
+        returns = [vert_ret, horiz_ret, [MagicMock(name=u'piece2 1st combo'),
+                                         MagicMock(name=u'piece2 2nd combo')]]
         def side_effect(*args):
             # NB: we need to accept "args" as a mock framework formality
             # pylint: disable=W0613
             return returns.pop(0)
         for piece in test_pieces:
             piece.get_data.side_effect = side_effect
-        expected = [x[0] for x in returns[2:]]
+        expected = [x.copy.return_value for x in returns[2]]
         # 2.) prepare WorkflowManager and run the test
         test_wc = WorkflowManager(test_pieces)
         test_index = 1
@@ -307,10 +312,10 @@ class IntervalNGrams(TestCase):
         # - that every IP is asked for its vertical and horizontal interval indexes
         #   (that "mark singles" and "continuer" weren't put in the settings)
         expected_interv_setts = {u'quality': True, u'simple or compound': u'simple'}
-        expected_ngram_settings = {u'horizontal': [2], u'vertical': [0, 1], u'n': 2, \
+        expected_ngram_settings = {u'combinations': [[[0, 1], [2]], [[3, 4], [5]]], u'n': 2,
                                    u'continuer': u'_', u'mark singles': False}
-        # 2 combinations for NGramIndexer, plus 2 calls to interval indexers
-        self.assertEqual(4, test_pieces[1].get_data.call_count)
+        # 1 NGramIndexer for both combinations, plus 2 calls to interval indexers
+        self.assertEqual(3, test_pieces[1].get_data.call_count)
         exp_calls = [mock.call([mock_nri, mock_int], expected_interv_setts),
                     mock.call([mock_nri, mock_horiz], expected_interv_setts)]
         for i in xrange(len(exp_calls)):
@@ -319,16 +324,89 @@ class IntervalNGrams(TestCase):
         self.assertEqual(2, mock_ror.call_count)
         mock_ror.assert_any_call(test_index, vert_ret)
         mock_ror.assert_any_call(test_index, horiz_ret)
-        # - that each IndP.get_data() called NGramIndexer with the right settings at some point
-        selected_part_combos = [[0, 1, 2], [1, 2, 3]]
-        for combo in selected_part_combos:
-            parts = [ror_vert_ret[str(i) + u',' + str(combo[-1])] for i in combo[:-1]]
-            parts.append(ror_horiz_ret[combo[-1]])
-            test_pieces[1].get_data.assert_any_call([mock_ng],
-                                                    expected_ngram_settings,
-                                                    parts)
+        # - that IndP.get_data() called NGramIndexer with the right settings and every part once
+        parts = [ror_vert_ret[u'0,2'], ror_vert_ret[u'1,2'], ror_horiz_ret[2],
+                 ror_vert_ret[u'1,3'], ror_vert_ret[u'2,3'], ror_horiz_ret[3]]
+        test_pieces[1].get_data.assert_called_with([mock_ng], expected_ngram_settings, parts)
         self.assertEqual(expected, actual)
 
+    @mock.patch(u'vis.workflow.ngram.NGramIndexer')
+    def test_ngram_combinations_1(self, mock_ng):
+        # - a combination listed twice is run once, and its result is repeated
+        test_piece = MagicMock(IndexedPiece, name=u'test1')
+        results = [MagicMock(name=u'0,2 result'), MagicMock(name=u'1,2 result')]
+        test_piece.get_data.return_value = list(results)
+        vert_ints = {x: MagicMock(name=u'part ' + x) for x in [u'0,1', u'0,2', u'1,2']}
+        horiz_ints = [MagicMock(name=u'horiz ' + str(x)) for x in xrange(3)]
+        test_wc = WorkflowManager([test_piece])
+        actual = test_wc._ngram_combinations(0, [[0, 2], [1, 2], [0, 2]], vert_ints, horiz_ints)
+        copies = [result.copy.return_value for result in results]
+        self.assertEqual([copies[0], copies[1], copies[0]], actual)
+        # - each result is a copy named for its combination
+        self.assertEqual([u'0,2', u'1,2'], [copy.name for copy in copies])
+        for result in results:
+            result.copy.assert_called_once_with(deep=False)
+        test_piece.get_data.assert_called_once_with([mock_ng],
+                                                    {u'combinations': [[[0], [1]], [[2], [1]]],
+                                                     u'n': 2, u'continuer': u'_',
+                                                     u'mark singles': False,
+                                                     u'terminator': u'Rest'},
+                                                    [vert_ints[u'0,2'], horiz_ints[2],
+                                                     vert_ints[u'1,2']])
+        # - no combinations means no NGramIndexer
+        self.assertEqual([], test_wc._ngram_combinations(0, [], vert_ints, horiz_ints))
+        self.assertEqual(1, test_piece.get_data.call_count)
+
+    @mock.patch(u'vis.workflow.ngram.NGramIndexer')
+    def test_ngram_combinations_2(self, mock_ng):
+        # - with a list of "n" values, each combination has a result for every "n"
+        test_piece = MagicMock(IndexedPiece, name=u'test1')
+        results = [MagicMock(name=u'result %d' % i) for i in xrange(4)]
+        test_piece.get_data.return_value = list(results)
+        vert_ints = {x: MagicMock(name=u'part ' + x) for x in [u'0,2', u'1,2']}
+        horiz_ints = [MagicMock(name=u'horiz ' + str(x)) for x in xrange(3)]
+        test_wc = WorkflowManager([test_piece])
+        test_wc.settings(None, u'n', [2, 3])
+        actual = test_wc._ngram_combinations(0, [[1, 2], [0, 2], [1, 2]], vert_ints, horiz_ints)
+        copies = [result.copy.return_value for result in results]
+        self.assertEqual(copies + copies[:2], actual)
+        self.assertEqual([u'1,2', u'1,2', u'0,2', u'0,2'], [copy.name for copy in copies])
+        self.assertEqual([2, 3], test_piece.get_data.call_args[0][1][u'n'])
+
+    @mock.patch(u'vis.workflow.ngram.NGramIndexer')
+    def test_ngram_combinations_3(self, mock_ng):
+        # - the Series the piece returned, which it may have memoized, keep their names
+        test_piece = MagicMock(IndexedPiece, name=u'test1')
+        results = [pandas.Series([u'a'], name=u'first'), pandas.Series([u'b'], name=u'second')]
+        test_piece.get_data.return_value = list(results)
+        vert_ints = {u'0,2': pandas.Series([1]), u'1,2': pandas.Series([2])}
+        horiz_ints = [None, None, pandas.Series([3])]
+        test_wc = WorkflowManager([test_piece])
+        actual = test_wc._ngram_combinations(0, [[0, 2], [1, 2]], vert_ints, horiz_ints)
+        self.assertEqual([u'0,2', u'1,2'], [result.name for result in actual])
+        self.assertEqual([u'first', u'second'], [result.name for result in results])
+        self.assertSequenceEqual([u'a'], list(actual[0].values))
+
+    def test_count_by_n_1(self):
+        # - counts are kept separate for each "n," and added for the same "n"
+        parts = [pandas.Series([u'a', u'b', u'a']), pandas.Series([u'a b c']),
+                 pandas.Series([u'b']), pandas.Series([u'a b c', u'b c d'])]
+        actual = WorkflowManager._count_by_n(parts, [2, 3])
+        self.assertEqual([2, 3], list(actual.columns))
+        self.assertEqual({u'a': 2, u'b': 2}, dict(actual[2].dropna()))
+        self.assertEqual({u'a b c': 2, u'b c d': 1}, dict(actual[3].dropna()))
+
+    def test_run_freq_agg_1(self):
+        # - with "n" values, pieces are added together in a column each, sorted by "n" then count
+        pieces = [[pandas.Series([u'a', u'b', u'b']), pandas.Series([u'a b c'])],
+                  [pandas.Series([u'a', u'a']), pandas.Series([u'a b c', u'b c d'])]]
+        test_wc = WorkflowManager([MagicMock(IndexedPiece), MagicMock(IndexedPiece)])
+        actual = test_wc._run_freq_agg(iter(pieces), [2, 3])
+        self.assertTrue(actual is test_wc._result)
+        self.assertEqual([u'a', u'b', u'a b c', u'b c d'], list(actual.index))
+        self.assertEqual([3.0, 2.0], list(actual[2].dropna()))
+        self.assertEqual([2.0, 1.0], list(actual[3].dropna()))
+
     @mock.patch(u'vis.workflow.WorkflowManager._run_off_rep')
     @mock.patch(u'vis.workflow.interval.HorizontalIntervalIndexer')
     @mock.patch(u'vis.workflow.ngram.NGramIndexer')
@@ -354,14 +432,14 @@ class IntervalNGrams(TestCase):
         vert_ret = u"IntervalIndexer's return"
         horiz_ret = u"HorizontalIntervalIndexer's return"
         # set up return values for IndexedPiece.get_data()
-        returns = [vert_ret, horiz_ret, [3]]
+        returns = [vert_ret, horiz_ret, [MagicMock(name=u'piece2 n-grams')]]
         def side_effect(*args):
             # NB: we need to accept "args" as a mock framework formality
             # pylint: disable=W0613
             return returns.pop(0)
         for piece in test_pieces:
             piece.get_data.side_effect = side_effect
-        expected = [x[0] for x in returns[2:]]
+        expected = [x[0].copy.return_value for x in returns[2:]]
         # 2.) prepare WorkflowManager and run the test
         test_wc = WorkflowManager(test_pieces)
         test_index = 1
@@ -395,6 +473,7 @@ class IntervalNGrams(TestCase):
         for i in xrange(len(exp_calls)):
             self.assertEqual(test_pieces[test_index].get_data.mock_calls[i], exp_calls[i])
         self.assertEqual(expected, actual)
+        self.assertEqual(u'0,1,2,3', actual[0].name)
 
     @mock.patch(u'vis.workflow.WorkflowManager._run_off_rep')
     @mock.patch(u'vis.workflow.interval.HorizontalIntervalIndexer')
@@ -422,16 +501,14 @@ class IntervalNGrams(TestCase):
         vert_ret = u"IntervalIndexer's return"
         horiz_ret = u"HorizontalIntervalIndexer's return"
         # set up return values for IndexedPiece.get_data()
-        returns = [vert_ret, horiz_ret, [u'piece2 3rd get_data()'], [u'piece2 4th get_data()'],
-                   [u'piece2 5th get_data()'], [u'piece2 6th get_data()'], [u'piece2 7th get_data()'],
-                   [u'piece2 8th get_data()']]
+        returns = [vert_ret, horiz_ret, [MagicMock(name=u'piece2 combo %d' % i) for i in xrange(6)]]
         def side_effect(*args):
             # NB: we need to accept "args" as a mock framework formality
             # pylint: disable=W0613
             return returns.pop(0)
         for piece in test_pieces:
             piece.get_data.side_effect = side_effect
-        expected = [x[0] for x in returns[2:]]
+        expected = [x.copy.return_value for x in returns[2]]
         # 2.) prepare WorkflowManager and run the test
         test_wc = WorkflowManager(test_pieces)
         test_index = 1
@@ -444,11 +521,10 @@ class IntervalNGrams(TestCase):
         # - that every IP is asked for its vertical and horizontal interval indexes
         #   (that "mark singles" and "continuer" weren't put in the settings)
         expected_interv_setts = {u'quality': True, u'simple or compound': u'simple'}
-        expected_ngram_settings = {u'horizontal': [1], u'vertical': [0], u'n': 2,
-                                   u'continuer': u'_', u'mark singles': False,
+        expected_ngram_settings = {u'n': 2, u'continuer': u'_', u'mark singles': False,
                                    u'terminator': u'Rest'}
-        # four-part piece means 6 combinations for NGramIndexer, plus 2 calls to interval indexers
-        self.assertEqual(8, test_pieces[test_index].get_data.call_count)
+        # four-part piece means 6 combinations in 1 NGramIndexer, plus 2 calls to interval indexers
+        self.assertEqual(3, test_pieces[test_index].get_data.call_count)
         exp_calls = [mock.call([mock_nri, mock_int], expected_interv_setts),
                     mock.call([mock_nri, mock_horiz], expected_interv_setts)]
         for i in xrange(len(exp_calls)):
@@ -457,12 +533,18 @@ class IntervalNGrams(TestCase):
         self.assertEqual(2, mock_ror.call_count)
         mock_ror.assert_any_call(test_index, vert_ret)
         mock_ror.assert_any_call(test_index, horiz_ret)
-        # - that each IndP.get_data() called NGramIndexer with the right settings at some point
-        for combo in ror_vert_ret.iterkeys():
-            test_pieces[1].get_data.assert_any_call([mock_ng],
-                                                    expected_ngram_settings,
-                                                    [ror_vert_ret[combo],
-                                                    ror_horiz_ret[interval.key_to_tuple(combo)[1]]])
+        # - that IndP.get_data() called NGramIndexer with the right settings, with every vertical
+        #   part once and the horizontal parts of the three lower voices once each
+        ng_args = test_pieces[1].get_data.call_args[0]
+        self.assertEqual([mock_ng], ng_args[0])
+        combinations = ng_args[1].pop(u'combinations')
+        self.assertEqual(expected_ngram_settings, ng_args[1])
+        self.assertEqual(9, len(ng_args[2]))
+        self.assertEqual(6, len(combinations))
+        for combo, (vert, horiz) in zip(ror_vert_ret.iterkeys(), combinations):
+            self.assertEqual(1, len(vert))
+            self.assertTrue(ror_vert_ret[combo] is ng_args[2][vert[0]])
+            self.assertTrue(ror_horiz_ret[interval.key_to_tuple(combo)[1]] is ng_args[2][horiz[0]])
         self.assertSequenceEqual(expected, actual)
 
 
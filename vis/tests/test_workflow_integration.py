@@ -27,7 +27,9 @@ Integration tests for the WorkflowManager
 """
 
 from unittest import TestCase, TestLoader
+from mock import patch
 import pandas
+from vis.analyzers.indexers import interval
 from vis.workflow import WorkflowManager
 
 
@@ -113,6 +115,40 @@ class IntervalsTests(TestCase):
         for ind_item in exp_ind:
             self.assertEqual(IntervalsTests.EXPECTED_4[ind_item], actual[ind_item])
 
+    def test_intervals_5(self):
+        # that spreading pieces across processes gives the same result as test_intervals_2()
+        test_wm = WorkflowManager(['vis/tests/corpus/bwv77.mxl'])
+        test_wm.settings(None, 'processes', 2)
+        test_wm.load('pieces')
+        test_wm.settings(0, 'voice combinations', 'all pairs')
+        actual = test_wm.run('intervals')
+        exp_ind = list(IntervalsTests.EXPECTED_2.index)
+        act_ind = list(actual.index)
+        for ind_item in exp_ind:
+            self.assertTrue(ind_item in act_ind)
+        for ind_item in exp_ind:
+            self.assertEqual(IntervalsTests.EXPECTED_2[ind_item], actual[ind_item])
+
+    def test_intervals_6(self):
+        # that per-piece results come back in order when spread across processes
+        pathnames = ['vis/tests/corpus/bwv77.mxl', 'vis/tests/corpus/madrigal51.mxl',
+                     'vis/tests/corpus/bwv2.xml']
+        serial_wm = WorkflowManager(pathnames)
+        serial_wm.load('pieces')
+        serial_wm.settings(None, 'count frequency', False)
+        expected = serial_wm.run('intervals')
+        test_wm = WorkflowManager(pathnames)
+        test_wm.settings(None, 'processes', 3)
+        test_wm.load('pieces')
+        test_wm.settings(None, 'count frequency', False)
+        actual = test_wm.run('intervals')
+        self.assertEqual(len(expected), len(actual))
+        for exp_piece, act_piece in zip(expected, actual):
+            self.assertEqual(len(exp_piece), len(act_piece))
+            for exp_part, act_part in zip(exp_piece, act_piece):
+                self.assertSequenceEqual(list(exp_part.index), list(act_part.index))
+                self.assertSequenceEqual(list(exp_part.values), list(act_part.values))
+
 
 class NGramsTests(TestCase):
     # EXPECTED_1 is the result of the "interval n-grams" experiment with "[[0, 1]]" as the voice
@@ -293,6 +329,70 @@ class NGramsTests(TestCase):
             self.assertTrue(ind_item in act_ind)
             self.assertEqual(NGramsTests.EXPECTED_7[ind_item], actual[ind_item])
 
+    def test_ngrams_9(self):
+        # test_ngrams_7 *but* with pieces spread across processes
+        test_wm = WorkflowManager(['vis/tests/corpus/vis_Test_Piece.xml'])
+        test_wm.settings(None, 'processes', 2)
+        test_wm.load('pieces')
+        test_wm.settings(0, 'voice combinations', 'all pairs')
+        test_wm.settings(0, 'n', 2)
+        actual = test_wm.run('interval n-grams')
+        exp_ind = list(NGramsTests.EXPECTED_7.index)
+        act_ind = list(actual.index)
+        self.assertEqual(len(exp_ind), len(act_ind))
+        for ind_item in exp_ind:
+            self.assertTrue(ind_item in act_ind)
+            self.assertEqual(NGramsTests.EXPECTED_7[ind_item], actual[ind_item])
+
+    def test_ngrams_10(self):
+        # that memoized intervals give the same results, even when repeats are filtered after the
+        # "intervals" experiment has run
+        def make_wm():
+            workm = WorkflowManager(['vis/tests/corpus/vis_Test_Piece.xml'])
+            workm.load('pieces')
+            workm.settings(0, 'voice combinations', 'all pairs')
+            workm.settings(0, 'n', 2)
+            workm.settings(None, 'filter repeats', True)
+            return workm
+        expected = make_wm().run('interval n-grams')
+        test_wm = make_wm()
+        real_run = interval.IntervalIndexer.run
+        with patch.object(interval.IntervalIndexer, 'run', autospec=True) as mock_run:
+            mock_run.side_effect = real_run
+            test_wm.run('intervals')
+            test_wm.run('interval n-grams')
+            actual = test_wm.run('interval n-grams')
+            self.assertEqual(1, mock_run.call_count)
+        self.assertEqual(sorted(expected.index), sorted(actual.index))
+        for ind_item in expected.index:
+            self.assertEqual(expected[ind_item], actual[ind_item])
+
+    def test_ngrams_11(self):
+        # several values of "n" at once give the same counts as one at a time, in a column each
+        test_wm = WorkflowManager(['vis/tests/corpus/bwv77.mxl'])
+        test_wm.load('pieces')
+        test_wm.settings(0, 'voice combinations', 'all pairs')
+        expected = {}
+        for n in (2, 3, 5):
+            test_wm.settings(None, 'n', n)
+            expected[n] = test_wm.run('interval n-grams')
+        test_wm.settings(None, 'n', [2, 3, 5])
+        actual = test_wm.run('interval n-grams')
+        self.assertEqual([2, 3, 5], list(actual.columns))
+        self.assertEqual(sum(len(x) for x in expected.itervalues()), len(actual))
+        for n in (2, 3, 5):
+            column = actual[n].dropna()
+            self.assertEqual(sorted(expected[n].index), sorted(column.index))
+            for ind_item in expected[n].index:
+                self.assertEqual(expected[n][ind_item], column[ind_item])
+        # n-grams are sorted by "n," then by frequency
+        self.assertEqual(list(expected[2].index), list(actual.index[:len(expected[2])]))
+        # without "count frequency," each voice pair has n-grams of every length
+        test_wm.settings(None, 'count frequency', False)
+        actual = test_wm.run('interval n-grams')
+        self.assertEqual(18, len(actual[0]))
+        self.assertEqual([u'0,3'] * 3, [x.name for x in actual[0][:3]])
+
 
 #-------------------------------------------------------------------------------------------------#
 # Definitions                                                                                     #
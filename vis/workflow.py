@@ -31,12 +31,77 @@ new ``WorkflowManager`` classes.
 """
 
 import ast
+import csv
 import subprocess
+from collections import OrderedDict
+from itertools import izip
+from multiprocessing import Pool
+import numpy
 import pandas
-from vis.models import indexed_piece
-from vis.models.aggregated_pieces import AggregatedPieces
+from vis.models import indexed_piece, result_store, compact_corpus, profiling, ngram_index
+from vis.analyzers import indexer
 from vis.analyzers.indexers import noterest, interval, ngram, offset, repeat, lilypond
-from vis.analyzers.experimenters import frequency, aggregator
+from vis.analyzers.experimenters import frequency
+
+
+def _load_piece(args):
+    """
+    Used by :meth:`WorkflowManager.load` to import a piece and run the :class:`NoteRestIndexer` in
+    a worker process. This is a module-level function so it can be pickled.
+
+    :param args: The piece to load, and whether to measure it with a
+        :class:`~vis.models.profiling.Profiler`.
+    :type args: 2-tuple of :class:`~vis.models.indexed_piece.IndexedPiece` and bool
+
+    :returns: Whether the piece is an :class:`Opus`, and either the loaded :class:`IndexedPiece`,
+        the list of new :class:`IndexedPiece` objects for an :class:`Opus`, or the exception
+        raised while loading. In the last case, the first element is ``None``. Last are the
+        measurements made while loading.
+    :rtype: 3-tuple of bool or None, object, and list of dict
+    """
+    piece, profile = args
+    # worker processes can't have children, so indexers must not try to start their own pool
+    indexer.set_executor(u'serial')
+    profiler = profiling.Profiler() if profile else None
+    profiling.set_profiler(profiler)
+    records = lambda: [] if profiler is None else profiler.records()
+    try:
+        try:
+            profiling.measure(piece, u'load', lambda: piece.get_data([noterest.NoteRestIndexer]))
+        except indexed_piece.OpusWarning:
+            return True, piece.get_data([noterest.NoteRestIndexer], known_opus=True), records()
+    except Exception as exc:  # pylint: disable=W0703
+        return None, exc, records()
+    return False, piece, records()
+
+
+def _run_piece(args):
+    """
+    Used by :meth:`WorkflowManager.run` to run an experiment on a single piece in a worker
+    process. This is a module-level function so it can be pickled.
+
+    :param args: The name of the :class:`WorkflowManager` method that analyzes one piece, the
+        :class:`IndexedPiece` to analyze, its piece-specific settings, the shared settings, and
+        whether to measure it with a :class:`~vis.models.profiling.Profiler`.
+    :type args: 5-tuple of basestring, :class:`IndexedPiece`, dict, dict, bool
+
+    :returns: Whether the experiment succeeded, either its result or the exception raised, and
+        the measurements made while running it.
+    :rtype: 3-tuple of bool, object, and list of dict
+    """
+    indexer.set_executor(u'serial')
+    meth_name, piece, piece_settings, shared_settings, profile = args
+    profiler = profiling.Profiler() if profile else None
+    profiling.set_profiler(profiler)
+    records = lambda: [] if profiler is None else profiler.records()
+    workm = WorkflowManager([piece])
+    workm._settings = [piece_settings]  # pylint: disable=W0212
+    workm._shared_settings = shared_settings  # pylint: disable=W0212
+    try:
+        return True, profiling.measure(piece, u'run', lambda: getattr(workm, meth_name)(0)), \
+            records()
+    except Exception as exc:  # pylint: disable=W0703
+        return False, exc, records()
 
 
 class WorkflowManager(object):
@@ -76,6 +141,8 @@ class WorkflowManager(object):
     # - self._shared_settings: settings shared among all piecesd
     # - self._previous_exp: name of the experiments whose results are stored in self._result
     # - self._loaded: whether the load() method has been called
+    # - self._store: the ResultStore in which to keep results, if any
+    # - self._profiler: the Profiler of the most recent load() or run(), if any
 
     # path to the R-language script that makes bar charts
     _R_bar_chart_path = u'scripts/R_bar_chart.r'
@@ -100,20 +167,36 @@ class WorkflowManager(object):
         # hold the result of the most recent call to run()
         self._result = None
         # hold the IndexedPiece-specific settings
-        self._settings = [{} for _ in xrange(len(self._data))]
-        for piece_sett in self._settings:
-            for sett in [u'offset interval', u'voice combinations']:
-                piece_sett[sett] = None
-            for sett in [u'filter repeats']:
-                piece_sett[sett] = False
+        self._settings = [WorkflowManager._default_piece_settings() \
+                          for _ in xrange(len(self._data))]
         # hold settings common to all IndexedPieces
         self._shared_settings = {u'n': 2, u'continuer': u'_', u'mark singles': False,
                                  u'interval quality': False, u'simple intervals': False,
-                                 u'include rests': False, u'count frequency': True}
+                                 u'include rests': False, u'count frequency': True,
+                                 u'processes': 1, u'profile': False, u'sort results': True}
         # which was the most recent experiment run? Either 'intervals' or 'n-grams'
         self._previous_exp = None
         # whether the load() method has been called
         self._loaded = False
+        # the ResultStore given to load(), if any
+        self._store = None
+        # the Profiler of the most recent load() or run(), if any
+        self._profiler = None
+
+    @staticmethod
+    def _default_piece_settings():
+        """
+        Make the default settings for one piece.
+
+        :returns: The settings.
+        :rtype: dict
+        """
+        post = {}
+        for sett in [u'offset interval', u'voice combinations']:
+            post[sett] = None
+        for sett in [u'filter repeats']:
+            post[sett] = False
+        return post
 
     def __len__(self):
         """
@@ -139,6 +222,9 @@ class WorkflowManager(object):
         .. note:: If one of the files imports as a :class:`music21.stream.Opus`, the number of
             pieces and their order *will* change.
 
+        .. note:: If the ``processes`` setting is greater than ``1``, pieces are imported in that
+            many worker processes.
+
         Parameters
         ==========
         :parameter instruction: The type of data to load.
@@ -151,33 +237,332 @@ class WorkflowManager(object):
 
         **Instructions**
 
-        .. note:: only ``u'pieces'`` is implemented at this time.
+        .. note:: ``u'hdf5'``, ``u'stata'``, and ``u'pickle'`` are not implemented at this time.
 
         * ``u'pieces'``, to import all pieces, collect metadata, and run :class:`NoteRestIndexer`
+        * ``u'store'``, to do the same as ``u'pieces'`` but using the
+            :class:`~vis.models.result_store.ResultStore` in the ``pathname`` directory. Pieces
+            already in the store are not imported again, and the rest are added to it. Afterward,
+            :meth:`run` keeps each piece's results in the store, and uses them instead of
+            analyzing the piece again with the same settings. If this :class:`WorkflowManager`
+            holds no pieces, every piece in the store is loaded.
+        * ``u'compact'``, to do the same as ``u'pieces'`` but using the
+            :class:`~vis.models.compact_corpus.CompactCorpus` in the ``pathname`` directory.
+            Pieces already in the corpus are not imported again. If some pieces are not, they're
+            imported and the corpus is written again with all the pieces. Afterward, each piece
+            reads its :class:`NoteRestIndexer` results from the memory-mapped corpus only when
+            they're needed, and worker processes share the corpus rather than receiving a copy. If
+            this :class:`WorkflowManager` holds no pieces, every piece in the corpus is loaded.
         * ``u'hdf5'`` to load data from a previous :meth:`export`.
         * ``u'stata'`` to load data from a previous :meth:`export`.
         * ``u'pickle'`` to load data from a previous :meth:`export`.
         """
         # TODO: remove requirement to provide "instruction"; should default to 'pieces'
-        # TODO: rewrite this with multiprocessing
-        # NOTE: you may want to have the worker process create a new IndexedPiece object, import it
-        #       and run the NoteRestIndexer, then pickle it and send that to a callback method
-        #       that will somehow unpickle it and replace the *data in* the IndexedPieces here, but
-        #       not actually replace the IndexedPieces, since that would inadvertently cancel the
-        #       client's pointer to the IndexedPieces, if they have one
-        if u'pieces' == instruction:
-            for i, piece in enumerate(self._data):
-                try:
-                    piece.get_data([noterest.NoteRestIndexer])
-                except indexed_piece.OpusWarning:
-                    new_ips = piece.get_data([noterest.NoteRestIndexer], known_opus=True)
-                    self._data = self._data[:i] + self._data[i + 1:] + new_ips
-        elif u'hdf5' == instruction or u'stata' == instruction or u'pickle' == instruction:
-            raise NotImplementedError(u'The ' + instruction + u' instruction does\'t work yet!')
-        else:
-            raise RuntimeError(u'Unrecognized load() instruction: "' + unicode(instruction) + '"')
+        previous = self._start_profiler()
+        try:
+            if u'pieces' == instruction and self.settings(None, u'processes') > 1:
+                self._load_parallel()
+            elif u'pieces' == instruction:
+                for i, piece in enumerate(self._data):
+                    try:
+                        profiling.measure(piece, u'load',  # pylint: disable=W0640
+                                          lambda: piece.get_data([noterest.NoteRestIndexer]))
+                    except indexed_piece.OpusWarning:
+                        new_ips = piece.get_data([noterest.NoteRestIndexer], known_opus=True)
+                        self._data = self._data[:i] + self._data[i + 1:] + new_ips
+            elif u'store' == instruction:
+                if pathname is None:
+                    raise RuntimeError(u'The "store" instruction requires a pathname')
+                self._load_store(pathname)
+            elif u'compact' == instruction:
+                if pathname is None:
+                    raise RuntimeError(u'The "compact" instruction requires a pathname')
+                self._load_compact(pathname)
+            elif u'hdf5' == instruction or u'stata' == instruction or u'pickle' == instruction:
+                raise NotImplementedError(u'The ' + instruction + u' instruction does\'t work yet!')
+            else:
+                raise RuntimeError(u'Unrecognized load() instruction: "' + unicode(instruction) +
+                                   u'"')
+        finally:
+            profiling.set_profiler(previous)
         self._loaded = True
 
+    def _load_store(self, pathname):
+        """
+        Load pieces from a :class:`~vis.models.result_store.ResultStore`, importing those that
+        aren't in it and adding them. Called by :meth:`load`.
+
+        As with the ``u'pieces'`` instruction, a file that imports as an :class:`Opus` is replaced
+        by one :class:`IndexedPiece` per :class:`Score`, appended to the end of the list of pieces.
+
+        :param pathname: The directory of the store.
+        :type pathname: basestring
+        """
+        self._store = result_store.ResultStore(pathname)
+        if 0 == len(self._data):
+            self._data = [indexed_piece.IndexedPiece(path, opus_id) \
+                          for path, opus_id in self._store.pieces()]
+            self._settings = [WorkflowManager._default_piece_settings() for _ in self._data]
+        keep = []
+        new_ips = []
+        missing = []
+        for piece in self._data:
+            found = self._store.get_piece(piece)
+            if isinstance(found, list):
+                new_ips.extend(found)
+            else:
+                keep.append(piece)
+                if found is None:
+                    missing.append(piece)
+        if len(missing) > 0:
+            self._data = missing
+            self.load(u'pieces')
+            # an IndexedPiece that load() didn't keep was an Opus, replaced by new objects
+            kept = set(id(piece) for piece in self._data)
+            missing_ids = set(id(piece) for piece in missing)
+            from_opus = [piece for piece in self._data if id(piece) not in missing_ids]
+            for piece in missing:
+                if id(piece) in kept:
+                    self._store.put_piece(piece)
+                else:
+                    path = piece.metadata(u'pathname')
+                    self._store.put_piece(piece, [each for each in from_opus \
+                                                  if each.metadata(u'pathname') == path])
+            keep = [piece for piece in keep if id(piece) in kept or id(piece) not in missing_ids]
+            new_ips.extend(from_opus)
+        self._data = keep + new_ips
+
+    def _load_compact(self, pathname):
+        """
+        Load pieces from a :class:`~vis.models.compact_corpus.CompactCorpus`, importing those that
+        aren't in it and writing the corpus again if there are any. Called by :meth:`load`.
+
+        As with the ``u'pieces'`` instruction, a file that imports as an :class:`Opus` is replaced
+        by one :class:`IndexedPiece` per :class:`Score`, appended to the end of the list of pieces.
+
+        :param pathname: The directory of the corpus.
+        :type pathname: basestring
+        """
+        # pylint: disable=W0212
+        corpus = compact_corpus.open_corpus(pathname)
+        if 0 == len(self._data) and corpus is not None:
+            self._data = [indexed_piece.IndexedPiece(path, opus_id) \
+                          for path, opus_id in corpus.pieces()]
+            self._settings = [WorkflowManager._default_piece_settings() for _ in self._data]
+        keep = []
+        new_ips = []
+        missing = []
+        for piece in self._data:
+            where = None
+            if corpus is not None:
+                where = corpus.find(piece.metadata(u'pathname'), piece._opus_id)
+            if isinstance(where, list):
+                for opus_id, index in enumerate(where):
+                    new_ips.append(indexed_piece.IndexedPiece(piece.metadata(u'pathname'), opus_id))
+                    corpus.attach(new_ips[-1], index)
+            else:
+                keep.append(piece)
+                if where is None:
+                    missing.append(piece)
+                else:
+                    corpus.attach(piece, where)
+        if len(missing) > 0:
+            self._data = missing
+            self.load(u'pieces')
+            # an IndexedPiece that load() didn't keep was an Opus, replaced by new objects
+            kept = set(id(piece) for piece in self._data)
+            missing_ids = set(id(piece) for piece in missing)
+            keep = [piece for piece in keep if id(piece) in kept or id(piece) not in missing_ids]
+            new_ips.extend([piece for piece in self._data if id(piece) not in missing_ids])
+            compact_corpus.write_corpus(pathname, keep + new_ips)
+            corpus = compact_corpus.open_corpus(pathname)
+            for piece in keep + new_ips:
+                corpus.attach(piece, corpus.find(piece.metadata(u'pathname'), piece._opus_id))
+        self._data = keep + new_ips
+
+    def _load_parallel(self):
+        """
+        Import all pieces and run the :class:`NoteRestIndexer` with a pool of worker processes, as
+        many as the ``processes`` setting. Called by :meth:`load`.
+
+        Each worker imports an :class:`IndexedPiece` and sends it back, and we copy the *data in*
+        the returned :class:`IndexedPiece` to the one we already hold, so that we don't replace
+        objects to which a client may hold a reference. As in serial mode, a file that imports as
+        an :class:`Opus` is replaced by one :class:`IndexedPiece` per :class:`Score`, appended to
+        the end of the list of pieces, and the first exception raised by a piece (in order) is
+        raised here.
+        """
+        profiler = profiling.get_profiler()
+        profile = profiler is not None
+        pool = Pool(self.settings(None, u'processes'))
+        try:
+            results = list(pool.imap(_load_piece, [(piece, profile) for piece in self._data]))
+            keep = []
+            new_ips = []
+            for piece, (is_opus, result, records) in zip(self._data, results):
+                if profile:
+                    profiler.add(records)
+                if is_opus is None:
+                    raise result
+                elif is_opus:
+                    new_ips.extend(result)
+                else:
+                    piece.__dict__.update(result.__dict__)
+                    keep.append(piece)
+            if len(new_ips) > 0:
+                # the new IndexedPiece objects don't hold a reference anywhere else, so we'll use
+                # the returned copies directly
+                results = list(pool.imap(_load_piece, [(piece, profile) for piece in new_ips]))
+                new_ips = []
+                for is_opus, result, records in results:
+                    if profile:
+                        profiler.add(records)
+                    if is_opus is None:
+                        raise result
+                    new_ips.append(result)
+            self._data = keep + new_ips
+        finally:
+            pool.close()
+            pool.join()
+
+    def _map_pieces(self, meth_name):
+        """
+        Call a method that analyzes one piece, given its index, for every piece. If the
+        ``processes`` setting is greater than ``1``, pieces are spread across a pool of worker
+        processes, and only the results are sent back.
+
+        :param meth_name: The name of the method to call, like ``u'_intervs_piece'``.
+        :type meth_name: basestring
+
+        :returns: The results for every piece, in the same order as ``self._data``.
+        :rtype: list
+
+        :raises: The first exception raised by any piece, in the same order as ``self._data``.
+        """
+        return list(self._imap_pieces(meth_name))
+
+    def _imap_pieces(self, meth_name):
+        """
+        Like :meth:`_map_pieces`, but yield each piece's result as soon as it's ready, so the
+        caller need not hold the results for every piece at once.
+
+        If :meth:`load` was given a :class:`~vis.models.result_store.ResultStore`, stored results
+        are used for pieces analyzed before with the same settings, and new results are stored.
+
+        :param meth_name: The name of the method to call, like ``u'_intervs_piece'``.
+        :type meth_name: basestring
+
+        :returns: The results for every piece, in the same order as ``self._data``.
+        :rtype: generator
+
+        :raises: The first exception raised by any piece, in the same order as ``self._data``.
+        """
+        if self._store is None:
+            for result in self._compute_pieces(meth_name, range(len(self._data))):
+                yield result
+            return
+        # with a ResultStore, we only analyze the pieces whose results aren't stored
+        setts = [self._store_settings(i) for i in xrange(len(self._data))]
+        stored = [self._store.has(piece, meth_name, setts[i]) \
+                  for i, piece in enumerate(self._data)]
+        computed = self._compute_pieces(meth_name, [i for i in xrange(len(stored)) if not stored[i]])
+        for i, piece in enumerate(self._data):
+            result = self._store.get(piece, meth_name, setts[i]) if stored[i] else None
+            if result is None:
+                result = next(computed) if not stored[i] else getattr(self, meth_name)(i)
+                self._store.put(piece, meth_name, setts[i], result)
+            yield result
+
+    def _compute_pieces(self, meth_name, indices):
+        """
+        Call a method that analyzes one piece, given its index, for some pieces. Called by
+        :meth:`_imap_pieces`, which describes the ``processes`` setting.
+
+        :param meth_name: The name of the method to call, like ``u'_intervs_piece'``.
+        :type meth_name: basestring
+        :param indices: The indices of the pieces to analyze, as stored in ``self._data``.
+        :type indices: list of int
+
+        :returns: The results for each piece, in the same order as ``indices``.
+        :rtype: generator
+        """
+        processes = self.settings(None, u'processes')
+        if processes < 2:
+            for i in indices:
+                yield profiling.measure(self._data[i], u'run',  # pylint: disable=W0640
+                                        lambda: getattr(self, meth_name)(i))
+            return
+        profiler = profiling.get_profiler()
+        # the "profile" setting may be a function that can't be pickled, but workers don't use it
+        shared_settings = dict(self._shared_settings)
+        shared_settings[u'profile'] = False
+        jobs = [(meth_name, self._data[i], self._settings[i], shared_settings, \
+                 profiler is not None) for i in indices]
+        pool = Pool(processes)
+        try:
+            for succeeded, result, records in pool.imap(_run_piece, jobs):
+                if profiler is not None:
+                    profiler.add(records)
+                if not succeeded:
+                    raise result
+                yield result
+        finally:
+            pool.close()
+            pool.join()
+
+    def _store_settings(self, index):
+        """
+        Find the settings that affect the results of a piece, to know which stored results to use.
+
+        :param index: The index of the piece, as stored in ``self._data``.
+        :type index: int
+
+        :returns: The piece's settings and the shared settings, except those that don't affect
+            the results of a single piece.
+        :rtype: dict
+        """
+        post = dict(self._shared_settings)
+        del post[u'processes']
+        del post[u'count frequency']
+        del post[u'profile']
+        del post[u'sort results']
+        post.update(self._settings[index])
+        return post
+
+    def _start_profiler(self):
+        """
+        If the ``profile`` setting is set, make a new :class:`~vis.models.profiling.Profiler` for
+        this :class:`WorkflowManager` and use it until :meth:`load` or :meth:`run` is finished.
+        When :meth:`load` calls itself, the profiler it already made is kept.
+
+        :returns: The profiler to use again afterward, with
+            :func:`~vis.models.profiling.set_profiler`.
+        :rtype: :class:`~vis.models.profiling.Profiler` or None
+        """
+        profile = self.settings(None, u'profile')
+        previous = profiling.get_profiler()
+        if profile is False or profile is None or \
+        (self._profiler is not None and previous is self._profiler):
+            return previous
+        self._profiler = profiling.Profiler(None if profile is True else profile)
+        return profiling.set_profiler(self._profiler)
+
+    def profile(self):
+        """
+        Get the time and memory used by every stage of every piece in the most recent call to
+        :meth:`load` or :meth:`run` made with the ``profile`` setting. Refer to
+        :mod:`vis.models.profiling` for a description of the columns.
+
+        :returns: The measurements, one per row.
+        :rtype: :class:`pandas.DataFrame`
+
+        :raises: :exc:`RuntimeError` if nothing was measured, because the ``profile`` setting was
+            never set.
+        """
+        if self._profiler is None:
+            raise RuntimeError(u'Please set the "profile" setting before you call load() or run()')
+        return self._profiler.dataframe()
+
     def run(self, instruction):
         """
         Run an experiment's workflow. Remember to call :meth:`load` before this method.
@@ -210,16 +595,20 @@ class WorkflowManager(object):
         # run the experiment
         if len(instruction) < min([len(x) for x in WorkflowManager._experiments_list]):
             raise RuntimeError(error_msg)
-        if instruction.startswith(WorkflowManager._experiments_list[0]):
-            # intervals
-            self._previous_exp = WorkflowManager._experiments_list[0]
-            post = self._intervs()
-        elif instruction.startswith(WorkflowManager._experiments_list[1]):
-            # interval n-grams
-            self._previous_exp = WorkflowManager._experiments_list[1]
-            post = self._interval_ngrams()
-        else:
-            raise RuntimeError(error_msg)
+        previous = self._start_profiler()
+        try:
+            if instruction.startswith(WorkflowManager._experiments_list[0]):
+                # intervals
+                self._previous_exp = WorkflowManager._experiments_list[0]
+                post = self._intervs()
+            elif instruction.startswith(WorkflowManager._experiments_list[1]):
+                # interval n-grams
+                self._previous_exp = WorkflowManager._experiments_list[1]
+                post = self._interval_ngrams()
+            else:
+                raise RuntimeError(error_msg)
+        finally:
+            profiling.set_profiler(previous)
         self._result = post
         return post
 
@@ -248,28 +637,48 @@ class WorkflowManager(object):
             or a list of outputs from :class:`~vis.analyzers.indexers.ngram.NGramIndexer`,
             depending on the ``count frequency`` setting.
 
-        .. note:: To compute more than one value of ``n``, call :meth:`_interval_ngrams` many times.
+        If the ``n`` setting is a list, the n-grams of every length are found from the same
+        intervals in one pass. The frequencies are then a :class:`DataFrame` with a column for
+        every value of ``n``, and without ``count frequency``, each piece has the n-grams of every
+        length (in the order of the ``n`` setting) in place of each voice combination's n-grams.
+        The values in the list must be different. :meth:`export` and :meth:`output` apply
+        ``top_x`` and ``threshold`` to the column of each ``n``.
         """
-        self._result = []
-        # user helpers to fetch results for each piece
-        for i in xrange(len(self._data)):
-            # figure out which combinations we need... this might raise a ValueError, but there's
-            # not much we can do to save the situation, so we might as well let it go up
-            combos = unicode(self.settings(i, u'voice combinations'))
-            if combos != u'all' and combos != u'all pairs':
-                combos = ast.literal_eval(combos)
-
-            if u'all' == self.settings(i, u'voice combinations'):
-                self._result.append(self._all_part_modules(i))
-            elif u'all pairs' == self.settings(i, u'voice combinations'):
-                self._result.append(self._two_part_modules(i))
-            else:
-                self._result.append(self._variable_part_modules(i))
-        # aggregate results across all pieces
+        # aggregate results across all pieces as they're ready, or fetch results for each piece
         if self.settings(None, u'count frequency') is True:
-            self._run_freq_agg()
+            n_values = self.settings(None, u'n')
+            n_values = None if isinstance(n_values, (int, long)) else list(n_values)
+            self._run_freq_agg(self._imap_pieces(u'_interval_ngrams_piece'), n_values)
+        else:
+            self._result = self._map_pieces(u'_interval_ngrams_piece')
         return self._result
 
+    def _interval_ngrams_piece(self, index):
+        """
+        Prepare the interval n-grams of a single piece, using :meth:`_all_part_modules`,
+        :meth:`_two_part_modules`, or :meth:`_variable_part_modules` as required by the piece's
+        ``voice combinations`` setting. Called by :meth:`_interval_ngrams`.
+
+        :param index: The index of the IndexedPiece on which to the experiment, as stored in
+            ``self._data``.
+        :type index: int
+
+        :returns: The result of :class:`NGramIndexer` for a single piece.
+        :rtype: list of :class:`pandas.Series`
+        """
+        # figure out which combinations we need... this might raise a ValueError, but there's
+        # not much we can do to save the situation, so we might as well let it go up
+        combos = unicode(self.settings(index, u'voice combinations'))
+        if combos != u'all' and combos != u'all pairs':
+            combos = ast.literal_eval(combos)
+
+        if u'all' == self.settings(index, u'voice combinations'):
+            return self._all_part_modules(index)
+        elif u'all pairs' == self.settings(index, u'voice combinations'):
+            return self._two_part_modules(index)
+        else:
+            return self._variable_part_modules(index)
+
     def _variable_part_modules(self, index):
         """
         Prepare a list of frequencies of variable-part interval n-grams in a piece. This method is
@@ -305,22 +714,7 @@ class WorkflowManager(object):
         # figure out which combinations we need... this might raise a ValueError, but there's not
         # much we can do to save the situation, so we might as well let it go up
         needed_combos = ast.literal_eval(unicode(self.settings(index, u'voice combinations')))
-        # each key in vert_ints corresponds to a two-voice combination we should use
-        post = []
-        for combo in needed_combos:
-            # make the list of parts
-            parts = [vert_ints[str(i) + u',' + str(combo[-1])] for i in combo[:-1]]
-            parts.append(horiz_ints[combo[-1]])
-            # assemble settings
-            setts = {u'vertical': range(len(combo[:-1])), u'horizontal': [len(combo[:-1])]}
-            setts[u'mark singles'] = self.settings(None, u'mark singles')
-            setts[u'continuer'] = self.settings(None, u'continuer')
-            setts[u'n'] = self.settings(None, u'n')
-            if self.settings(None, u'include rests') is not True:
-                setts[u'terminator'] = u'Rest'
-            # run NGramIndexer, then append the result to the corresponding index of the dict
-            post.append(piece.get_data([ngram.NGramIndexer], setts, parts)[0])
-        return post
+        return self._ngram_combinations(index, needed_combos, vert_ints, horiz_ints)
 
     def _two_part_modules(self, index):
         """
@@ -352,22 +746,8 @@ class WorkflowManager(object):
         vert_ints = self._run_off_rep(index, vert_ints)
         horiz_ints = self._run_off_rep(index, horiz_ints)
         # each key in vert_ints corresponds to a two-voice combination we should use
-        post = []
-        for combo in vert_ints.iterkeys():
-            # which "horiz" part to use?
-            horiz_i = interval.key_to_tuple(combo)[1]
-            # make the list of parts
-            parts = [vert_ints[combo], horiz_ints[horiz_i]]
-            # assemble settings
-            setts = {u'vertical': [0], u'horizontal': [1]}
-            setts[u'mark singles'] = self.settings(None, u'mark singles')
-            setts[u'continuer'] = self.settings(None, u'continuer')
-            setts[u'n'] = self.settings(None, u'n')
-            if self.settings(None, u'include rests') is not True:
-                setts[u'terminator'] = u'Rest'
-            # run NGramIndexer, then append the result to the corresponding index of the dict
-            post.append(piece.get_data([ngram.NGramIndexer], setts, parts)[0])
-        return post
+        combos = [interval.key_to_tuple(combo) for combo in vert_ints.iterkeys()]
+        return self._ngram_combinations(index, combos, vert_ints, horiz_ints)
 
     def _all_part_modules(self, index):
         """
@@ -384,8 +764,8 @@ class WorkflowManager(object):
             ``self._data``.
         :type index: int
 
-        :returns: The result of :class:`NGramIndexer` for a single piece (for this method, always
-            a single-element list).
+        :returns: The result of :class:`NGramIndexer` for a single piece (for this method, a
+            single-element list unless the ``n`` setting is a list).
         :rtype: list of :class:`pandas.Series`
         """
         piece = self._data[index]
@@ -408,15 +788,115 @@ class WorkflowManager(object):
         parts = [vert_ints[x] for x in vert_combos]
         parts.append(horiz_ints[-1])  # always the lowest voice
         # assemble settings
-        setts = {u'vertical': range(len(parts) - 1), u'horizontal': [len(parts) - 1]}
-        setts[u'mark singles'] = self.settings(None, u'mark singles')
-        setts[u'continuer'] = self.settings(None, u'continuer')
-        setts[u'n'] = self.settings(None, u'n')
+        setts = self._ngram_settings()
+        setts[u'vertical'] = range(len(parts) - 1)
+        setts[u'horizontal'] = [len(parts) - 1]
+        # run NGramIndexer, then append the result to the corresponding index of the dict
+        result = piece.get_data([ngram.NGramIndexer], setts, parts)
+        # name copies, since the piece may return its memoized results again later
+        name = WorkflowManager._combination_name(range(lowest_part + 1))
+        return [WorkflowManager._named(each, name) for each in result]
+
+    def _ngram_settings(self):
+        """
+        Make the settings shared by every :class:`~vis.analyzers.indexers.ngram.NGramIndexer`
+        run for interval n-grams, without the ``u'vertical'`` and ``u'horizontal'`` settings.
+
+        :returns: The settings.
+        :rtype: dict
+        """
+        setts = {u'mark singles': self.settings(None, u'mark singles'),
+                 u'continuer': self.settings(None, u'continuer'),
+                 u'n': self.settings(None, u'n')}
         if self.settings(None, u'include rests') is not True:
             setts[u'terminator'] = u'Rest'
-        # run NGramIndexer, then append the result to the corresponding index of the dict
-        result = [piece.get_data([ngram.NGramIndexer], setts, parts)[0]]
-        return result
+        return setts
+
+    def _ngram_combinations(self, index, combos, vert_ints, horiz_ints):
+        """
+        Find the interval n-grams of many voice combinations in a piece with a single
+        :class:`~vis.analyzers.indexers.ngram.NGramIndexer`. Used by :meth:`_two_part_modules`
+        and :meth:`_variable_part_modules`.
+
+        Each vertical-interval and horizontal-interval index is given to the indexer once, however
+        many combinations use it, so the horizontal intervals of a lowest voice shared by several
+        combinations are only formatted once. A combination listed more than once is only run
+        once, and its result is repeated.
+
+        :param index: The index of the IndexedPiece on which to the experiment, as stored in
+            ``self._data``.
+        :type index: int
+        :param combos: The voice combinations, each with the lowest voice last.
+        :type combos: list of list of int
+        :param vert_ints: The vertical intervals, as returned by :meth:`_run_off_rep`.
+        :type vert_ints: dict of :class:`pandas.Series`
+        :param horiz_ints: The horizontal intervals, as returned by :meth:`_run_off_rep`.
+        :type horiz_ints: list of :class:`pandas.Series`
+
+        :returns: The result of :class:`NGramIndexer` for every combination, in the same order. If
+            the ``n`` setting is a list, each combination has a result for every value of ``n``.
+        :rtype: list of :class:`pandas.Series`
+        """
+        parts = []
+        positions = {}  # where each part is in "parts"
+        def position(key, part):
+            "Find a part in the list of parts, adding it if it's not there yet."
+            if key not in positions:
+                positions[key] = len(parts)
+                parts.append(part)
+            return positions[key]
+        plan = OrderedDict()  # the NGramIndexer's vertical and horizontal parts for every combo
+        for combo in combos:
+            combo = tuple(combo)
+            if combo not in plan:
+                lowest = combo[-1]
+                verts = [position(u'%s,%s' % (i, lowest), vert_ints[u'%s,%s' % (i, lowest)])
+                         for i in combo[:-1]]
+                plan[combo] = [verts, [position(lowest, horiz_ints[lowest])]]
+        if 0 == len(plan):
+            return []
+        setts = self._ngram_settings()
+        setts[u'combinations'] = plan.values()
+        results = self._data[index].get_data([ngram.NGramIndexer], setts, parts)
+        # NGramIndexer gives the same number of results, one for every "n," for every combination
+        per_combo = len(results) // len(plan)
+        by_combo = {}
+        for i, combo in enumerate(plan.iterkeys()):
+            # name copies, since the piece may return its memoized results again later
+            by_combo[combo] = [WorkflowManager._named(result,
+                                                      WorkflowManager._combination_name(combo))
+                               for result in results[i * per_combo:(i + 1) * per_combo]]
+        return [result for combo in combos for result in by_combo[tuple(combo)]]
+
+    @staticmethod
+    def _named(series, name):
+        """
+        Name a shallow copy of a :class:`Series`, leaving the original as it was.
+
+        :param series: The :class:`Series` to name.
+        :type series: :class:`pandas.Series`
+        :param name: The name.
+        :type name: unicode
+
+        :returns: A copy of ``series`` that shares its values, with the name.
+        :rtype: :class:`pandas.Series`
+        """
+        post = series.copy(deep=False)
+        post.name = name
+        return post
+
+    @staticmethod
+    def _combination_name(combo):
+        """
+        Name a voice combination, for the name of the :class:`Series` of its n-grams.
+
+        :param combo: The voice combination.
+        :type combo: list of int
+
+        :returns: The name, like ``u'0,1,3'``.
+        :rtype: unicode
+        """
+        return u','.join(unicode(voice) for voice in combo)
 
     def _intervs(self):
         """
@@ -441,33 +921,47 @@ class WorkflowManager(object):
             than two parts are ignored, which may result in one or more pieces being omitted from
             the results if you aren't careful with settings.
         """
-        self._result = []
+        if self.settings(None, 'count frequency') is True:
+            self._run_freq_agg(self._imap_pieces(u'_intervs_piece'))
+        else:
+            self._result = self._map_pieces(u'_intervs_piece')
+        return self._result
+
+    def _intervs_piece(self, index):
+        """
+        Prepare a list of the intervals found between two parts in a single piece. Called by
+        :meth:`_intervs`, which describes the settings used.
+
+        :param index: The index of the IndexedPiece on which to the experiment, as stored in
+            ``self._data``.
+        :type index: int
+
+        :returns: The filtered results of :class:`~vis.analyzers.indexers.interval.IntervalIndexer`.
+        :rtype: list of :class:`pandas.Series`
+        """
         # shared settings for the IntervalIndexer
         setts = {u'quality': self.settings(None, u'interval quality')}
         setts[u'simple or compound'] = u'simple' if self.settings(None, u'simple intervals') \
                                        is True else u'compound'
-        for i, piece in enumerate(self._data):
-            vert_ints = piece.get_data([noterest.NoteRestIndexer, interval.IntervalIndexer], setts)
-            # figure out which combinations we need... this might raise a ValueError, but there's
-            # not much we can do to save the situation, so we might as well let it go up
-            combos = unicode(self.settings(i, u'voice combinations'))
-            if combos != u'all' and combos != u'all pairs' and combos != u'None':
-                combos = ast.literal_eval(combos)
-                vert_ints = WorkflowManager._remove_extra_pairs(vert_ints, combos)
-            # we no longer need to know the combinations' names, so we can make a list
-            vert_ints = list(vert_ints.itervalues())
-            # run the offset and repeat indexers, if required
-            post = self._run_off_rep(i, vert_ints)
-            # remove the "Rest" entries, if required
-            if self.settings(None, u'include rests') is not True:
-                # we'll just get a view that omits the "Rest" entries in the Series
-                # TODO: this is pandas magic; check it for 0.13
-                for i, pair in enumerate(post):
-                    post[i] = pair[pair != u'Rest']
-            self._result.append(post)
-        if self.settings(None, 'count frequency') is True:
-            self._run_freq_agg()
-        return self._result
+        vert_ints = self._data[index].get_data([noterest.NoteRestIndexer, interval.IntervalIndexer],
+                                               setts)
+        # figure out which combinations we need... this might raise a ValueError, but there's
+        # not much we can do to save the situation, so we might as well let it go up
+        combos = unicode(self.settings(index, u'voice combinations'))
+        if combos != u'all' and combos != u'all pairs' and combos != u'None':
+            combos = ast.literal_eval(combos)
+            vert_ints = WorkflowManager._remove_extra_pairs(vert_ints, combos)
+        # we no longer need to know the combinations' names, so we can make a list
+        vert_ints = list(vert_ints.itervalues())
+        # run the offset and repeat indexers, if required
+        post = self._run_off_rep(index, vert_ints)
+        # remove the "Rest" entries, if required
+        if self.settings(None, u'include rests') is not True:
+            # we'll just get a view that omits the "Rest" entries in the Series
+            # TODO: this is pandas magic; check it for 0.13
+            for i, pair in enumerate(post):
+                post[i] = pair[pair != u'Rest']
+        return post
 
     def _run_off_rep(self, index, so_far):
         """
@@ -508,29 +1002,136 @@ class WorkflowManager(object):
             so_far = {dict_keys[i]: so_far[i] for i in xrange(len(dict_keys))}
         return so_far
 
-    def _run_freq_agg(self):
+    def _run_freq_agg(self, pieces=None, n_values=None):
         """
-        Run the frequency and aggregation experimenters:
+        Count the frequency of objects in every part of every piece, then add the counts together.
+        The result is the same as running these experimenters through :class:`AggregatedPieces`:
 
-        * :class:`~vis.analyzers.experimenters.frequencyFrequencyExperimenter`
+        * :class:`~vis.analyzers.experimenters.frequency.FrequencyExperimenter`
         * :class:`~vis.analyzers.experimenters.aggregator.ColumnAggregator`
 
+        Counts are added to a running total one piece at a time, and a piece's results are dropped
+        once they're counted, so given a generator like the one from :meth:`_imap_pieces`, memory
+        use does not grow with the number of pieces.
+
         Use this method from other :class:`WorkflowManager` methods for counting frequency.
 
-        .. note:: This method runs on, then overwrites, values stored in :attr:`self._result`.
+        .. note:: This method overwrites the value stored in :attr:`self._result`.
 
-        :returns: Aggregated frequency counts for everything stored in :attr:`self._result`.
-        :rtype: :class:`pandas.Series`
+        :param pieces: The results for every piece, each a list or dict of :class:`Series`. The
+            default is to use the value stored in :attr:`self._result`.
+        :type pieces: iterable of list or dict of :class:`pandas.Series`
+        :param n_values: If the parts are n-grams of several lengths, the value of ``n`` for each
+            part, repeating as often as required. The counts of each ``n`` are then kept separate.
+        :type n_values: list of int
+
+        :returns: Aggregated frequency counts for all the pieces, from most to least common, unless
+            the ``sort results`` setting is ``False``. With ``n_values``, there is a column for
+            every ``n``, and the n-grams are sorted by ``n``, then by frequency.
+        :rtype: :class:`pandas.Series` or :class:`pandas.DataFrame`
         """
-        # NB: there's no "logic" here, so I didn't bother testing the method
-        agg_p = AggregatedPieces(self._data)
-        self._result = agg_p.get_data([aggregator.ColumnAggregator],
-                                      [frequency.FrequencyExperimenter],
-                                      {},
-                                      self._result)
-        self._result.sort(ascending=False)
+        if pieces is None:
+            pieces, self._result = self._result, None
+        def each_part():
+            "Yield the frequency counts of each part in each piece, one at a time."
+            for piece in pieces:
+                parts = piece.itervalues() if isinstance(piece, dict) else piece
+                if n_values is None:
+                    for part in parts:
+                        yield part.value_counts()
+                else:
+                    yield WorkflowManager._count_by_n(parts, n_values)
+        total = frequency.merge_counts(each_part())
+        if 0 == len(self._data):
+            # what AggregatedPieces gives when there are no pieces
+            total = pandas.DataFrame()
+        elif self.settings(None, u'sort results') is not True:
+            # export() and output() pick out the results they need without sorting everything
+            total = total.astype(float)
+        elif n_values is not None:
+            order = []
+            for n in n_values:
+                column = total[n].dropna().sort_index()
+                column.sort(ascending=False)
+                order.extend(column.index)
+            total = total.reindex(order).astype(float)
+        else:
+            total = total.sort_index().astype(float)
+            total.sort(ascending=False)
+        self._result = total
         return self._result
 
+    @staticmethod
+    def _top_counts(counts, top_x):
+        """
+        Find the ``top_x`` most common results without sorting all of ``counts``. The ``top_x``-th
+        largest count is found with :func:`numpy.argpartition` in linear time; only the results
+        with larger counts, and as many as required of those equal to it, are sorted. Equal counts
+        are in the order of their index, so the result doesn't depend on the order of ``counts``.
+
+        :param counts: The frequency counts, in any order.
+        :type counts: :class:`pandas.Series`
+        :param top_x: How many results to keep, or ``None`` to keep them all.
+        :type top_x: int
+
+        :returns: The most common results, from most to least common.
+        :rtype: :class:`pandas.Series`
+        """
+        values = counts.values
+        if top_x is not None and top_x < len(values):
+            if top_x < 1:
+                return counts[:0]
+            cutoff = values[numpy.argpartition(-values, top_x - 1)[top_x - 1]]
+            larger = counts[values > cutoff]
+            equal = counts[values == cutoff].sort_index()[:top_x - len(larger)]
+            counts = pandas.concat([larger, equal])
+        counts = counts.sort_index()
+        return counts.iloc[numpy.argsort(-counts.values, kind='mergesort')]
+
+    @staticmethod
+    def _write_csv(counts, name, pathname):
+        """
+        Write frequency counts to a CSV file one row at a time, rather than making a
+        :class:`DataFrame` of them first. The file is the same as the one written by
+        :meth:`pandas.DataFrame.to_csv` for a :class:`DataFrame` with ``counts`` as its only column.
+
+        :param counts: The counts to write.
+        :type counts: :class:`pandas.Series`
+        :param name: The name of the column.
+        :type name: ``basestring``
+        :param pathname: The pathname of the file.
+        :type pathname: ``basestring``
+        """
+        def encode(thing):
+            "Encode unicode strings, which the csv module can't write."
+            return thing.encode(u'utf-8') if isinstance(thing, unicode) else thing
+        with open(pathname, 'wb') as csv_file:
+            writer = csv.writer(csv_file, lineterminator='\n')
+            writer.writerow(['', encode(name)])
+            for index, value in izip(counts.index, counts.values):
+                writer.writerow([encode(index), value])
+
+    @staticmethod
+    def _count_by_n(parts, n_values):
+        """
+        Count the frequency of n-grams in the parts of a piece, separately for each length.
+
+        :param parts: The n-grams of every voice combination; for each, the n-grams of every
+            length in ``n_values``, in that order.
+        :type parts: iterable of :class:`pandas.Series`
+        :param n_values: The value of ``n`` for each part, repeating as often as required.
+        :type n_values: list of int
+
+        :returns: The frequency of each n-gram in a column for its ``n``.
+        :rtype: :class:`pandas.DataFrame`
+        """
+        counts = {}
+        for i, part in enumerate(parts):
+            n = n_values[i % len(n_values)]
+            each = part.value_counts()
+            counts[n] = each if n not in counts else counts[n].add(each, fill_value=0)
+        return pandas.DataFrame(counts, columns=n_values)
+
     @staticmethod
     def _remove_extra_pairs(vert_ints, combos):
         """
@@ -563,10 +1164,85 @@ class WorkflowManager(object):
                 del vert_ints[key]
             return vert_ints
 
+    def _get_series(self, top_x=None, threshold=None):
+        """
+        Find the top ``X`` results in ``self._result`` that are greater than ``threshold``. Note
+        that the threshold filter is applied first. Refer to :meth:`_pick_top`.
+
+        :param top_x: This is the "X" in "only show the top X results." The default is ``None``.
+        :type top_x: ``int``
+        :param threshold: If a result is strictly less than this number, it won't be included. The
+            default is ``None``.
+        :type threshold: number
+
+        :returns: The results, from most to least common.
+        :rtype: :class:`pandas.Series`
+        """
+        return WorkflowManager._pick_top(self._result, top_x, threshold)
+
+    def _get_frame(self, top_x=None, threshold=None):
+        """
+        Find the top ``X`` results that are greater than ``threshold`` in every column of
+        ``self._result``, when it's a :class:`DataFrame` (like the frequencies of n-grams with a
+        list of ``n`` values, which have a column for every ``n``). Note that the threshold filter
+        is applied first. Refer to :meth:`_pick_top`.
+
+        :param top_x: This is the "X" in "only show the top X results" of each column. The default
+            is ``None``.
+        :type top_x: ``int``
+        :param threshold: If a result is strictly less than this number, it won't be included. The
+            default is ``None``.
+        :type threshold: number
+
+        :returns: The results of each column, from most to least common, one column after the
+            other. Without ``top_x`` or ``threshold``, ``self._result`` as it is.
+        :rtype: :class:`pandas.DataFrame`
+        """
+        if top_x is None and threshold is None:
+            return self._result
+        columns = [WorkflowManager._pick_top(self._result[col].dropna(), top_x, threshold)
+                   for col in self._result.columns]
+        order = [label for column in columns for label in column.index]
+        return pandas.DataFrame(dict(zip(self._result.columns, columns)),
+                                columns=self._result.columns).reindex(order)
+
+    @staticmethod
+    def _pick_top(counts, top_x, threshold):
+        """
+        Find the top ``X`` results in ``counts`` that are greater than ``threshold``. Note that the
+        threshold filter is applied first.
+
+        If ``counts`` is not sorted from most to least common (because the ``sort results``
+        setting is ``False``), the top results are picked out with :meth:`_top_counts`, and only
+        they are sorted.
+
+        :param counts: The frequency counts.
+        :type counts: :class:`pandas.Series`
+        :param top_x: This is the "X" in "only show the top X results," or ``None``.
+        :type top_x: ``int``
+        :param threshold: If a result is strictly less than this number, it won't be included.
+        :type threshold: number or ``None``
+
+        :returns: The results, from most to least common.
+        :rtype: :class:`pandas.Series`
+        """
+        post = None
+        if threshold is not None:
+            post = counts[counts > threshold]
+        else:
+            post = counts
+        values = post.values
+        if (values[1:] <= values[:-1]).all():
+            if top_x is not None:
+                post = post[:top_x]
+            return post
+        return WorkflowManager._top_counts(post, top_x)
+
     def _get_dataframe(self, name=u'data', top_x=None, threshold=None):
         """
         "Convert" ``self._result`` into a :class:`DataFrame`, including only the top ``X`` results
-        that are greater than ``threshold``. Note that the threshold filter is applied first.
+        that are greater than ``threshold``. Note that the threshold filter is applied first. Refer
+        to :meth:`_get_series`.
 
         :param name: String to use for the column name of the Series currently held in self._result.
             The default is u'data'.
@@ -580,14 +1256,7 @@ class WorkflowManager(object):
         :returns: A DataFrame with self._result as the only column.
         :rtype: :class:`DataFrame`
         """
-        post = None
-        if threshold is not None:
-            post = self._result[self._result > threshold]
-        else:
-            post = self._result
-        if top_x is not None:
-            post = post[:top_x]
-        return pandas.DataFrame({name: post})
+        return pandas.DataFrame({name: self._get_series(top_x, threshold)})
 
     def output(self, instruction, pathname=None, top_x=None, threshold=None):
         """
@@ -664,7 +1333,7 @@ class WorkflowManager(object):
         if not isinstance(self._result, pandas.DataFrame):
             out_me = self._get_dataframe(u'freq', top_x, threshold)
         else:
-            out_me = self._result
+            out_me = self._get_frame(top_x, threshold)
         out_me.to_stata(stata_path)
         token = None
         if u'intervals' == self._previous_exp:
@@ -721,6 +1390,20 @@ class WorkflowManager(object):
         return pathnames
 
 
+    def _make_ngram_index(self, pathname=None):
+        """
+        Write an inverted index of the n-grams in every piece. To be called by :meth:`export`.
+
+        Arguments as per :meth:`export`.
+        """
+        if self._previous_exp != WorkflowManager._experiments_list[1] or \
+        self.settings(None, u'count frequency') is True or len(self._data) != len(self._result):
+            raise RuntimeError(u'An n-gram index is only possible after you call run() for '
+                               u'"interval n-grams" with "count frequency" set to False.')
+        pathname = u'test_output/ngram_index' if pathname is None else unicode(pathname)
+        ngram_index.write_index(pathname, self._data, self._result)
+        return pathname
+
     def export(self, form, pathname=None, top_x=None, threshold=None):
         """
         Save data from the most recent result of :meth:`run` to a file.
@@ -733,6 +1416,7 @@ class WorkflowManager(object):
             ``test_output/output_result``. File extensions are applied automatically.
         :type pathname: :obj:`basestring`
         :param top_x: This is the "X" in "only show the top X results." The default is ``None``.
+            When the results have a column for every value of ``n``, this applies to each column.
         :type top_x: :obj:`int`
         :param threshold: If a result is strictly less than this number, it won't be included. The
             default is :obj:`None`.
@@ -740,13 +1424,15 @@ class WorkflowManager(object):
 
         Returns
         =======
-        :returns: The pathname of the outputted file.
+        :returns: The pathname of the outputted file (or directory, for an n-gram index).
         :rtype: :obj:`unicode`
 
         Raises
         ======
         :raises: :exc:`RuntimeError` for unrecognized instructions.
         :raises: :exc:`RuntimeError` if :meth:`run` has never been called.
+        :raises: :exc:`RuntimeError` for an n-gram index, if the most recent result of :meth:`run`
+            isn't the n-grams of every piece.
 
         Formats:
 
@@ -754,21 +1440,21 @@ class WorkflowManager(object):
         * ``u'Stata'``: output a Stata file for importing to R.
         * ``u'Excel'``: output an Excel file for Peter Schubert.
         * ``u'HTML'``: output an HTML table, as used by the vis PyQt4 GUI.
+        * ``u'n-gram index'``: an inverted index of where every n-gram occurs, in a directory. Open
+            it with :func:`~vis.models.ngram_index.open_index`. You must call :meth:`run` for
+            ``u'interval n-grams'`` with ``count frequency`` set to ``False`` first.
         """
         # TODO: merge export() functionality into output() (as a private method)
         # ensure we have some results
         if self._result is None:
             raise RuntimeError(u'Call run() before calling export()')
-        # ensure we have a DataFrame
-        if not isinstance(self._result, pandas.DataFrame):
-            export_me = self._get_dataframe(u'data', top_x, threshold)
-        else:
-            export_me = self._result
-        # key is the instruction; value is (extension, export_method)
-        directory = {u'CSV': (u'.csv', export_me.to_csv),
-                     u'Stata': (u'.dta', export_me.to_stata),
-                     u'Excel': (u'.xlsx', export_me.to_excel),
-                     u'HTML': (u'.html', export_me.to_html)}
+        if form == u'n-gram index':
+            return self._make_ngram_index(pathname)
+        # key is the instruction; value is (extension, name of the export method)
+        directory = {u'CSV': (u'.csv', u'to_csv'),
+                     u'Stata': (u'.dta', u'to_stata'),
+                     u'Excel': (u'.xlsx', u'to_excel'),
+                     u'HTML': (u'.html', u'to_html')}
         # ensure we have a valid output format
         if form not in directory:
             raise RuntimeError(u'Unrecognized output format: ' + unicode(form))
@@ -777,8 +1463,16 @@ class WorkflowManager(object):
         # ensure there's a file extension
         if directory[form][0] != pathname[-1 * len(directory[form][0]):]:
             pathname += directory[form][0]
+        # ensure we have a DataFrame, except for CSV, which is written straight from the results
+        if isinstance(self._result, pandas.DataFrame):
+            export_me = self._get_frame(top_x, threshold)
+        elif form == u'CSV':
+            WorkflowManager._write_csv(self._get_series(top_x, threshold), u'data', pathname)
+            return pathname
+        else:
+            export_me = self._get_dataframe(u'data', top_x, threshold)
         # call the to_whatever() method
-        directory[form][1](pathname)
+        getattr(export_me, directory[form][1])(pathname)
         return pathname
 
     def metadata(self, index, field, value=None):
@@ -856,7 +1550,9 @@ class WorkflowManager(object):
         All pieces share these settings. The value of ``index`` is ignored for shared settings, so
         it can be anything.
 
-        * ``n``: As specified in :attr:`vis.analyzers.indexers.ngram.NGramIndexer.possible_settings`
+        * ``n``: As specified in \
+            :attr:`vis.analyzers.indexers.ngram.NGramIndexer.possible_settings`. Set this to a \
+            list, like ``range(2, 9)``, to find the n-grams of every length in one pass.
         * ``continuer``: As specified in \
             :attr:`vis.analyzers.indexers.ngram.NGramIndexer.possible_settings`
         * ``interval quality``: If you want to display interval quality, set this setting to \
@@ -870,6 +1566,16 @@ class WorkflowManager(object):
             When set to ``False``, the moment-by-moment analysis of each piece is retained. We \
             recommend you only request spreadsheet-formatted output when ``count frequency`` is \
             ``False``.
+        * ``processes``: The number of worker processes across which :meth:`load` and :meth:`run` \
+            spread whole pieces. The default, ``1``, analyzes one piece at a time in this process.
+        * ``profile``: Set this to ``True`` to measure the time and memory used by every stage of \
+            every piece during :meth:`load` and :meth:`run`, then call :meth:`profile` to get the \
+            measurements. Set it to a function to also call the function with each measurement as \
+            soon as it is made. The default is ``False``.
+        * ``sort results``: When set to ``True`` (the default), :meth:`run` sorts the number of \
+            occurrences from most to least common. If you only need the top results from \
+            :meth:`export` or :meth:`output` (with ``top_x`` or ``threshold``), set this to \
+            ``False``; they then pick out and sort only the results they write.
         """
         if field in self._shared_settings:
             if value is None: